@@ -0,0 +1,52 @@
+"""Replace audit_logs indexes for entity history and time-range scans
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Composite history indexes + BRIN on created_at."""
+    op.drop_index('idx_audit_logs_entity_id', table_name='audit_logs')
+    op.drop_index('idx_audit_logs_entity_type', table_name='audit_logs')
+    op.drop_index('idx_audit_logs_company_id', table_name='audit_logs')
+    op.drop_index('idx_audit_logs_created_at', table_name='audit_logs')
+
+    op.create_index(
+        'idx_audit_logs_entity',
+        'audit_logs',
+        ['entity_type', 'entity_id', 'created_at']
+    )
+    op.create_index(
+        'idx_audit_logs_company_created_at',
+        'audit_logs',
+        ['company_id', 'created_at']
+    )
+    op.create_index(
+        'idx_audit_logs_created_at_brin',
+        'audit_logs',
+        ['created_at'],
+        postgresql_using='brin'
+    )
+
+
+def downgrade() -> None:
+    """Restore the original single-column indexes."""
+    op.drop_index('idx_audit_logs_created_at_brin', table_name='audit_logs')
+    op.drop_index('idx_audit_logs_company_created_at', table_name='audit_logs')
+    op.drop_index('idx_audit_logs_entity', table_name='audit_logs')
+
+    op.create_index('idx_audit_logs_created_at', 'audit_logs', ['created_at'], unique=False)
+    op.create_index('idx_audit_logs_company_id', 'audit_logs', ['company_id'], unique=False)
+    op.create_index('idx_audit_logs_entity_type', 'audit_logs', ['entity_type'], unique=False)
+    op.create_index('idx_audit_logs_entity_id', 'audit_logs', ['entity_id'], unique=False)
@@ -0,0 +1,30 @@
+"""Partial index on payments.due_date for pending rows
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index used by the autopay and overdue transition jobs."""
+    op.create_index(
+        'idx_payments_pending_due_date',
+        'payments',
+        ['due_date'],
+        postgresql_where=sa.text("status = 'pending'")
+    )
+
+
+def downgrade() -> None:
+    """Drop the partial index."""
+    op.drop_index('idx_payments_pending_due_date', table_name='payments')
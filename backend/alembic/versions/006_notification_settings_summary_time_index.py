@@ -0,0 +1,32 @@
+"""Index notification_settings.daily_summary_time for the summary dispatcher
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index used to select the companies due in the current minute."""
+    op.create_index(
+        op.f('ix_notification_settings_daily_summary_time'),
+        'notification_settings',
+        ['daily_summary_time']
+    )
+
+
+def downgrade() -> None:
+    """Drop the daily_summary_time index."""
+    op.drop_index(
+        op.f('ix_notification_settings_daily_summary_time'),
+        table_name='notification_settings'
+    )
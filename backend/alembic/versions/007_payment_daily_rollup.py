@@ -0,0 +1,51 @@
+"""Create payment_daily_rollup maintained by triggers on payments
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.payment_daily_rollup import PAYMENT_ROLLUP_TRIGGERS_POSTGRESQL
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create the rollup table, install the triggers and backfill it."""
+    op.create_table(
+        'payment_daily_rollup',
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('companies.id'), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False, comment='Fecha de vencimiento (payments.due_date)'),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('payment_count', sa.Integer(), nullable=False),
+        sa.Column('total_amount', sa.Numeric(14, 2), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('company_id', 'day', 'status'),
+    )
+
+    # Bloquear escrituras entre el backfill y la instalación de los triggers
+    op.execute("LOCK TABLE payments IN SHARE MODE")
+    for statement in PAYMENT_ROLLUP_TRIGGERS_POSTGRESQL:
+        op.execute(statement)
+    op.execute(
+        "INSERT INTO payment_daily_rollup (company_id, day, status, payment_count, total_amount, updated_at) "
+        "SELECT company_id, due_date, status, count(*), sum(amount), now() "
+        "FROM payments GROUP BY company_id, due_date, status"
+    )
+
+
+def downgrade() -> None:
+    """Drop the triggers and the rollup table."""
+    op.execute("DROP TRIGGER IF EXISTS payment_daily_rollup_insert ON payments")
+    op.execute("DROP TRIGGER IF EXISTS payment_daily_rollup_update ON payments")
+    op.execute("DROP TRIGGER IF EXISTS payment_daily_rollup_delete ON payments")
+    op.execute("DROP FUNCTION IF EXISTS payment_daily_rollup_sync()")
+    op.drop_table('payment_daily_rollup')
@@ -0,0 +1,50 @@
+"""Add retry tracking columns to notification_queue
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Add attempts / last_error / next_attempt_at and index next_attempt_at."""
+    op.add_column(
+        'notification_queue',
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0',
+                  comment='Intentos de envío fallidos')
+    )
+    op.add_column(
+        'notification_queue',
+        sa.Column('last_error', sa.Text(), nullable=True,
+                  comment='Error del último intento fallido')
+    )
+    op.add_column(
+        'notification_queue',
+        sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True,
+                  comment='Próximo reintento (NULL: enviar en scheduled_for)')
+    )
+    op.create_index(
+        op.f('ix_notification_queue_next_attempt_at'),
+        'notification_queue',
+        ['next_attempt_at']
+    )
+
+
+def downgrade() -> None:
+    """Drop the retry tracking columns."""
+    op.drop_index(
+        op.f('ix_notification_queue_next_attempt_at'),
+        table_name='notification_queue'
+    )
+    op.drop_column('notification_queue', 'next_attempt_at')
+    op.drop_column('notification_queue', 'last_error')
+    op.drop_column('notification_queue', 'attempts')
@@ -0,0 +1,44 @@
+"""Create company_data_versions maintained by triggers on payments and recurring_templates
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.models.company_data_version import COMPANY_DATA_VERSION_TRIGGERS_POSTGRESQL
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create the version table and install the triggers.
+
+    No backfill: a missing row reads as version 0 and the first change
+    inserts version 1.
+    """
+    op.create_table(
+        'company_data_versions',
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), sa.ForeignKey('companies.id'), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('company_id'),
+    )
+    for statement in COMPANY_DATA_VERSION_TRIGGERS_POSTGRESQL:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    """Drop the triggers and the version table."""
+    for table in ('payments', 'recurring_templates'):
+        op.execute(f"DROP TRIGGER IF EXISTS company_data_version_insert ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS company_data_version_update ON {table}")
+        op.execute(f"DROP TRIGGER IF EXISTS company_data_version_delete ON {table}")
+    op.execute("DROP FUNCTION IF EXISTS company_data_version_bump()")
+    op.drop_table('company_data_versions')
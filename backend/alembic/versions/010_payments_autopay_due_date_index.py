@@ -0,0 +1,30 @@
+"""Partial index on payments.due_date for unpaid autopay rows
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index used by the autopay job (autopay rows pending, scheduled or overdue)."""
+    op.create_index(
+        'idx_payments_autopay_due_date',
+        'payments',
+        ['due_date'],
+        postgresql_where=sa.text("autopay = true AND status IN ('pending', 'scheduled', 'overdue')")
+    )
+
+
+def downgrade() -> None:
+    """Drop the partial index."""
+    op.drop_index('idx_payments_autopay_due_date', table_name='payments')
@@ -34,6 +34,7 @@ app.add_middleware(
 )
 
 import logging
+import os
 import traceback
 from fastapi import Request
 
@@ -57,25 +58,52 @@ from app.routers import notifications
 from app.routers import payments
 from app.routers import recurring
 from app.routers import companies
+from app.routers import audit
+from app.routers import reports
 
 app.include_router(notifications.router, prefix="/api")
 app.include_router(payments.router, prefix="/api")
 app.include_router(recurring.router, prefix="/api")
 app.include_router(companies.router, prefix="/api")
+app.include_router(audit.router, prefix="/api")
+app.include_router(reports.router, prefix="/api")
+
+# Jobs en segundo plano dentro de la API; desactivar cuando corre
+# `python -m app.worker` por separado
+ENABLE_BACKGROUND_JOBS = os.getenv('ENABLE_BACKGROUND_JOBS', 'true').lower() in ('1', 'true', 'yes')
 
 # Startup event - Initialize scheduler
 @app.on_event("startup")
 def startup_event():
-        """Initialize APScheduler on application startup."""
-        from app.scheduler import start_scheduler
-        start_scheduler()
+        """Initialize audit writer, session hooks and APScheduler on application startup."""
+        from app.services.audit_writer import start_audit_writer
+        start_audit_writer()
+
+        from app.services.forecast import install_forecast_invalidation
+        install_forecast_invalidation()
+
+        from app.workers.notification_consumer import install_notification_wakeup
+        install_notification_wakeup()
+
+        if ENABLE_BACKGROUND_JOBS:
+            from app.scheduler import start_scheduler
+            start_scheduler()
+        else:
+            logging.info("Background jobs disabled in API process (ENABLE_BACKGROUND_JOBS=false)")
 
 # Shutdown event - Cleanup scheduler
 @app.on_event("shutdown")
 def shutdown_event():
-        """Cleanup APScheduler on application shutdown."""
-        from app.scheduler import shutdown_scheduler
-        shutdown_scheduler()
+        """Cleanup APScheduler and flush pending audit entries on application shutdown."""
+        if ENABLE_BACKGROUND_JOBS:
+            from app.scheduler import shutdown_scheduler
+            shutdown_scheduler()
+
+            from app.services.notification_sender import close_telegram_client
+            close_telegram_client()
+
+        from app.services.audit_writer import shutdown_audit_writer
+        shutdown_audit_writer()
 
 
 @app.get("/")
@@ -4,9 +4,11 @@ from .user import User
 from .company_user import CompanyUser
 from .recurring_template import RecurringTemplate
 from .payment import Payment
+from .payment_daily_rollup import PaymentDailyRollup
+from .company_data_version import CompanyDataVersion
 from .audit_log import AuditLog
 from .notification_settings import NotificationSettings
 from .notification_queue import NotificationQueue
 from .alert_state import AlertState
 
-__all__ = ["Base", "Company", "User", "CompanyUser", "RecurringTemplate", "Payment", "AuditLog", "NotificationSettings", "AlertState", "NotificationQueue"]
+__all__ = ["Base", "Company", "User", "CompanyUser", "RecurringTemplate", "Payment", "PaymentDailyRollup", "CompanyDataVersion", "AuditLog", "NotificationSettings", "AlertState", "NotificationQueue"]
@@ -1,26 +1,26 @@
-import uuid
 from datetime import datetime
 from sqlalchemy import JSON, Column, String, DateTime, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID
-from .base import Base
+from .base import Base, uuid7
 
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
     entity_type = Column(String, nullable=False)
     entity_id = Column(UUID(as_uuid=True), nullable=False)
-    action = Column(String, nullable=False)  # create, update, delete, autopay
+    action = Column(String, nullable=False)  # create, update, delete, autopay, overdue
     changed_by = Column(UUID(as_uuid=True), nullable=True)
-    before_data = Column(nullable=True)
-    after_data = Column(nullable=True)
+    before_data = Column(JSON, nullable=True)
+    after_data = Column(JSON, nullable=True)
     created_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
     __table_args__ = (
-        Index("idx_audit_logs_company_id", "company_id"),
-        Index("idx_audit_logs_entity_type", "entity_type"),
-        Index("idx_audit_logs_entity_id", "entity_id"),
-        Index("idx_audit_logs_created_at", "created_at"),
+        # Historial por entidad / por empresa con paginación keyset (created_at, id)
+        Index("idx_audit_logs_entity", "entity_type", "entity_id", "created_at"),
+        Index("idx_audit_logs_company_created_at", "company_id", "created_at"),
+        # Tabla append-only: BRIN basta para rangos de tiempo y ocupa muy poco
+        Index("idx_audit_logs_created_at_brin", "created_at", postgresql_using="brin"),
     )
@@ -1,10 +1,52 @@
 """Base model configuration for all models."""
 
+import os
+import threading
+import time
+import uuid
 from datetime import datetime
 from sqlalchemy import Column, Integer, DateTime
 from app.database import Base
 # Base declarativa para todos los modelo
 
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """Genera un UUID versión 7 (RFC 9562) ordenado por tiempo.
+
+    Los 48 bits altos son el timestamp Unix en milisegundos, así las
+    inserciones caen al final del índice B-tree en vez de en páginas
+    aleatorias como con uuid4. Los 12 bits rand_a se usan como contador
+    dentro del mismo milisegundo para que los IDs sean monótonos por proceso.
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    with _uuid7_lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _uuid7_last_ms:
+            _uuid7_last_ms = now_ms
+            _uuid7_counter = int.from_bytes(os.urandom(2), 'big') & 0x7FF
+        else:
+            # Mismo milisegundo (o reloj hacia atrás): avanzar el contador
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                _uuid7_last_ms += 1
+                _uuid7_counter = 0
+        timestamp_ms = _uuid7_last_ms
+        counter = _uuid7_counter
+
+    rand_b = int.from_bytes(os.urandom(8), 'big') & 0x3FFFFFFFFFFFFFFF
+
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= rand_b
+    return uuid.UUID(int=value)
+
 class TimestampMixin:
     """Mixin para agregar timestamps automáticos a los modelos."""
     
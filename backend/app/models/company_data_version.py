@@ -0,0 +1,112 @@
+"""Versión de los datos de pagos y plantillas de cada empresa."""
+
+from sqlalchemy import DDL, BigInteger, Column, ForeignKey, event
+from sqlalchemy.dialects.postgresql import UUID
+from .base import Base
+
+
+class CompanyDataVersion(Base):
+    """Contador por empresa que sube con cada cambio en payments o recurring_templates.
+
+    Lo mantienen triggers (ver COMPANY_DATA_VERSION_TRIGGERS_*) en la misma
+    transacción que el cambio, así cubre el ORM, los UPDATE masivos y las
+    escrituras de cualquier proceso. Los caches en memoria (p.ej. el del
+    forecast) lo usan en su clave: una versión nueva es un cache miss en
+    todos los procesos sin necesidad de avisarles.
+    """
+
+    __tablename__ = "company_data_versions"
+
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
+_VERSIONED_TABLES = ('payments', 'recurring_templates')
+
+# PostgreSQL: triggers por sentencia con tablas de transición; un UPDATE
+# masivo sube una sola vez la versión de cada empresa afectada. El orden
+# por company_id evita deadlocks entre sentencias que tocan varias empresas.
+COMPANY_DATA_VERSION_TRIGGERS_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION company_data_version_bump() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO company_data_versions (company_id, version)
+            SELECT DISTINCT company_id, 1 FROM new_rows ORDER BY company_id
+            ON CONFLICT (company_id) DO UPDATE SET version = company_data_versions.version + 1;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO company_data_versions (company_id, version)
+            SELECT DISTINCT company_id, 1 FROM old_rows ORDER BY company_id
+            ON CONFLICT (company_id) DO UPDATE SET version = company_data_versions.version + 1;
+        ELSE
+            INSERT INTO company_data_versions (company_id, version)
+            SELECT company_id, 1 FROM (
+                SELECT company_id FROM new_rows
+                UNION
+                SELECT company_id FROM old_rows
+            ) changed
+            ORDER BY company_id
+            ON CONFLICT (company_id) DO UPDATE SET version = company_data_versions.version + 1;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+]
+for _table in _VERSIONED_TABLES:
+    COMPANY_DATA_VERSION_TRIGGERS_POSTGRESQL += [
+        f"DROP TRIGGER IF EXISTS company_data_version_insert ON {_table}",
+        f"""
+        CREATE TRIGGER company_data_version_insert AFTER INSERT ON {_table}
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION company_data_version_bump()
+        """,
+        f"DROP TRIGGER IF EXISTS company_data_version_update ON {_table}",
+        f"""
+        CREATE TRIGGER company_data_version_update AFTER UPDATE ON {_table}
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION company_data_version_bump()
+        """,
+        f"DROP TRIGGER IF EXISTS company_data_version_delete ON {_table}",
+        f"""
+        CREATE TRIGGER company_data_version_delete AFTER DELETE ON {_table}
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION company_data_version_bump()
+        """,
+    ]
+
+_SQLITE_BUMP = """
+        INSERT INTO company_data_versions (company_id, version) VALUES ({row}.company_id, 1)
+        ON CONFLICT (company_id) DO UPDATE SET version = version + 1;
+"""
+
+# SQLite (desarrollo): triggers por fila con el mismo efecto
+COMPANY_DATA_VERSION_TRIGGERS_SQLITE = []
+for _table in _VERSIONED_TABLES:
+    COMPANY_DATA_VERSION_TRIGGERS_SQLITE += [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS company_data_version_{_table}_insert AFTER INSERT ON {_table}
+        BEGIN
+            {_SQLITE_BUMP.format(row='NEW')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS company_data_version_{_table}_update AFTER UPDATE ON {_table}
+        BEGIN
+            {_SQLITE_BUMP.format(row='OLD')}
+            {_SQLITE_BUMP.format(row='NEW')}
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS company_data_version_{_table}_delete AFTER DELETE ON {_table}
+        BEGIN
+            {_SQLITE_BUMP.format(row='OLD')}
+        END
+        """,
+    ]
+
+# create_all: instalar los triggers una vez creadas todas las tablas
+for _statement in COMPANY_DATA_VERSION_TRIGGERS_POSTGRESQL:
+    event.listen(Base.metadata, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in COMPANY_DATA_VERSION_TRIGGERS_SQLITE:
+    event.listen(Base.metadata, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
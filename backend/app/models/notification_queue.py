@@ -1,10 +1,9 @@
 """Notification queue model for generic notification scheduling."""
 
-import uuid
 from datetime import datetime
-from sqlalchemy import JSON, Column, String, DateTime, ForeignKey
+from sqlalchemy import JSON, Column, String, DateTime, ForeignKey, Integer, Text
 from sqlalchemy.dialects.postgresql import UUID
-from .base import Base
+from .base import Base, uuid7
 
 
 class NotificationQueue(Base):
@@ -14,6 +13,8 @@ class NotificationQueue(Base):
     - Payload flexible (JSON) para cualquier tipo de notificación
     - Estado de envío (pending/sent/failed)
     - Agendamiento programable (scheduled_for)
+    - Reintentos con backoff ante fallas transitorias (attempts,
+      next_attempt_at); scheduled_for conserva el horario original
     - Sin enviar nada todavía (estructura preparada)
     """
     
@@ -23,7 +24,7 @@ class NotificationQueue(Base):
     id = Column(
         UUID(as_uuid=True),
         primary_key=True,
-        default=uuid.uuid4,
+        default=uuid7,
         comment="Identificador único de la notificación"
     )
     
@@ -67,6 +68,28 @@ class NotificationQueue(Base):
         comment="Fecha y hora programada para envío"
     )
     
+    # Reintentos
+    attempts = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default='0',
+        comment="Intentos de envío fallidos"
+    )
+    
+    last_error = Column(
+        Text,
+        nullable=True,
+        comment="Error del último intento fallido"
+    )
+    
+    next_attempt_at = Column(
+        DateTime(timezone=True),
+        nullable=True,
+        index=True,
+        comment="Próximo reintento (NULL: enviar en scheduled_for)"
+    )
+    
     # Fecha de envío
     sent_at = Column(
         DateTime(timezone=True),
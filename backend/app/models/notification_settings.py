@@ -68,6 +68,7 @@ class NotificationSettings(Base):
         Time,
         nullable=False,
         default="08:00",
+        index=True,
         comment="Hora diaria para envío de resumen (HH:MM)"
     )
     
@@ -1,14 +1,13 @@
-import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, Boolean, Date, DateTime, Numeric, ForeignKey, CheckConstraint, UniqueConstraint, Index
+from sqlalchemy import text, Column, String, Integer, Boolean, Date, DateTime, Numeric, ForeignKey, CheckConstraint, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import UUID
-from .base import Base
+from .base import Base, uuid7
 
 
 class Payment(Base):
     __tablename__ = "payments"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
     template_id = Column(UUID(as_uuid=True), ForeignKey("recurring_templates.id"), nullable=True)
     installment_number = Column(Integer, nullable=True)
@@ -40,4 +39,16 @@ class Payment(Base):
         Index("idx_payments_due_date", "due_date"),
         Index("idx_payments_status", "status"),
         Index("idx_payments_template_id", "template_id"),
+        # Job de overdue: solo recorre los pendientes por vencimiento
+        Index(
+            "idx_payments_pending_due_date", "due_date",
+            postgresql_where=text("status = 'pending'"),
+            sqlite_where=text("status = 'pending'"),
+        ),
+        # Autopago: pagos con autopay aún no pagados, por vencimiento
+        Index(
+            "idx_payments_autopay_due_date", "due_date",
+            postgresql_where=text("autopay = true AND status IN ('pending', 'scheduled', 'overdue')"),
+            sqlite_where=text("autopay = true AND status IN ('pending', 'scheduled', 'overdue')"),
+        ),
     )
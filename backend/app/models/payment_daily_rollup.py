@@ -0,0 +1,133 @@
+"""Agregado diario de pagos por empresa, fecha de vencimiento y estado."""
+
+from datetime import datetime
+from sqlalchemy import DDL, Column, Date, DateTime, ForeignKey, Integer, Numeric, String, event
+from sqlalchemy.dialects.postgresql import UUID
+from .base import Base
+
+
+class PaymentDailyRollup(Base):
+    """Cantidad y suma de pagos por (empresa, día de vencimiento, estado).
+
+    Lo mantienen triggers sobre payments (ver PAYMENT_ROLLUP_TRIGGERS_*), así
+    cubre tanto el ORM como los UPDATE/INSERT masivos de autopago, vencidos
+    y materialización de cuotas. Reportes y dashboards leen unas pocas filas
+    en vez de recorrer el historial de payments.
+    """
+
+    __tablename__ = "payment_daily_rollup"
+
+    company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), primary_key=True)
+    day = Column(Date, primary_key=True, comment="Fecha de vencimiento (payments.due_date)")
+    status = Column(String, primary_key=True)
+    payment_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Numeric(14, 2), nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+
+# PostgreSQL: triggers por sentencia con tablas de transición; cada
+# INSERT/UPDATE/DELETE sobre payments aplica un único upsert agregado.
+PAYMENT_ROLLUP_TRIGGERS_POSTGRESQL = [
+    """
+    CREATE OR REPLACE FUNCTION payment_daily_rollup_sync() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            INSERT INTO payment_daily_rollup (company_id, day, status, payment_count, total_amount, updated_at)
+            SELECT company_id, due_date, status, count(*), sum(amount), now()
+            FROM new_rows
+            GROUP BY company_id, due_date, status
+            ON CONFLICT (company_id, day, status) DO UPDATE SET
+                payment_count = payment_daily_rollup.payment_count + EXCLUDED.payment_count,
+                total_amount = payment_daily_rollup.total_amount + EXCLUDED.total_amount,
+                updated_at = EXCLUDED.updated_at;
+        ELSIF TG_OP = 'DELETE' THEN
+            INSERT INTO payment_daily_rollup (company_id, day, status, payment_count, total_amount, updated_at)
+            SELECT company_id, due_date, status, -count(*), -sum(amount), now()
+            FROM old_rows
+            GROUP BY company_id, due_date, status
+            ON CONFLICT (company_id, day, status) DO UPDATE SET
+                payment_count = payment_daily_rollup.payment_count + EXCLUDED.payment_count,
+                total_amount = payment_daily_rollup.total_amount + EXCLUDED.total_amount,
+                updated_at = EXCLUDED.updated_at;
+        ELSE
+            INSERT INTO payment_daily_rollup (company_id, day, status, payment_count, total_amount, updated_at)
+            SELECT company_id, due_date, status, sum(delta_count), sum(delta_amount), now()
+            FROM (
+                SELECT n.company_id, n.due_date, n.status, 1 AS delta_count, n.amount AS delta_amount
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE (o.company_id, o.due_date, o.status, o.amount)
+                      IS DISTINCT FROM (n.company_id, n.due_date, n.status, n.amount)
+                UNION ALL
+                SELECT o.company_id, o.due_date, o.status, -1, -o.amount
+                FROM new_rows n JOIN old_rows o ON o.id = n.id
+                WHERE (o.company_id, o.due_date, o.status, o.amount)
+                      IS DISTINCT FROM (n.company_id, n.due_date, n.status, n.amount)
+            ) deltas
+            GROUP BY company_id, due_date, status
+            ON CONFLICT (company_id, day, status) DO UPDATE SET
+                payment_count = payment_daily_rollup.payment_count + EXCLUDED.payment_count,
+                total_amount = payment_daily_rollup.total_amount + EXCLUDED.total_amount,
+                updated_at = EXCLUDED.updated_at;
+        END IF;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS payment_daily_rollup_insert ON payments",
+    """
+    CREATE TRIGGER payment_daily_rollup_insert AFTER INSERT ON payments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION payment_daily_rollup_sync()
+    """,
+    "DROP TRIGGER IF EXISTS payment_daily_rollup_update ON payments",
+    """
+    CREATE TRIGGER payment_daily_rollup_update AFTER UPDATE ON payments
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION payment_daily_rollup_sync()
+    """,
+    "DROP TRIGGER IF EXISTS payment_daily_rollup_delete ON payments",
+    """
+    CREATE TRIGGER payment_daily_rollup_delete AFTER DELETE ON payments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION payment_daily_rollup_sync()
+    """,
+]
+
+_SQLITE_UPSERT = """
+        INSERT INTO payment_daily_rollup (company_id, day, status, payment_count, total_amount, updated_at)
+        VALUES ({row}.company_id, {row}.due_date, {row}.status, {sign}1, {sign}{row}.amount, CURRENT_TIMESTAMP)
+        ON CONFLICT (company_id, day, status) DO UPDATE SET
+            payment_count = payment_count + excluded.payment_count,
+            total_amount = total_amount + excluded.total_amount,
+            updated_at = excluded.updated_at;
+"""
+
+# SQLite (desarrollo): triggers por fila con el mismo efecto
+PAYMENT_ROLLUP_TRIGGERS_SQLITE = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS payment_daily_rollup_insert AFTER INSERT ON payments
+    BEGIN
+        {_SQLITE_UPSERT.format(row='NEW', sign='')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS payment_daily_rollup_update
+    AFTER UPDATE OF company_id, due_date, status, amount ON payments
+    BEGIN
+        {_SQLITE_UPSERT.format(row='OLD', sign='-')}
+        {_SQLITE_UPSERT.format(row='NEW', sign='')}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS payment_daily_rollup_delete AFTER DELETE ON payments
+    BEGIN
+        {_SQLITE_UPSERT.format(row='OLD', sign='-')}
+    END
+    """,
+]
+
+# create_all: instalar los triggers una vez creadas todas las tablas
+for _statement in PAYMENT_ROLLUP_TRIGGERS_POSTGRESQL:
+    event.listen(Base.metadata, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in PAYMENT_ROLLUP_TRIGGERS_SQLITE:
+    event.listen(Base.metadata, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
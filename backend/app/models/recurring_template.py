@@ -1,14 +1,13 @@
-import uuid
 from datetime import datetime
 from sqlalchemy import Column, String, Integer, Boolean, Date, DateTime, Numeric, ForeignKey, CheckConstraint
 from sqlalchemy.dialects.postgresql import UUID
-from .base import Base
+from .base import Base, uuid7
 
 
 class RecurringTemplate(Base):
     __tablename__ = "recurring_templates"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid7)
     company_id = Column(UUID(as_uuid=True), ForeignKey("companies.id"), nullable=False)
     title = Column(String, nullable=False)
     total_installments = Column(Integer, nullable=False)
@@ -1,7 +1,11 @@
 """Routers package for controlgastos API"""
 
 from app.routers.notifications import router as notifications_router
+from app.routers.audit import router as audit_router
+from app.routers.reports import router as reports_router
 
 __all__ = [
     "notifications_router",
+    "audit_router",
+    "reports_router",
 ]
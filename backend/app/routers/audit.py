@@ -0,0 +1,143 @@
+"""API router for audit log history endpoints"""
+import base64
+from datetime import datetime
+from typing import Optional, Tuple
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query as OrmQuery, Session
+
+from app.database import get_db
+from app.models.audit_log import AuditLog
+from app.schemas.audit_log import AuditLogPage
+
+router = APIRouter(
+    prefix="/audit",
+    tags=["audit"],
+)
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, entry_id: UUID) -> str:
+    """Encode the (created_at, id) keyset position as an opaque cursor."""
+    raw = f"{created_at.isoformat()}|{entry_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Decode a cursor produced by encode_cursor.
+
+    Raises:
+        HTTPException 400: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, entry_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), UUID(entry_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def _paginate(
+    query: OrmQuery,
+    cursor: Optional[str],
+    limit: int,
+    since: Optional[datetime],
+    until: Optional[datetime],
+) -> AuditLogPage:
+    """Apply time range and keyset pagination ordered by (created_at, id) DESC."""
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    if since:
+        query = query.filter(AuditLog.created_at >= since)
+    if until:
+        query = query.filter(AuditLog.created_at < until)
+
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.filter(
+            tuple_(AuditLog.created_at, AuditLog.id) < tuple_(cursor_created_at, cursor_id)
+        )
+
+    # Fetch one extra row to know whether there is a next page
+    entries = query.order_by(
+        AuditLog.created_at.desc(),
+        AuditLog.id.desc(),
+    ).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(entries) > limit:
+        entries = entries[:limit]
+        last = entries[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return AuditLogPage(items=entries, next_cursor=next_cursor)
+
+
+# Registered before the generic entity route so "company" is not taken as an entity_type
+@router.get(
+    "/company/{company_id}",
+    response_model=AuditLogPage,
+    summary="Get audit history by company",
+)
+def get_company_history(
+    company_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Get audit entries for every entity of a company, newest first.
+
+    Args:
+        company_id: Company UUID
+        cursor: Cursor returned by the previous page (optional)
+        limit: Maximum number of results (default 50, max 100)
+        since: Only entries created at or after this timestamp (optional)
+        until: Only entries created before this timestamp (optional)
+
+    Returns:
+        Page of audit entries and the cursor for the next page
+    """
+    query = db.query(AuditLog).filter(AuditLog.company_id == company_id)
+    return _paginate(query, cursor, limit, since, until)
+
+
+@router.get(
+    "/{entity_type}/{entity_id}",
+    response_model=AuditLogPage,
+    summary="Get audit history of an entity",
+)
+def get_entity_history(
+    entity_type: str,
+    entity_id: UUID,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    db: Session = Depends(get_db),
+):
+    """Get audit entries for a single entity (e.g. payment), newest first.
+
+    Args:
+        entity_type: Entity type (payment, recurring_template, notification_settings)
+        entity_id: Entity UUID
+        cursor: Cursor returned by the previous page (optional)
+        limit: Maximum number of results (default 50, max 100)
+        since: Only entries created at or after this timestamp (optional)
+        until: Only entries created before this timestamp (optional)
+
+    Returns:
+        Page of audit entries and the cursor for the next page
+    """
+    query = db.query(AuditLog).filter(
+        AuditLog.entity_type == entity_type,
+        AuditLog.entity_id == entity_id,
+    )
+    return _paginate(query, cursor, limit, since, until)
@@ -277,6 +277,9 @@ def retry_failed_notification(
     # Reset to pending for retry
     db_queue.status = "pending"
     db_queue.sent_at = None
+    # Fresh retry budget; last_error is kept for reference
+    db_queue.attempts = 0
+    db_queue.next_attempt_at = None
     # Keep payload intact - do not modify
 
     # Log retry action
@@ -317,10 +320,16 @@ def health_check(
         - sent_count: Number of successfully sent notifications
         - failed_count: Number of failed notifications
         - last_successful_send: Timestamp of last successful notification
+        - audit: Audit writer queue depth and throughput counters
+        - consumer: Notification consumer state and counters
+        - circuit_breakers: Per-channel breaker state (closed/open/half_open)
     """
     try:
         # Count notifications by status using efficient queries
         from sqlalchemy import func
+        from app.services.audit_writer import get_audit_metrics
+        from app.workers.notification_consumer import notification_consumer
+        from app.services.notification_sender import get_circuit_breaker_metrics
         
         # Get counts for each status
         pending_count = db.query(func.count(NotificationQueue.id)).filter(
@@ -360,7 +369,10 @@ def health_check(
                 "failed_count": failed_count,
                 "last_successful_send": last_sent.isoformat() if last_sent else None,
                 "total_notifications": pending_count + sent_count + failed_count
-            }
+            },
+            "audit": get_audit_metrics(),
+            "consumer": notification_consumer.metrics(),
+            "circuit_breakers": get_circuit_breaker_metrics()
         }
     
     except Exception as e:
@@ -1,11 +1,25 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from typing import List
 from uuid import UUID
+from datetime import date
+import json
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.recurring_template import RecurringTemplate as RecModel
-from app.schemas.recurring import RecurringTemplate, RecurringTemplateCreate, RecurringTemplateUpdate
+from app.models.payment import Payment as PaymentModel
+from app.schemas.recurring import RecurringTemplate, RecurringTemplateCreate, RecurringTemplateUpdate, MaterializeResult
+from app.services.installment_generator import (
+    materialize_template,
+    materialize_company_templates,
+    propagate_template_changes,
+    UNPAID_STATUSES,
+)
+from app.services.installment_projection import project_installments
+from app.services.audit_writer import enqueue_audit_entries
+from app.services.forecast import invalidate_company_forecast
 
 router = APIRouter(
     prefix="/recurring",
@@ -23,3 +37,74 @@ def create_template(template: RecurringTemplateCreate, db: Session = Depends(get
 @router.get("/company/{company_id}", response_model=List[RecurringTemplate])
 def read_templates(company_id: UUID, db: Session = Depends(get_db)):
     return db.query(RecModel).filter(RecModel.company_id == company_id).all()
+
+@router.put("/{template_id}", response_model=RecurringTemplate)
+def update_template(template_id: UUID, template: RecurringTemplateUpdate, db: Session = Depends(get_db)):
+    db_obj = db.query(RecModel).filter(RecModel.id == template_id).first()
+    if not db_obj:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    # Only the fields sent are applied: omitting one keeps its stored value
+    changes = template.model_dump(exclude_unset=True)
+    installments_paid_before = changes.get('installments_paid_before', db_obj.installments_paid_before)
+    if template.total_installments < installments_paid_before:
+        raise HTTPException(status_code=400, detail="total_installments cannot be lower than installments_paid_before")
+
+    # Las cuotas pagadas se conservan: el plan no puede terminar antes de ellas
+    last_paid = db.query(func.max(PaymentModel.installment_number)).filter(
+        PaymentModel.template_id == template_id,
+        PaymentModel.status.notin_(UNPAID_STATUSES)
+    ).scalar()
+    if last_paid and template.total_installments < last_paid:
+        raise HTTPException(status_code=400, detail=f"total_installments cannot be lower than paid installment {last_paid}")
+
+    previous_start_control_date = db_obj.start_control_date
+    previous_installments_paid_before = db_obj.installments_paid_before
+    for key, value in changes.items():
+        setattr(db_obj, key, value)
+
+    _, audit_entries = propagate_template_changes(
+        db, db_obj, previous_start_control_date, previous_installments_paid_before
+    )
+    db.commit()
+    # Only audit installment changes that were actually committed
+    enqueue_audit_entries(audit_entries)
+    db.refresh(db_obj)
+    return db_obj
+
+@router.post("/company/{company_id}/generate", response_model=MaterializeResult)
+def generate_company_installments(company_id: UUID, db: Session = Depends(get_db)):
+    result, audit_entries = materialize_company_templates(db, company_id)
+    db.commit()
+    enqueue_audit_entries(audit_entries)
+    invalidate_company_forecast(company_id)
+    return result
+
+@router.post("/{template_id}/generate", response_model=MaterializeResult)
+def generate_template_installments(template_id: UUID, db: Session = Depends(get_db)):
+    db_obj = db.query(RecModel).filter(RecModel.id == template_id).first()
+    if not db_obj:
+        raise HTTPException(status_code=404, detail="Template not found")
+
+    result, audit_entries = materialize_template(db, db_obj)
+    db.commit()
+    enqueue_audit_entries(audit_entries)
+    invalidate_company_forecast(db_obj.company_id)
+    return result
+
+@router.get("/company/{company_id}/projection")
+def read_projection(company_id: UUID, start: date, end: date, include_paid: bool = True):
+    """Stream real and virtual installments due in [start, end] as NDJSON."""
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+
+    def stream():
+        # Own session: the request-scoped one is closed before streaming ends
+        db = SessionLocal()
+        try:
+            for item in project_installments(db, company_id, start, end, include_paid):
+                yield json.dumps(item) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
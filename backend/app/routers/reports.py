@@ -0,0 +1,86 @@
+"""API router for report endpoints"""
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from uuid import UUID
+
+from app.database import get_db
+from app.schemas.report import ForecastResponse, PaymentTotalsResponse
+from app.services.forecast import get_company_forecast, MAX_FORECAST_MONTHS
+from app.services.payment_rollup import rollup_totals
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["reports"],
+)
+
+
+@router.get(
+    "/company/{company_id}/forecast",
+    response_model=ForecastResponse,
+    summary="Cash-flow forecast by company",
+)
+def get_forecast(
+    company_id: UUID,
+    months: int = Query(12, ge=1, le=MAX_FORECAST_MONTHS),
+    opening_balance: float = 0,
+    db: Session = Depends(get_db),
+):
+    """Get projected monthly outflow and cumulative balance.
+
+    Built from unpaid payments plus the installments of recurring templates
+    that are not materialized yet. Cached per company and invalidated when
+    payments or templates change.
+
+    Args:
+        company_id: Company UUID
+        months: Number of months to project, current month included (default 12)
+        opening_balance: Starting balance used to compute the running balance
+
+    Returns:
+        Forecast with one entry per month
+    """
+    forecast = get_company_forecast(db, company_id, months)
+
+    return {
+        **forecast,
+        "opening_balance": opening_balance,
+        "items": [
+            {**item, "balance": round(opening_balance - item["cumulative_outflow"], 2)}
+            for item in forecast["items"]
+        ],
+    }
+
+
+@router.get(
+    "/company/{company_id}/totals",
+    response_model=PaymentTotalsResponse,
+    summary="Payment totals by period and status",
+)
+def get_payment_totals(
+    company_id: UUID,
+    period: Literal["day", "week", "month"] = "month",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    db: Session = Depends(get_db),
+):
+    """Get payment count and amount per period and status.
+
+    Read from payment_daily_rollup (one row per company, due date and
+    status) instead of scanning payments.
+
+    Args:
+        company_id: Company UUID
+        period: Grouping: day, week (starting Monday) or month
+        start: First due date included (optional)
+        end: Last due date included (optional)
+
+    Returns:
+        Totals ordered by period and status
+    """
+    return {
+        "company_id": company_id,
+        "period": period,
+        "items": rollup_totals(db, company_id, start, end, period),
+    }
@@ -1,59 +1,99 @@
 """APScheduler configuration for daily notification jobs."""
 
 import logging
-from datetime import datetime
+import os
+import threading
+from datetime import date, datetime, time, timedelta
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.base import STATE_PAUSED, STATE_RUNNING, STATE_STOPPED
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.triggers.cron import CronTrigger
 import pytz
+from uuid import UUID
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import SessionLocal, engine
 from app.models.notification_settings import NotificationSettings
 from app.models.notification_queue import NotificationQueue
-from app.services.notification_builder import build_daily_summary
+from app.services.notification_builder import build_daily_summary, build_daily_summaries, compact_summary_payload
 from app.services.alert_scheduler import run_alert_checks
+from app.services.autopay import run_autopay
+from app.services.overdue import run_overdue_transition
+from app.services.leader_election import LeaderElection
+from app.workers.notification_consumer import notification_consumer
 
 logger = logging.getLogger(__name__)
 
 # Timezone para Chile
 SANTIAGO_TZ = pytz.timezone('America/Santiago')
 
-# Scheduler global
-scheduler = BackgroundScheduler(timezone=SANTIAGO_TZ)
+# Empresas por transacción en el dispatcher de resúmenes
+DISPATCH_BATCH_SIZE = 200
 
+# Minutos atrasados que el dispatcher recupera por sí mismo en un tick
+# (p.ej. ticks coalescidos); huecos mayores los cubre el catch-up
+MAX_TICK_CATCHUP_MINUTES = 60
 
-def schedule_daily_summary_job(company_id: str, time_str: str):
-    """Agrega un job diario para una empresa específica.
+# Catch-up de resúmenes perdidos durante una caída: lotes acotados con pausa
+CATCHUP_BATCH_SIZE = int(os.getenv('SUMMARY_CATCHUP_BATCH_SIZE', '100'))
+CATCHUP_BATCH_DELAY_SECONDS = float(os.getenv('SUMMARY_CATCHUP_BATCH_DELAY_SECONDS', '1'))
+
+# Conexiones del pool que no usan los jobs (job store, elección de líder)
+RESERVED_POOL_CONNECTIONS = 2
+
+
+def _executor_max_workers() -> int:
+    """Hilos del executor acotados al pool de conexiones de la BD.
     
-    Args:
-        company_id: UUID de la empresa
-        time_str: Hora en formato HH:MM (ej: '08:00')
+    Cada job abre su propia sesión; con más hilos que conexiones, los jobs
+    simultáneos agotan el pool y quedan esperando (o fallan por timeout).
     """
-    hour, minute = map(int, time_str.split(':'))
-    
-    job_id = f"daily_summary_{company_id}"
-    
-    # Remover job existente si existe
-    if scheduler.get_job(job_id):
-        scheduler.remove_job(job_id)
-    
-    # Crear trigger cron para la hora específica
-    trigger = CronTrigger(
-        hour=hour,
-        minute=minute,
-        timezone=SANTIAGO_TZ
-    )
+    pool_size = engine.pool.size() if hasattr(engine.pool, 'size') else 5
+    workers = max(1, pool_size - RESERVED_POOL_CONNECTIONS)
+    configured = os.getenv('SCHEDULER_MAX_WORKERS')
+    if configured:
+        workers = max(1, min(int(configured), workers))
+    return workers
+
+
+class _SharedEngineJobStore(SQLAlchemyJobStore):
+    """Job store sobre el engine de la app: al apagarse no hace dispose del engine.
     
-    scheduler.add_job(
-        func=generate_and_queue_summary,
-        trigger=trigger,
-        id=job_id,
-        args=[company_id],
-        replace_existing=True,
-        name=f"Daily summary for company {company_id}"
-    )
+    SQLAlchemyJobStore.shutdown() cierra el pool completo, que comparten las
+    sesiones de la API y del resto de los jobs.
+    """
     
-    logger.info(f"Scheduled daily summary job for company {company_id} at {time_str}")
+    def shutdown(self):
+        pass
+
+
+# Scheduler global con jobs persistidos en la BD (sobreviven reinicios).
+# Se arranca una sola vez; perder / recuperar el liderazgo lo pausa y
+# reanuda (un scheduler apagado no se puede volver a arrancar: su executor
+# ya no acepta trabajos).
+scheduler = BackgroundScheduler(
+    timezone=SANTIAGO_TZ,
+    jobstores={
+        'default': _SharedEngineJobStore(engine=engine, tablename='apscheduler_jobs')
+    },
+    executors={
+        'default': ThreadPoolExecutor(max_workers=_executor_max_workers())
+    },
+    job_defaults={
+        'coalesce': True,
+        'max_instances': 1,
+        'misfire_grace_time': 300,
+    }
+)
+
+# Último minuto despachado por este proceso (None tras arrancar o perder el liderazgo)
+_last_dispatched_at = None
+
+# Se activa al perder el liderazgo para cortar un catch-up en curso
+_catchup_stop = threading.Event()
 
 
 def generate_and_queue_summary(company_id: str):
@@ -74,43 +114,9 @@ def generate_and_queue_summary(company_id: str):
             logger.warning(f"No notification settings found for company {company_id}")
             return
         
-        # Generar resumen
         today = datetime.now(SANTIAGO_TZ).date()
-        summary_payload = build_daily_summary(db, company_id, today)
-        
-        if not summary_payload:
-            logger.info(f"No data to notify for company {company_id} on {today}")
-            return
-        
-        # Calcular hora de envío (usar la hora configurada de hoy)
-        scheduled_time = datetime.combine(
-            today,
-            settings.daily_summary_time
-        )
-        scheduled_time = SANTIAGO_TZ.localize(scheduled_time)
-        
-        # Encolar para Telegram si está habilitado
-        if settings.telegram_enabled and settings.telegram_chat_id:
-            _queue_notification(
-                db, 
-                company_id, 
-                'telegram', 
-                summary_payload,
-                scheduled_time
-            )
-        
-        # Encolar para Email si está habilitado
-        if settings.email_enabled and settings.email_to:
-            _queue_notification(
-                db, 
-                company_id, 
-                'email', 
-                summary_payload,
-                scheduled_time
-            )
-        
+        _generate_for_settings(db, settings, today)
         db.commit()
-        logger.info(f"Queued notifications for company {company_id}")
         
     except Exception as e:
         logger.error(f"Error generating summary for company {company_id}: {e}")
@@ -119,7 +125,101 @@ def generate_and_queue_summary(company_id: str):
         db.close()
 
 
-def _queue_notification(db: Session, company_id: str, channel: str, payload: dict, scheduled_time: datetime):
+def _generate_for_settings(db: Session, settings: NotificationSettings, today: date):
+    """Genera el resumen de una empresa y lo encola en sus canales habilitados.
+    
+    No hace commit; lo decide quien llama.
+    
+    Args:
+        db: Sesión de base de datos
+        settings: Configuración de notificaciones de la empresa
+        today: Fecha del resumen
+    """
+    # Generar resumen
+    summary_payload = build_daily_summary(db, settings.company_id, today)
+    _queue_summary(db, settings, summary_payload, today)
+
+
+def _summary_scheduled_time(settings: NotificationSettings, today: date) -> datetime:
+    """Hora de envío del resumen (la hora configurada de hoy, en Santiago)."""
+    return SANTIAGO_TZ.localize(datetime.combine(today, settings.daily_summary_time))
+
+
+def _queue_summary(db: Session, settings: NotificationSettings, summary_payload, today: date, queued=None):
+    """Encola un resumen ya construido en los canales habilitados de la empresa.
+    
+    Args:
+        db: Sesión de base de datos
+        settings: Configuración de notificaciones de la empresa
+        summary_payload: Payload del resumen (None si no hay datos)
+        today: Fecha del resumen
+        queued: Notificaciones ya encoladas precargadas (ver _queued_summaries)
+    """
+    company_id = settings.company_id
+    
+    if not summary_payload:
+        logger.info(f"No data to notify for company {company_id} on {today}")
+        return
+    
+    scheduled_time = _summary_scheduled_time(settings, today)
+    
+    # Una sola copia compacta compartida por los canales; el detalle se arma al enviar
+    summary_payload = compact_summary_payload(summary_payload)
+    
+    # Encolar para Telegram si está habilitado
+    if settings.telegram_enabled and settings.telegram_chat_id:
+        _queue_notification(
+            db, 
+            company_id, 
+            'telegram', 
+            summary_payload,
+            scheduled_time,
+            queued
+        )
+    
+    # Encolar para Email si está habilitado
+    if settings.email_enabled and settings.email_to:
+        _queue_notification(
+            db, 
+            company_id, 
+            'email', 
+            summary_payload,
+            scheduled_time,
+            queued
+        )
+    
+    logger.info(f"Queued notifications for company {company_id}")
+
+
+def _as_santiago(value: datetime) -> datetime:
+    # SQLite devuelve la hora local de Santiago sin zona horaria
+    return SANTIAGO_TZ.localize(value) if value.tzinfo is None else value
+
+
+def _queued_summaries(db: Session, settings_list, today: date) -> set:
+    """Precarga en una consulta las notificaciones ya encoladas de un lote.
+    
+    Returns:
+        Set de (company_id, channel, scheduled_for) con status pending/sent
+    """
+    times = [_summary_scheduled_time(settings, today) for settings in settings_list]
+    rows = db.query(
+        NotificationQueue.company_id,
+        NotificationQueue.channel,
+        NotificationQueue.scheduled_for
+    ).filter(
+        NotificationQueue.company_id.in_([settings.company_id for settings in settings_list]),
+        NotificationQueue.scheduled_for >= min(times),
+        NotificationQueue.scheduled_for <= max(times),
+        NotificationQueue.status.in_(['pending', 'sent'])
+    ).all()
+    return {
+        (str(company_id), channel, _as_santiago(scheduled_for))
+        for company_id, channel, scheduled_for in rows
+    }
+
+
+def _queue_notification(db: Session, company_id: str, channel: str, payload: dict, scheduled_time: datetime, queued=None):
     """Crea entrada en notification_queue evitando duplicados.
     
     Args:
@@ -128,14 +228,19 @@ def _queue_notification(db: Session, company_id: str, channel: str, payload: dic
         channel: Canal (telegram/email)
         payload: Contenido del mensaje
         scheduled_time: Hora programada de envío
+        queued: Set precargado de notificaciones existentes; si es None
+            se consulta la BD
     """
     # Verificar si ya existe notificación para hoy
-    existing = db.query(NotificationQueue).filter(
-        NotificationQueue.company_id == company_id,
-        NotificationQueue.channel == channel,
-        NotificationQueue.scheduled_for == scheduled_time,
-        NotificationQueue.status.in_(['pending', 'sent'])
-    ).first()
+    if queued is not None:
+        existing = (str(company_id), channel, scheduled_time) in queued
+    else:
+        existing = db.query(NotificationQueue).filter(
+            NotificationQueue.company_id == company_id,
+            NotificationQueue.channel == channel,
+            NotificationQueue.scheduled_for == scheduled_time,
+            NotificationQueue.status.in_(['pending', 'sent'])
+        ).first()
     
     if existing:
         logger.info(f"Notification already queued for {company_id} on {channel}")
@@ -154,37 +259,187 @@ def _queue_notification(db: Session, company_id: str, channel: str, payload: dic
     logger.info(f"Queued {channel} notification for company {company_id}")
 
 
-def load_all_company_schedules():
-    """Carga todos los schedules de empresas desde la BD."""
+def _scheduled_company_ids(db: Session, *time_filters):
+    """Empresas con algún canal habilitado y hora de resumen en el rango dado.
+    
+    time_filters son condiciones sobre daily_summary_time: la consulta
+    recorre su índice, así el costo depende de las empresas del rango y no
+    del total de empresas.
+    """
+    rows = db.query(NotificationSettings.company_id).filter(
+        *time_filters,
+        or_(
+            NotificationSettings.telegram_enabled == True,
+            NotificationSettings.email_enabled == True
+        )
+    ).order_by(NotificationSettings.company_id).all()
+    return [str(company_id) for (company_id,) in rows]
+
+
+def _dispatch_companies(db: Session, company_ids, today: date) -> int:
+    """Genera los resúmenes de las empresas dadas, una transacción por lote.
+    
+    Returns:
+        Cantidad de empresas procesadas
+    """
+    dispatched = 0
+    for i in range(0, len(company_ids), DISPATCH_BATCH_SIZE):
+        batch_ids = [UUID(company_id) for company_id in company_ids[i:i + DISPATCH_BATCH_SIZE]]
+        try:
+            batch = db.query(NotificationSettings).filter(
+                NotificationSettings.company_id.in_(batch_ids)
+            ).order_by(NotificationSettings.company_id).all()
+            if not batch:
+                continue
+            
+            # Resúmenes y duplicados del lote completo en pocas consultas
+            payloads = build_daily_summaries(db, batch_ids, today)
+            queued = _queued_summaries(db, batch, today)
+            for settings in batch:
+                _queue_summary(db, settings, payloads.get(str(settings.company_id)), today, queued)
+            db.commit()
+            dispatched += len(batch)
+        except Exception as e:
+            logger.error(f"Error dispatching summary batch for {today}: {e}")
+            db.rollback()
+    return dispatched
+
+
+def dispatch_daily_summaries(now: datetime = None):
+    """Tick de cada minuto: genera los resúmenes de las empresas cuya hora coincide.
+    
+    Reemplaza un CronTrigger por empresa: el scheduler mantiene un único
+    job sin importar la cantidad de empresas, y la selección usa el índice
+    sobre daily_summary_time (los cambios de settings hechos en cualquier
+    proceso se ven en el tick siguiente). Si hubo ticks coalescidos o
+    atrasados, despacha también los minutos intermedios desde el último
+    despachado.
+    
+    Args:
+        now: Minuto a despachar (default: ahora en Santiago)
+    """
+    global _last_dispatched_at
+    
+    now = (now or datetime.now(SANTIAGO_TZ)).replace(second=0, microsecond=0)
+    today = now.date()
+    
+    # Minutos pendientes del día: desde el último despachado hasta ahora
+    minutes = [now]
+    if _last_dispatched_at is not None and _last_dispatched_at.date() == today:
+        gap = int((now - _last_dispatched_at).total_seconds() // 60)
+        if gap <= 0:
+            return
+        if gap <= MAX_TICK_CATCHUP_MINUTES:
+            minutes = [_last_dispatched_at + timedelta(minutes=n) for n in range(1, gap + 1)]
+    
     db: Session = SessionLocal()
     
     try:
-        settings_list = db.query(NotificationSettings).all()
-        
-        for settings in settings_list:
-            if settings.telegram_enabled or settings.email_enabled:
-                time_str = settings.daily_summary_time.strftime('%H:%M')
-                schedule_daily_summary_job(
-                    str(settings.company_id),
-                    time_str
-                )
+        for minute_at in minutes:
+            minute = time(minute_at.hour, minute_at.minute)
+            company_ids = _scheduled_company_ids(
+                db,
+                NotificationSettings.daily_summary_time >= minute,
+                NotificationSettings.daily_summary_time <= time(minute.hour, minute.minute, 59, 999999)
+            )
+            if company_ids:
+                dispatched = _dispatch_companies(db, company_ids, today)
+                logger.info(f"Dispatched daily summaries for {dispatched} companies at {minute.strftime('%H:%M')}")
         
-        logger.info(f"Loaded {len(settings_list)} company schedules")
+        _last_dispatched_at = now
         
     except Exception as e:
-        logger.error(f"Error loading company schedules: {e}")
+        logger.error(f"Error dispatching daily summaries: {e}")
     finally:
         db.close()
 
 
-def start_scheduler():
-    """Inicia el scheduler y carga los jobs."""
-    if not scheduler.running:
-        scheduler.start()
-        logger.info("APScheduler started")
+def catch_up_missed_summaries(now: datetime = None) -> int:
+    """Genera los resúmenes de hoy que no se encolaron (p.ej. por una caída).
+    
+    Toma las empresas cuya hora ya pasó y no tienen notificaciones
+    encoladas hoy, y las procesa en lotes de CATCHUP_BATCH_SIZE con una
+    pausa entre lotes para no competir con el tráfico normal.
+    
+    Args:
+        now: Momento de referencia (default: ahora en Santiago)
+    
+    Returns:
+        Cantidad de empresas procesadas
+    """
+    now = now or datetime.now(SANTIAGO_TZ)
+    today = now.date()
+    minute = time(now.hour, now.minute)
+    start_of_day = SANTIAGO_TZ.localize(datetime.combine(today, time.min))
+    
+    db: Session = SessionLocal()
+    
+    try:
+        due = _scheduled_company_ids(db, NotificationSettings.daily_summary_time < minute)
+        if not due:
+            return 0
+        
+        queued = {
+            str(company_id)
+            for (company_id,) in db.query(NotificationQueue.company_id).filter(
+                NotificationQueue.scheduled_for >= start_of_day,
+                NotificationQueue.scheduled_for < now
+            ).distinct()
+        }
+        missed = [company_id for company_id in due if company_id not in queued]
+        if not missed:
+            return 0
+        
+        logger.info(f"Catching up {len(missed)} missed daily summaries for {today}")
+        
+        dispatched = 0
+        for i in range(0, len(missed), CATCHUP_BATCH_SIZE):
+            if _catchup_stop.is_set():
+                logger.info("Summary catch-up interrupted (not leader)")
+                break
+            dispatched += _dispatch_companies(db, missed[i:i + CATCHUP_BATCH_SIZE], today)
+            if i + CATCHUP_BATCH_SIZE < len(missed):
+                _catchup_stop.wait(CATCHUP_BATCH_DELAY_SECONDS)
         
-        # Cargar schedules de empresas
-        load_all_company_schedules()
+        logger.info(f"Summary catch-up finished: {dispatched} companies")
+        return dispatched
+        
+    except Exception as e:
+        logger.error(f"Error catching up daily summaries: {e}")
+        return 0
+    finally:
+        db.close()
+
+
+def _remove_legacy_company_jobs():
+    """Elimina jobs persistidos por versiones anteriores.
+    
+    - daily_summary_<company_id>: un CronTrigger por empresa
+    - summary_schedule_reconcile: sincronizaba un índice en memoria de horarios
+    """
+    for job in scheduler.get_jobs():
+        if job.id.startswith('daily_summary_') and job.id != 'daily_summary_dispatcher':
+            scheduler.remove_job(job.id)
+            logger.info(f"Removed legacy job {job.id}")
+    
+    try:
+        scheduler.remove_job('summary_schedule_reconcile')
+        logger.info("Removed legacy job summary_schedule_reconcile")
+    except JobLookupError:
+        pass
+
+
+def _register_system_jobs():
+    """Registra los jobs globales (idempotente vía replace_existing)."""
+    # Registrar dispatcher de resúmenes diarios (cada minuto)
+    scheduler.add_job(
+                func=dispatch_daily_summaries,
+                trigger=CronTrigger(minute='*', timezone=SANTIAGO_TZ),
+                id='daily_summary_dispatcher',
+                replace_existing=True,
+                name='Daily summary dispatcher'
+            )
+    logger.info("Daily summary dispatcher registered (every minute)")
 
     # Registrar job de monitoreo de alertas cada 10 minutos
     scheduler.add_job(
@@ -197,9 +452,78 @@ def start_scheduler():
             )
     logger.info("Alert monitoring job registered (every 10 minutes)")
 
+    # Registrar job diario de autopago (antes de los resúmenes diarios)
+    scheduler.add_job(
+                func=run_autopay,
+                trigger=CronTrigger(hour=0, minute=5, timezone=SANTIAGO_TZ),
+                id='autopay_daily',
+                replace_existing=True,
+                name='Daily autopay execution'
+            )
+    logger.info("Autopay job registered (daily at 00:05)")
+
+    # Registrar job nocturno pending -> overdue (después del autopago)
+    scheduler.add_job(
+                func=run_overdue_transition,
+                trigger=CronTrigger(hour=0, minute=15, timezone=SANTIAGO_TZ),
+                id='overdue_transition',
+                replace_existing=True,
+                name='Nightly overdue transition'
+            )
+    logger.info("Overdue transition job registered (daily at 00:15)")
+
+
+def _on_elected():
+    """Este proceso es el líder: arranca (o reanuda) el scheduler con los jobs persistidos."""
+    if scheduler.state == STATE_STOPPED:
+        scheduler.start()
+        logger.info("APScheduler started")
+    elif scheduler.state == STATE_PAUSED:
+        scheduler.resume()
+        logger.info("APScheduler resumed (leader again)")
+
+    _remove_legacy_company_jobs()
+    _register_system_jobs()
+    
+    # Recuperar en segundo plano los resúmenes perdidos mientras no había líder
+    _catchup_stop.clear()
+    scheduler.add_job(
+                func=catch_up_missed_summaries,
+                id='summary_catchup',
+                replace_existing=True,
+                name='Missed daily summaries catch-up'
+            )
+    
+    # Un solo consumidor de la cola (el del líder) evita envíos duplicados
+    notification_consumer.start()
+
+
+def _on_demoted():
+    """Este proceso dejó de ser líder: deja de ejecutar jobs."""
+    global _last_dispatched_at
+    
+    _catchup_stop.set()
+    _last_dispatched_at = None
+    notification_consumer.stop()
+    
+    # Pausar en vez de apagar, para poder reanudar si se recupera el liderazgo
+    if scheduler.state == STATE_RUNNING:
+        scheduler.pause()
+        logger.info("APScheduler paused (not leader)")
+
+
+# Solo el proceso líder ejecuta jobs; el resto queda en espera como respaldo
+leader_election = LeaderElection(engine, on_elected=_on_elected, on_demoted=_on_demoted)
+
+
+def start_scheduler():
+    """Participa en la elección de líder; el líder inicia el scheduler y carga los jobs."""
+    leader_election.start()
+
 
 def shutdown_scheduler():
-    """Detiene el scheduler."""
+    """Cede el liderazgo y detiene el scheduler."""
+    leader_election.stop()
     if scheduler.running:
         scheduler.shutdown()
         logger.info("APScheduler shut down")
@@ -14,6 +14,10 @@ from app.schemas.notification_queue import (
     NotificationQueueInDB,
     NotificationQueueResponse,
 )
+from app.schemas.audit_log import (
+    AuditLogResponse,
+    AuditLogPage,
+)
 
 __all__ = [
     # Notification Settings
@@ -28,4 +32,7 @@ __all__ = [
     "NotificationQueueUpdate",
     "NotificationQueueInDB",
     "NotificationQueueResponse",
+    # Audit Log
+    "AuditLogResponse",
+    "AuditLogPage",
 ]
@@ -0,0 +1,29 @@
+"""Pydantic schemas for audit log history"""
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from pydantic import BaseModel, Field, ConfigDict
+from uuid import UUID
+
+
+class AuditLogResponse(BaseModel):
+    """Schema for a single audit log entry"""
+    id: UUID
+    company_id: UUID
+    entity_type: str
+    entity_id: UUID
+    action: str
+    changed_by: Optional[UUID] = None
+    before_data: Optional[Dict[str, Any]] = None
+    after_data: Optional[Dict[str, Any]] = None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class AuditLogPage(BaseModel):
+    """Schema for a keyset-paginated page of audit log entries"""
+    items: List[AuditLogResponse]
+    next_cursor: Optional[str] = Field(
+        default=None,
+        description="Opaque cursor for the next page, null when there are no more entries",
+    )
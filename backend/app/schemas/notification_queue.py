@@ -33,6 +33,9 @@ class NotificationQueueInDB(NotificationQueueBase):
     notification_date: datetime
     sent_at: Optional[datetime] = None
     error_message: Optional[str] = None
+    attempts: int = 0
+    last_error: Optional[str] = None
+    next_attempt_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
     
@@ -9,6 +9,7 @@ class RecurringTemplateBase(BaseModel):
     total_installments: int
     installment_amount: Decimal
     start_control_date: date
+    installments_paid_before: int = 0
     autopay_enabled: bool = False
     autopay_day: Optional[int] = None
 
@@ -21,8 +22,11 @@ class RecurringTemplateUpdate(RecurringTemplateBase):
 class RecurringTemplate(RecurringTemplateBase):
     id: UUID
     company_id: UUID
-    installments_paid_before: int
     created_at: datetime
     updated_at: datetime
 
     model_config = ConfigDict(from_attributes=True)
+
+class MaterializeResult(BaseModel):
+    templates: int
+    created: int
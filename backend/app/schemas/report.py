@@ -0,0 +1,39 @@
+"""Pydantic schemas for reports"""
+from datetime import date
+from typing import List
+from pydantic import BaseModel, Field
+from uuid import UUID
+
+
+class ForecastMonth(BaseModel):
+    """Projected outflow for one month"""
+    month: str = Field(..., description="Month in YYYY-MM format")
+    payments_outflow: float = Field(..., description="Unpaid payments due this month (overdue ones fall in the first month)")
+    recurring_outflow: float = Field(..., description="Recurring installments not yet materialized as payments")
+    outflow: float = Field(..., description="Total projected outflow")
+    cumulative_outflow: float = Field(..., description="Outflow accumulated up to this month")
+    balance: float = Field(..., description="opening_balance minus cumulative_outflow")
+
+
+class ForecastResponse(BaseModel):
+    """Schema for the cash-flow forecast response"""
+    company_id: UUID
+    as_of: date
+    months: int
+    opening_balance: float
+    items: List[ForecastMonth]
+
+
+class PaymentTotalsItem(BaseModel):
+    """Payment count and amount for one period and status"""
+    period_start: date = Field(..., description="First day of the period (Monday for weeks)")
+    status: str
+    payment_count: int
+    total_amount: float
+
+
+class PaymentTotalsResponse(BaseModel):
+    """Schema for payment totals read from the daily rollup"""
+    company_id: UUID
+    period: str
+    items: List[PaymentTotalsItem]
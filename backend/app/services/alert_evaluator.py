@@ -3,7 +3,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, or_
 import pytz
 
 from app.models.notification_queue import NotificationQueue
@@ -79,10 +79,15 @@ def evaluate_system_alerts(db: Session) -> List[Dict[str, Any]]:
         # Rule 2: Check for stuck pending notifications
         stuck_threshold = now - timedelta(hours=STUCK_THRESHOLD_HOURS)
         
+        # Retries waiting on backoff are not stuck until their next attempt is overdue
         stuck_count = db.query(func.count(NotificationQueue.id)).filter(
             and_(
                 NotificationQueue.status == "pending",
-                NotificationQueue.scheduled_for <= stuck_threshold
+                NotificationQueue.scheduled_for <= stuck_threshold,
+                or_(
+                    NotificationQueue.next_attempt_at.is_(None),
+                    NotificationQueue.next_attempt_at <= stuck_threshold
+                )
             )
         ).scalar() or 0
         
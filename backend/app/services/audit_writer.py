@@ -0,0 +1,434 @@
+"""Captura asíncrona de auditoría basada en eventos de sesión SQLAlchemy.
+
+Arquitectura:
+- before_flush: toma la imagen "antes" de cada entidad auditada modificada
+- after_flush: toma la imagen "después" (los IDs ya están asignados)
+- after_commit: envía los diffs a una cola en memoria acotada
+- Un hilo escritor vacía la cola en audit_logs con INSERT por lotes
+
+Así las mutaciones de pagos no pagan la escritura de auditoría en su
+propia transacción. Ninguna entrada se descarta en silencio:
+- Con la cola llena, quien encola espera hasta AUDIT_ENQUEUE_TIMEOUT_SECONDS
+  y luego escribe lo que no cupo de forma síncrona
+- Un lote que falla se reintenta con backoff y, si sigue fallando, se
+  vuelve a encolar
+- Solo se pierde lo que no se pudo escribir ni reencolar; cada descarte se
+  registra como error crítico y se cuenta en las métricas
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.audit_log import AuditLog
+from app.models.notification_settings import NotificationSettings
+from app.models.payment import Payment
+from app.models.recurring_template import RecurringTemplate
+
+logger = logging.getLogger(__name__)
+
+# Configuración
+AUDIT_QUEUE_MAXSIZE = int(os.getenv('AUDIT_QUEUE_MAXSIZE', '10000'))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '500'))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv('AUDIT_FLUSH_INTERVAL_SECONDS', '2'))
+AUDIT_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv('AUDIT_ENQUEUE_TIMEOUT_SECONDS', '1'))
+# Reintentos de un lote fallido antes de reencolarlo (backoff exponencial)
+AUDIT_WRITE_RETRIES = int(os.getenv('AUDIT_WRITE_RETRIES', '3'))
+AUDIT_RETRY_BASE_SECONDS = float(os.getenv('AUDIT_RETRY_BASE_SECONDS', '0.5'))
+
+# Entidades auditadas -> entity_type
+AUDITED_ENTITIES = {
+    Payment: 'payment',
+    RecurringTemplate: 'recurring_template',
+    NotificationSettings: 'notification_settings',
+}
+
+_PENDING_KEY = 'audit_pending'
+_READY_KEY = 'audit_ready'
+
+
+def to_json_value(value: Any) -> Any:
+    """Convierte un valor de columna a un tipo serializable en JSON."""
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _snapshot(obj) -> Dict[str, Any]:
+    """Imagen actual de las columnas de una entidad."""
+    state = inspect(obj)
+    return {
+        attr.key: to_json_value(getattr(obj, attr.key))
+        for attr in state.mapper.column_attrs
+    }
+
+
+def _changed_before_image(obj) -> Dict[str, Any]:
+    """Valores previos de las columnas modificadas y aún no enviadas a la BD."""
+    state = inspect(obj)
+    data = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if history.has_changes():
+            data[attr.key] = to_json_value(history.deleted[0]) if history.deleted else None
+    return data
+
+
+def _track_previous_values(model) -> None:
+    """Fuerza cargar el valor previo al asignar un atributo expirado.
+
+    Sin active_history, asignar sobre un atributo no cargado pierde el valor
+    anterior y la imagen "antes" quedaría vacía.
+    """
+    for attr in inspect(model).column_attrs:
+        event.listen(getattr(model, attr.key), 'set', _noop_set, active_history=True)
+
+
+def _noop_set(target, value, oldvalue, initiator):
+    return value
+
+
+class AuditQueue:
+    """Cola acotada en memoria con métricas de profundidad, desbordes y descartes."""
+
+    def __init__(self, maxsize: int = AUDIT_QUEUE_MAXSIZE):
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=maxsize)
+        self.maxsize = maxsize
+        self.enqueued = 0
+        self.overflowed = 0
+        self.requeued = 0
+        self.dropped = 0
+
+    def put_many(
+        self,
+        entries: List[Dict[str, Any]],
+        timeout: float = AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+    ) -> List[Dict[str, Any]]:
+        """Encola entradas esperando hasta `timeout` (en total) si la cola está llena.
+
+        Returns:
+            Entradas que no cupieron; quien llama debe escribirlas
+            (ver AuditWriter.write_overflow)
+        """
+        deadline = time.monotonic() + timeout
+        for index, entry in enumerate(entries):
+            try:
+                self._queue.put(entry, timeout=max(0.0, deadline - time.monotonic()))
+                self.enqueued += 1
+            except queue.Full:
+                overflow = entries[index:]
+                self.overflowed += len(overflow)
+                logger.warning(f"Audit queue full, writing {len(overflow)} entries synchronously")
+                return overflow
+        return []
+
+    def requeue(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Vuelve a encolar un lote sin bloquear; retorna lo que no cupo."""
+        for index, entry in enumerate(entries):
+            try:
+                self._queue.put_nowait(entry)
+                self.requeued += 1
+            except queue.Full:
+                return entries[index:]
+        return []
+
+    def record_dropped(self, entries: List[Dict[str, Any]], reason: str) -> None:
+        """Cuenta y registra entradas perdidas definitivamente."""
+        self.dropped += len(entries)
+        logger.critical(f"Dropping {len(entries)} audit entries ({reason}); total dropped: {self.dropped}")
+        for entry in entries:
+            logger.error(
+                f"Dropped audit entry {entry['entity_type']} "
+                f"{entry['entity_id']} ({entry['action']})"
+            )
+
+    def get_batch(self, max_items: int, timeout: float) -> List[Dict[str, Any]]:
+        """Espera hasta timeout por la primera entrada y luego drena hasta max_items."""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+        except queue.Empty:
+            return batch
+
+        while len(batch) < max_items:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class AuditWriter:
+    """Hilo que inserta por lotes las entradas de auditoría encoladas."""
+
+    def __init__(
+        self,
+        audit_queue: AuditQueue,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL_SECONDS,
+        write_retries: int = AUDIT_WRITE_RETRIES,
+        retry_base_seconds: float = AUDIT_RETRY_BASE_SECONDS,
+    ):
+        self.audit_queue = audit_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.write_retries = write_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.written = 0
+        self.sync_written = 0
+        self.failed = 0
+        self.retries = 0
+        self.batches = 0
+        self.last_flush_at: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='audit-writer',
+            daemon=True,
+        )
+        self._thread.start()
+        logger.info("Audit writer started")
+
+    def stop(self, timeout: float = 10) -> None:
+        """Detiene el hilo y vacía lo que quede en la cola."""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout=timeout)
+        self.flush()
+        remaining = self.audit_queue.get_batch(self.audit_queue.maxsize, timeout=0)
+        if remaining:
+            self.audit_queue.record_dropped(remaining, "writer stopped")
+        logger.info("Audit writer stopped")
+
+    def flush(self) -> int:
+        """Escribe de forma síncrona todo lo encolado. Retorna filas escritas.
+
+        Si un lote no se puede escribir se detiene (el lote vuelve a la cola)
+        en vez de reintentar indefinidamente.
+        """
+        total = 0
+        while True:
+            batch = self.audit_queue.get_batch(self.batch_size, timeout=0)
+            if not batch:
+                return total
+            written = self._write(batch)
+            if not written:
+                return total
+            total += written
+
+    def write_overflow(self, entries: List[Dict[str, Any]]) -> None:
+        """Escribe en el hilo que llama las entradas que no cupieron en la cola."""
+        for i in range(0, len(entries), self.batch_size):
+            written = self._write(entries[i:i + self.batch_size], retries=0)
+            self.sync_written += written
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self.audit_queue.get_batch(self.batch_size, self.flush_interval)
+            if batch:
+                self._write(batch)
+
+    def _insert(self, batch: List[Dict[str, Any]]) -> None:
+        db: Session = SessionLocal()
+        try:
+            db.execute(insert(AuditLog), batch)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _write(self, batch: List[Dict[str, Any]], retries: Optional[int] = None) -> int:
+        """Inserta un lote reintentando con backoff; si sigue fallando lo reencola.
+
+        Returns:
+            Filas escritas (0 si el lote no se pudo escribir)
+        """
+        retries = self.write_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                self._insert(batch)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} audit entries (attempt {attempt + 1}/{retries + 1}): {e}")
+                if attempt < retries:
+                    self.retries += 1
+                    time.sleep(self.retry_base_seconds * 2 ** attempt)
+                continue
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_at = datetime.utcnow()
+            return len(batch)
+
+        self.failed += len(batch)
+        leftover = self.audit_queue.requeue(batch)
+        if leftover:
+            self.audit_queue.record_dropped(leftover, "write failed and queue is full")
+        else:
+            logger.error(f"Requeued {len(batch)} audit entries after write failures")
+        return 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queue_depth": self.audit_queue.depth(),
+            "queue_maxsize": self.audit_queue.maxsize,
+            "enqueued": self.audit_queue.enqueued,
+            "overflowed": self.audit_queue.overflowed,
+            "requeued": self.audit_queue.requeued,
+            "dropped": self.audit_queue.dropped,
+            "written": self.written,
+            "sync_written": self.sync_written,
+            "failed": self.failed,
+            "retries": self.retries,
+            "batches": self.batches,
+            "last_flush_at": self.last_flush_at.isoformat() if self.last_flush_at else None,
+        }
+
+
+audit_queue = AuditQueue()
+audit_writer = AuditWriter(audit_queue)
+
+
+def make_audit_entry(
+    company_id,
+    entity_type: str,
+    entity_id,
+    action: str,
+    before_data: Optional[Dict[str, Any]] = None,
+    after_data: Optional[Dict[str, Any]] = None,
+    changed_by=None,
+) -> Dict[str, Any]:
+    """Construye una fila de audit_logs lista para el INSERT por lotes."""
+    return {
+        "company_id": company_id,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "action": action,
+        "changed_by": changed_by,
+        "before_data": before_data,
+        "after_data": after_data,
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _enqueue(entries: List[Dict[str, Any]]) -> None:
+    overflow = audit_queue.put_many(entries)
+    if overflow:
+        audit_writer.write_overflow(overflow)
+
+
+def enqueue_audit_entries(entries: List[Dict[str, Any]]) -> None:
+    """Encola entradas construidas fuera de la ORM (p.ej. UPDATE masivos)."""
+    if entries:
+        _enqueue(entries)
+
+
+def _before_flush(session: Session, flush_context, instances) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, [])
+
+    for obj in session.new:
+        if type(obj) in AUDITED_ENTITIES:
+            pending.append((obj, 'create', None))
+
+    for obj in session.dirty:
+        if type(obj) in AUDITED_ENTITIES:
+            before = _changed_before_image(obj)
+            if before:
+                pending.append((obj, 'update', before))
+
+    for obj in session.deleted:
+        if type(obj) in AUDITED_ENTITIES:
+            pending.append((obj, 'delete', _snapshot(obj)))
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    ready = session.info.setdefault(_READY_KEY, [])
+    for obj, action, before in pending:
+        after = None if action == 'delete' else _snapshot(obj)
+        if action == 'update':
+            # Guardar solo las columnas que cambiaron
+            after = {k: after[k] for k in before}
+
+        ready.append(make_audit_entry(
+            company_id=obj.company_id,
+            entity_type=AUDITED_ENTITIES[type(obj)],
+            entity_id=obj.id,
+            action=action,
+            before_data=before,
+            after_data=after,
+        ))
+
+
+def _after_commit(session: Session) -> None:
+    ready = session.info.pop(_READY_KEY, None)
+    if ready:
+        _enqueue(ready)
+
+
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_READY_KEY, None)
+
+
+def install_audit_hooks() -> None:
+    """Registra los listeners de sesión (idempotente)."""
+    if event.contains(Session, 'before_flush', _before_flush):
+        return
+    for model in AUDITED_ENTITIES:
+        _track_previous_values(model)
+    event.listen(Session, 'before_flush', _before_flush)
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
+    logger.info("Audit session hooks installed")
+
+
+def start_audit_writer() -> None:
+    """Instala los hooks y arranca el escritor en segundo plano."""
+    install_audit_hooks()
+    audit_writer.start()
+
+
+def shutdown_audit_writer() -> None:
+    """Detiene el escritor vaciando la cola pendiente."""
+    audit_writer.stop()
+
+
+def get_audit_metrics() -> Dict[str, Any]:
+    """Métricas de la cola de auditoría para health checks."""
+    return audit_writer.metrics()
@@ -0,0 +1,124 @@
+"""Ejecución diaria de autopago con UPDATE masivos por bloques."""
+
+import logging
+from datetime import date, datetime
+from typing import Dict, Optional, Set
+
+import pytz
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.payment import Payment
+from app.services.audit_writer import enqueue_audit_entries, make_audit_entry
+from app.services.forecast import invalidate_company_forecast
+
+logger = logging.getLogger(__name__)
+
+# Timezone para Chile
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+# Filas por UPDATE; cada bloque es una transacción corta
+AUTOPAY_CHUNK_SIZE = 1000
+
+AUTOPAY_PAYMENT_METHOD = 'autopay'
+# overdue incluido: un pago que el job nocturno ya marcó vencido se sigue pagando
+AUTOPAY_ELIGIBLE_STATUSES = ('pending', 'scheduled', 'overdue')
+
+
+def _pay_chunk(db: Session, today: date, paid_at: datetime, chunk_size: int):
+    """Marca como pagado un bloque de pagos elegibles y retorna las filas afectadas.
+
+    Elegible: autopay = true, status pending/scheduled/overdue y vencimiento <= hoy
+    (incluye los días que el job no corrió). El subselect recorre
+    idx_payments_autopay_due_date (parcial sobre exactamente ese predicado)
+    y SKIP LOCKED evita esperar filas que otra transacción está editando.
+    """
+    eligible_ids = (
+        select(Payment.id)
+        .where(
+            Payment.autopay == True,
+            Payment.status.in_(AUTOPAY_ELIGIBLE_STATUSES),
+            Payment.due_date <= today
+        )
+        .order_by(Payment.due_date)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+
+    stmt = (
+        update(Payment)
+        .where(Payment.id.in_(eligible_ids))
+        .values(
+            status='paid',
+            paid_at=paid_at,
+            payment_method=func.coalesce(Payment.payment_method, AUTOPAY_PAYMENT_METHOD),
+            updated_at=paid_at,
+        )
+        .returning(Payment.id, Payment.company_id)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).all()
+
+
+def run_autopay(today: Optional[date] = None, chunk_size: int = AUTOPAY_CHUNK_SIZE) -> Dict:
+    """Paga todos los pagos con autopago vencidos a la fecha, en todas las empresas.
+
+    Es seguro re-ejecutarlo: solo toma pagos aún no pagados, así que
+    una segunda corrida no encuentra nada. El costo depende de la cantidad
+    de pagos elegibles, no de la cantidad de empresas.
+
+    Args:
+        today: Fecha de ejecución (default: hoy en Santiago)
+        chunk_size: Filas por UPDATE
+
+    Returns:
+        Dict con pagos procesados y empresas afectadas
+    """
+    now = datetime.now(SANTIAGO_TZ)
+    today = today or now.date()
+    db: Session = SessionLocal()
+
+    paid = 0
+    companies: Set[str] = set()
+
+    try:
+        while True:
+            rows = _pay_chunk(db, today, now, chunk_size)
+            db.commit()
+
+            if not rows:
+                break
+
+            paid += len(rows)
+            companies.update(str(row.company_id) for row in rows)
+            enqueue_audit_entries([
+                make_audit_entry(
+                    company_id=row.company_id,
+                    entity_type='payment',
+                    entity_id=row.id,
+                    action='autopay',
+                    after_data={
+                        "status": "paid",
+                        "paid_at": now.isoformat(),
+                    },
+                )
+                for row in rows
+            ])
+
+            if len(rows) < chunk_size:
+                break
+
+        for company_id in companies:
+            invalidate_company_forecast(company_id)
+
+        logger.info(f"Autopay run for {today}: {paid} payments paid across {len(companies)} companies")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error running autopay for {today}: {e}", exc_info=True)
+    finally:
+        db.close()
+
+    return {"paid": paid, "companies": sorted(companies)}
@@ -0,0 +1,256 @@
+"""Proyección de flujo de caja mensual vectorizada con NumPy y cacheada por empresa.
+
+La clave del cache incluye company_data_versions.version, que los triggers
+suben en la misma transacción que cualquier cambio de pagos o plantillas:
+un cambio hecho en otro proceso (worker, job nocturno) es un cache miss en
+la API sin esperar el TTL. La invalidación explícita solo libera memoria.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pytz
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.models.company_data_version import CompanyDataVersion
+from app.models.payment import Payment
+from app.models.recurring_template import RecurringTemplate
+
+logger = logging.getLogger(__name__)
+
+# Timezone para Chile
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+FORECAST_CACHE_TTL_SECONDS = int(os.getenv('FORECAST_CACHE_TTL_SECONDS', '3600'))
+MAX_FORECAST_MONTHS = 120
+
+UNPAID_STATUSES = ('pending', 'scheduled', 'overdue')
+
+
+def _month_index(value: date) -> int:
+    """Mes como entero absoluto (año * 12 + mes - 1)."""
+    return value.year * 12 + value.month - 1
+
+
+def _month_label(index: int) -> str:
+    return f"{index // 12:04d}-{index % 12 + 1:02d}"
+
+
+def _payment_outflow(db: Session, company_id, base_month: int, months: int) -> np.ndarray:
+    """Suma por mes de los pagos no pagados; los vencidos caen en el primer mes."""
+    horizon_end = base_month + months
+    end_date = date(horizon_end // 12, horizon_end % 12 + 1, 1)
+
+    # Agregar por día en la BD: decenas de miles de pagos caen en pocos cientos de fechas
+    rows = db.execute(
+        select(Payment.due_date, func.sum(Payment.amount)).where(
+            Payment.company_id == company_id,
+            Payment.status.in_(UNPAID_STATUSES),
+            Payment.due_date < end_date
+        ).group_by(Payment.due_date)
+    ).all()
+
+    if not rows:
+        return np.zeros(months)
+
+    due = np.array([row[0] for row in rows], dtype='datetime64[M]')
+    amounts = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+
+    # datetime64[M] cuenta meses desde 1970-01
+    buckets = due.astype(np.int64) + 1970 * 12 - base_month
+    np.clip(buckets, 0, None, out=buckets)
+
+    return np.bincount(buckets, weights=amounts, minlength=months)[:months]
+
+
+def _recurring_outflow(db: Session, company_id, base_month: int, months: int) -> np.ndarray:
+    """Suma por mes de las cuotas aún no materializadas de las plantillas."""
+    templates = db.execute(
+        select(
+            RecurringTemplate.id,
+            RecurringTemplate.start_control_date,
+            RecurringTemplate.installments_paid_before,
+            RecurringTemplate.total_installments,
+            RecurringTemplate.installment_amount,
+        ).where(RecurringTemplate.company_id == company_id)
+    ).all()
+
+    if not templates:
+        return np.zeros(months)
+
+    count = len(templates)
+    start_month = np.fromiter((_month_index(t[1]) for t in templates), dtype=np.int64, count=count)
+    first = np.fromiter((t[2] + 1 for t in templates), dtype=np.int64, count=count)
+    total = np.fromiter((t[3] for t in templates), dtype=np.int64, count=count)
+    amount = np.fromiter((t[4] for t in templates), dtype=np.float64, count=count)
+
+    # Número de cuota de cada plantilla en cada mes del horizonte (T x M)
+    horizon = base_month + np.arange(months, dtype=np.int64)
+    numbers = first[:, None] + (horizon[None, :] - start_month[:, None])
+    active = (numbers >= first[:, None]) & (numbers <= total[:, None])
+
+    # Excluir cuotas ya materializadas (se cuentan como pagos o ya están pagadas)
+    template_index = {t[0]: i for i, t in enumerate(templates)}
+    materialized = db.execute(
+        select(Payment.template_id, Payment.installment_number).where(
+            Payment.company_id == company_id,
+            Payment.template_id.isnot(None),
+            Payment.installment_number.isnot(None)
+        )
+    ).all()
+
+    if materialized:
+        rows_idx = np.fromiter((template_index.get(m[0], -1) for m in materialized), dtype=np.int64, count=len(materialized))
+        numbers_done = np.fromiter((m[1] for m in materialized), dtype=np.int64, count=len(materialized))
+        known = rows_idx >= 0
+        rows_idx, numbers_done = rows_idx[known], numbers_done[known]
+        cols = numbers_done - first[rows_idx] + start_month[rows_idx] - base_month
+        in_horizon = (cols >= 0) & (cols < months)
+        active[rows_idx[in_horizon], cols[in_horizon]] = False
+
+    return (active * amount[:, None]).sum(axis=0)
+
+
+def compute_forecast(db: Session, company_id, months: int, today: Optional[date] = None) -> Dict:
+    """Calcula la salida mensual proyectada para los próximos N meses.
+
+    Args:
+        db: Sesión de base de datos
+        company_id: UUID de la empresa
+        months: Meses a proyectar (incluye el mes actual)
+        today: Fecha de referencia (default: hoy en Santiago)
+
+    Returns:
+        Dict con meses, salidas por origen y acumulado
+    """
+    today = today or datetime.now(SANTIAGO_TZ).date()
+    base_month = _month_index(today)
+
+    payments = _payment_outflow(db, company_id, base_month, months)
+    recurring = _recurring_outflow(db, company_id, base_month, months)
+    outflow = payments + recurring
+    cumulative = np.cumsum(outflow)
+
+    return {
+        "company_id": str(company_id),
+        "as_of": today.isoformat(),
+        "months": months,
+        "items": [
+            {
+                "month": _month_label(base_month + i),
+                "payments_outflow": round(float(payments[i]), 2),
+                "recurring_outflow": round(float(recurring[i]), 2),
+                "outflow": round(float(outflow[i]), 2),
+                "cumulative_outflow": round(float(cumulative[i]), 2),
+            }
+            for i in range(months)
+        ],
+    }
+
+
+class ForecastCache:
+    """Cache en memoria por empresa con TTL e invalidación explícita.
+
+    Clave: (empresa, meses, fecha, versión de datos de la empresa).
+    """
+
+    def __init__(self, ttl_seconds: int = FORECAST_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Tuple[str, int, str, int], Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, int, str, int]) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def set(self, key: Tuple[str, int, str, int], value: Dict) -> None:
+        with self._lock:
+            # Las entradas de versiones o días anteriores ya no se van a leer
+            for stale in [k for k in self._entries if k[:2] == key[:2]]:
+                del self._entries[stale]
+            self._entries[key] = (time.monotonic(), value)
+
+    def invalidate_company(self, company_id) -> None:
+        company_key = str(company_id)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == company_key]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+forecast_cache = ForecastCache()
+
+
+def get_company_data_version(db: Session, company_id) -> int:
+    """Versión actual de los pagos y plantillas de la empresa (0 si nunca cambiaron)."""
+    version = db.execute(
+        select(CompanyDataVersion.version).where(CompanyDataVersion.company_id == company_id)
+    ).scalar()
+    return version or 0
+
+
+def get_company_forecast(db: Session, company_id, months: int) -> Dict:
+    """Forecast cacheado por fecha y versión de datos de la empresa.
+
+    Leer la versión es una búsqueda por PK; si cambió (en cualquier
+    proceso) o cambió el día, se recalcula.
+    """
+    today = datetime.now(SANTIAGO_TZ).date()
+    key = (str(company_id), months, today.isoformat(), get_company_data_version(db, company_id))
+
+    cached = forecast_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = compute_forecast(db, company_id, months, today)
+    forecast_cache.set(key, result)
+    return result
+
+
+def invalidate_company_forecast(company_id) -> None:
+    """Descarta el forecast cacheado de una empresa (p.ej. tras UPDATE masivos)."""
+    forecast_cache.invalidate_company(company_id)
+
+
+_DIRTY_COMPANIES_KEY = 'forecast_dirty_companies'
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    dirty = session.info.setdefault(_DIRTY_COMPANIES_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Payment, RecurringTemplate)):
+            dirty.add(str(obj.company_id))
+
+
+def _after_commit(session: Session) -> None:
+    for company_id in session.info.pop(_DIRTY_COMPANIES_KEY, ()):
+        forecast_cache.invalidate_company(company_id)
+
+
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_DIRTY_COMPANIES_KEY, None)
+
+
+def install_forecast_invalidation() -> None:
+    """Invalida el cache al confirmar cambios ORM de pagos o plantillas (idempotente)."""
+    if event.contains(Session, 'after_flush', _after_flush):
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
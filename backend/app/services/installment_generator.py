@@ -0,0 +1,320 @@
+"""Materialización de cuotas de RecurringTemplate en filas de payments."""
+
+import calendar
+import logging
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pytz
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models.payment import Payment
+from app.models.recurring_template import RecurringTemplate
+from app.services.audit_writer import make_audit_entry, to_json_value
+
+logger = logging.getLogger(__name__)
+
+# Timezone para Chile
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+# Filas por sentencia INSERT
+INSERT_CHUNK_SIZE = 5000
+
+# Cuotas que aún se pueden modificar al editar la plantilla
+UNPAID_STATUSES = ('pending', 'scheduled', 'overdue')
+
+
+def add_months(start: date, months: int) -> date:
+    """Suma meses a una fecha ajustando al último día del mes si es necesario.
+
+    Ej: 31-ene + 1 mes = 28/29-feb
+    """
+    month_index = start.month - 1 + months
+    year = start.year + month_index // 12
+    month = month_index % 12 + 1
+    day = min(start.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
+def installment_due_date(template: RecurringTemplate, installment_number: int) -> date:
+    """Fecha de vencimiento de una cuota.
+
+    La primera cuota controlada (installments_paid_before + 1) vence en
+    start_control_date y las siguientes mensualmente.
+    """
+    offset = installment_number - (template.installments_paid_before + 1)
+    return add_months(template.start_control_date, offset)
+
+
+def iter_installment_rows(template: RecurringTemplate) -> Iterator[Dict]:
+    """Genera las filas de payments de las cuotas controladas de una plantilla."""
+    first = template.installments_paid_before + 1
+    for number in range(first, template.total_installments + 1):
+        yield {
+            "company_id": template.company_id,
+            "template_id": template.id,
+            "installment_number": number,
+            "installment_total": template.total_installments,
+            "due_date": installment_due_date(template, number),
+            "amount": template.installment_amount,
+            "status": "pending",
+            "autopay": template.autopay_enabled,
+        }
+
+
+def _insert_ignore_duplicates(db: Session):
+    """INSERT ... ON CONFLICT DO NOTHING sobre unique_company_template_installment."""
+    if db.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(Payment).on_conflict_do_nothing(
+            constraint='unique_company_template_installment'
+        )
+    return sqlite.insert(Payment).on_conflict_do_nothing(
+        index_elements=['company_id', 'template_id', 'installment_number']
+    )
+
+
+def _chunks(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert_installments(db: Session, rows: Iterable[Dict]) -> List[Dict]:
+    """Inserta cuotas por bloques y retorna sus entradas de auditoría 'create'.
+
+    El INSERT masivo no pasa por los hooks de sesión del ORM, así que la
+    auditoría se arma desde el RETURNING (solo las filas realmente creadas;
+    las que ya existían se ignoran vía ON CONFLICT DO NOTHING).
+    """
+    stmt = _insert_ignore_duplicates(db).returning(
+        Payment.id,
+        Payment.company_id,
+        Payment.template_id,
+        Payment.installment_number,
+        Payment.installment_total,
+        Payment.due_date,
+        Payment.amount,
+        Payment.status,
+        Payment.autopay,
+    )
+    audit_entries = []
+    for chunk in _chunks(rows, INSERT_CHUNK_SIZE):
+        for row in db.execute(stmt, chunk):
+            audit_entries.append(make_audit_entry(
+                company_id=row.company_id,
+                entity_type='payment',
+                entity_id=row.id,
+                action='create',
+                after_data={
+                    "template_id": to_json_value(row.template_id),
+                    "installment_number": row.installment_number,
+                    "installment_total": row.installment_total,
+                    "due_date": to_json_value(row.due_date),
+                    "amount": to_json_value(row.amount),
+                    "status": row.status,
+                    "autopay": row.autopay,
+                },
+            ))
+    return audit_entries
+
+
+def materialize_templates(
+    db: Session,
+    templates: Iterable[RecurringTemplate],
+) -> Tuple[Dict[str, int], List[Dict]]:
+    """Inserta por lotes las cuotas de las plantillas dadas.
+
+    Es idempotente: las cuotas ya existentes se ignoran vía
+    ON CONFLICT DO NOTHING, así que re-ejecutar solo crea las faltantes.
+    No hace commit: las entradas de auditoría de los pagos creados se
+    retornan para que quien llama las encole después del commit.
+
+    Args:
+        db: Sesión de base de datos
+        templates: Plantillas a expandir
+
+    Returns:
+        Tupla (dict con cantidad de plantillas procesadas y pagos creados;
+        entradas de auditoría pendientes)
+    """
+    template_count = 0
+
+    def rows():
+        nonlocal template_count
+        for template in templates:
+            template_count += 1
+            yield from iter_installment_rows(template)
+
+    audit_entries = _insert_installments(db, rows())
+    created = len(audit_entries)
+
+    logger.info(f"Materialized {template_count} templates: {created} payments created")
+
+    return {"templates": template_count, "created": created}, audit_entries
+
+
+def materialize_template(db: Session, template: RecurringTemplate) -> Tuple[Dict[str, int], List[Dict]]:
+    """Expande una sola plantilla."""
+    return materialize_templates(db, [template])
+
+
+def materialize_company_templates(db: Session, company_id) -> Tuple[Dict[str, int], List[Dict]]:
+    """Expande todas las plantillas de una empresa leyendo por bloques."""
+    templates = db.execute(
+        select(RecurringTemplate)
+        .where(RecurringTemplate.company_id == company_id)
+        .execution_options(yield_per=1000)
+    ).scalars()
+    return materialize_templates(db, templates)
+
+
+def propagate_template_changes(
+    db: Session,
+    template: RecurringTemplate,
+    previous_start_control_date: date,
+    previous_installments_paid_before: int,
+    today: Optional[date] = None,
+) -> Tuple[Dict[str, int], List[Dict]]:
+    """Aplica la edición de una plantilla a sus cuotas materializadas no pagadas.
+
+    Compara el plan nuevo contra las filas existentes y solo toca lo que
+    cambió:
+    - INSERT de las cuotas nuevas más allá de la última materializada y de
+      las que quedan bajo control al bajar installments_paid_before
+      (si la plantilla ya estaba materializada)
+    - UPDATE por PK de las cuotas no pagadas cuyo monto, total, autopago o
+      vencimiento difieren. El vencimiento se recalcula en las cuotas
+      futuras y, si cambió start_control_date o installments_paid_before,
+      en todas las no pagadas
+    - DELETE de las cuotas no pagadas que quedaron fuera del plan (después
+      de total_installments o dentro de installments_paid_before)
+
+    Las cuotas pagadas no se modifican. No hace commit: las entradas de
+    auditoría (create, update y delete) se retornan para que quien llama
+    las encole después del commit, y se pierdan si la transacción se
+    revierte.
+
+    Args:
+        db: Sesión de base de datos
+        template: Plantilla ya modificada (sin flush necesario)
+        previous_start_control_date: start_control_date antes de la edición
+        previous_installments_paid_before: installments_paid_before antes
+            de la edición
+        today: Fecha de referencia para las cuotas futuras (default: hoy en Santiago)
+
+    Returns:
+        Tupla (dict con cuotas creadas, actualizadas y eliminadas; entradas
+        de auditoría pendientes)
+    """
+    today = today or datetime.now(SANTIAGO_TZ).date()
+    existing = db.execute(
+        select(
+            Payment.id,
+            Payment.installment_number,
+            Payment.installment_total,
+            Payment.amount,
+            Payment.due_date,
+            Payment.status,
+            Payment.autopay,
+        ).where(
+            Payment.template_id == template.id,
+            Payment.installment_number.isnot(None)
+        )
+    ).all()
+
+    if not existing:
+        return {"created": 0, "updated": 0, "deleted": 0}, []
+
+    schedule_changed = (
+        previous_start_control_date != template.start_control_date
+        or previous_installments_paid_before != template.installments_paid_before
+    )
+    first_number = template.installments_paid_before + 1
+    unpaid = [row for row in existing if row.status in UNPAID_STATUSES]
+    removed = [
+        row for row in unpaid
+        if not first_number <= row.installment_number <= template.total_installments
+    ]
+    removed_ids = {row.id for row in removed}
+    audit_entries = []
+
+    # UPDATE: solo filas no pagadas del plan con algún valor distinto
+    changes = []
+    for row in unpaid:
+        if row.id in removed_ids:
+            continue
+        before, after = {}, {}
+        if row.amount != template.installment_amount:
+            before["amount"], after["amount"] = row.amount, template.installment_amount
+        if row.installment_total != template.total_installments:
+            before["installment_total"] = row.installment_total
+            after["installment_total"] = template.total_installments
+        if row.autopay != template.autopay_enabled:
+            before["autopay"], after["autopay"] = row.autopay, template.autopay_enabled
+        if schedule_changed or row.due_date >= today:
+            due_date = installment_due_date(template, row.installment_number)
+            if row.due_date != due_date:
+                before["due_date"], after["due_date"] = row.due_date, due_date
+        if after:
+            changes.append({"id": row.id, **after})
+            audit_entries.append(make_audit_entry(
+                company_id=template.company_id,
+                entity_type='payment',
+                entity_id=row.id,
+                action='update',
+                before_data={k: to_json_value(v) for k, v in before.items()},
+                after_data={k: to_json_value(v) for k, v in after.items()},
+            ))
+
+    if changes:
+        db.execute(update(Payment), changes)
+
+    # DELETE: cuotas no pagadas que quedaron fuera del plan
+    if removed:
+        db.execute(
+            delete(Payment)
+            .where(Payment.id.in_(removed_ids))
+            .execution_options(synchronize_session=False)
+        )
+        audit_entries.extend(
+            make_audit_entry(
+                company_id=template.company_id,
+                entity_type='payment',
+                entity_id=row.id,
+                action='delete',
+                before_data={
+                    "installment_number": row.installment_number,
+                    "amount": to_json_value(row.amount),
+                    "due_date": row.due_date.isoformat(),
+                    "status": row.status,
+                },
+            )
+            for row in removed
+        )
+
+    # INSERT: extender el plan después de la última cuota materializada y
+    # antes de la primera controlada previamente
+    last_number = max(row.installment_number for row in existing)
+    previous_first_number = previous_installments_paid_before + 1
+    new_rows = [
+        row for row in iter_installment_rows(template)
+        if row["installment_number"] > last_number
+        or row["installment_number"] < previous_first_number
+    ]
+    created_entries = _insert_installments(db, new_rows) if new_rows else []
+    created = len(created_entries)
+    audit_entries.extend(created_entries)
+
+    logger.info(
+        f"Propagated template {template.id}: {created} created, "
+        f"{len(changes)} updated, {len(removed)} deleted"
+    )
+
+    return {"created": created, "updated": len(changes), "deleted": len(removed)}, audit_entries
@@ -0,0 +1,172 @@
+"""Proyección virtual de cuotas futuras sin materializarlas en payments."""
+
+import heapq
+import logging
+from datetime import date
+from typing import Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Session
+
+from app.models.payment import Payment
+from app.models.recurring_template import RecurringTemplate
+from app.services.installment_generator import add_months, installment_due_date
+
+logger = logging.getLogger(__name__)
+
+# Claves (template_id, installment_number) por consulta de deduplicación
+KEY_LOOKUP_CHUNK_SIZE = 1000
+
+
+def _months_between(start: date, end: date) -> int:
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def installments_in_window(
+    template: RecurringTemplate,
+    window_start: date,
+    window_end: date,
+) -> range:
+    """Números de cuota de la plantilla que vencen dentro de la ventana.
+
+    Se calcula directamente por aritmética de meses, sin recorrer el plan
+    completo, así el costo depende del largo de la ventana.
+    """
+    first = template.installments_paid_before + 1
+    last_offset = template.total_installments - first
+
+    low = _months_between(template.start_control_date, window_start)
+    if add_months(template.start_control_date, low) < window_start:
+        low += 1
+    high = _months_between(template.start_control_date, window_end)
+    if add_months(template.start_control_date, high) > window_end:
+        high -= 1
+
+    low = max(low, 0)
+    high = min(high, last_offset)
+    return range(first + low, first + high + 1)
+
+
+def _payment_item(payment: Payment) -> Dict:
+    return {
+        "payment_id": str(payment.id),
+        "template_id": str(payment.template_id) if payment.template_id else None,
+        "installment_number": payment.installment_number,
+        "installment_total": payment.installment_total,
+        "due_date": payment.due_date.isoformat(),
+        "amount": float(payment.amount),
+        "status": payment.status,
+        "autopay": payment.autopay,
+        "virtual": False,
+    }
+
+
+def _virtual_item(template: RecurringTemplate, number: int) -> Dict:
+    return {
+        "payment_id": None,
+        "template_id": str(template.id),
+        "installment_number": number,
+        "installment_total": template.total_installments,
+        "due_date": installment_due_date(template, number).isoformat(),
+        "amount": float(template.installment_amount),
+        "status": "pending",
+        "autopay": template.autopay_enabled,
+        "virtual": True,
+    }
+
+
+def _existing_keys(db: Session, company_id, keys: List[Tuple]) -> Set[Tuple]:
+    """Cuotas candidatas que ya existen como pago real (con cualquier vencimiento)."""
+    existing = set()
+    for i in range(0, len(keys), KEY_LOOKUP_CHUNK_SIZE):
+        chunk = keys[i:i + KEY_LOOKUP_CHUNK_SIZE]
+        rows = db.query(Payment.template_id, Payment.installment_number).filter(
+            Payment.company_id == company_id,
+            tuple_(Payment.template_id, Payment.installment_number).in_(chunk)
+        ).all()
+        existing.update((row.template_id, row.installment_number) for row in rows)
+    return existing
+
+
+def _virtual_installments(
+    db: Session,
+    company_id,
+    window_start: date,
+    window_end: date,
+) -> List[Tuple[str, int, Dict]]:
+    """Cuotas virtuales de la ventana no materializadas, ordenadas por vencimiento."""
+    templates = db.query(RecurringTemplate).filter(
+        RecurringTemplate.company_id == company_id,
+        RecurringTemplate.start_control_date <= window_end
+    ).all()
+
+    candidates = [
+        (template, number)
+        for template in templates
+        for number in installments_in_window(template, window_start, window_end)
+    ]
+    if not candidates:
+        return []
+
+    existing = _existing_keys(
+        db,
+        company_id,
+        [(template.id, number) for template, number in candidates]
+    )
+
+    virtual = []
+    for template, number in candidates:
+        if (template.id, number) in existing:
+            continue
+        item = _virtual_item(template, number)
+        virtual.append((item["due_date"], 1, item))
+
+    virtual.sort(key=lambda entry: (entry[0], entry[2]["template_id"], entry[2]["installment_number"]))
+    return virtual
+
+
+def project_installments(
+    db: Session,
+    company_id,
+    window_start: date,
+    window_end: date,
+    include_paid: bool = True,
+) -> Iterator[Dict]:
+    """Genera pagos reales y cuotas virtuales de la ventana, ordenados por vencimiento.
+
+    Las cuotas de plantillas que ya tienen fila en payments se toman de la
+    BD (deduplicadas por template_id + installment_number); el resto se
+    calcula al vuelo. La memoria queda acotada por la ventana, no por el
+    largo del plan.
+
+    Args:
+        db: Sesión de base de datos
+        company_id: UUID de la empresa
+        window_start: Inicio de la ventana (inclusive)
+        window_end: Fin de la ventana (inclusive)
+        include_paid: Incluir pagos reales ya pagados
+
+    Yields:
+        Dict por pago, con virtual=True para las cuotas no materializadas
+    """
+    virtual = _virtual_installments(db, company_id, window_start, window_end)
+
+    query = select(Payment).where(
+        Payment.company_id == company_id,
+        Payment.due_date >= window_start,
+        Payment.due_date <= window_end
+    )
+    if not include_paid:
+        query = query.where(Payment.status != 'paid')
+
+    real_payments = db.execute(
+        query.order_by(Payment.due_date, Payment.id).execution_options(yield_per=500)
+    ).scalars()
+
+    real = (
+        (item["due_date"], 0, item)
+        for item in map(_payment_item, real_payments)
+    )
+
+    for _, _, item in heapq.merge(real, virtual, key=lambda entry: (entry[0], entry[1])):
+        yield item
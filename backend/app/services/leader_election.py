@@ -0,0 +1,180 @@
+"""Elección de líder entre procesos para que un solo worker ejecute los jobs.
+
+- PostgreSQL: pg_try_advisory_lock en una conexión dedicada. El lock es de
+  sesión, así que se libera solo si el proceso muere o pierde la conexión.
+- SQLite: flock exclusivo sobre un archivo de lock junto a la BD.
+
+Los procesos que no son líderes reintentan periódicamente, así el rol pasa
+a otro proceso cuando el líder cae.
+"""
+
+import fcntl
+import logging
+import os
+import threading
+from typing import Callable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Clave del advisory lock (entero arbitrario, fijo para toda la app)
+SCHEDULER_LOCK_KEY = int(os.getenv('SCHEDULER_LOCK_KEY', '727100'))
+SCHEDULER_LOCK_FILE = os.getenv('SCHEDULER_LOCK_FILE', './scheduler.lock')
+LEADER_CHECK_INTERVAL_SECONDS = float(os.getenv('LEADER_CHECK_INTERVAL_SECONDS', '15'))
+
+
+class _AdvisoryLock:
+    """Advisory lock de PostgreSQL sostenido por una conexión dedicada."""
+
+    def __init__(self, engine: Engine, key: int):
+        self.engine = engine
+        self.key = key
+        self._conn: Optional[Connection] = None
+
+    def try_acquire(self) -> bool:
+        conn = self.engine.connect()
+        try:
+            acquired = conn.execute(
+                text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key}
+            ).scalar()
+            conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        if acquired:
+            self._conn = conn
+            return True
+        conn.close()
+        return False
+
+    def is_held(self) -> bool:
+        """Verifica que la conexión que sostiene el lock sigue viva."""
+        if self._conn is None:
+            return False
+        try:
+            self._conn.execute(text("SELECT 1"))
+            self._conn.commit()
+            return True
+        except Exception:
+            self.release()
+            return False
+
+    def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            self._conn.commit()
+        except Exception:
+            pass
+        finally:
+            self._conn.close()
+            self._conn = None
+
+
+class _FileLock:
+    """Lock exclusivo sobre archivo (modo SQLite / un solo host)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    def try_acquire(self) -> bool:
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def is_held(self) -> bool:
+        return self._fd is not None
+
+    def release(self) -> None:
+        if self._fd is None:
+            return
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+
+class LeaderElection:
+    """Mantiene el rol de líder y notifica los cambios.
+
+    Args:
+        engine: Engine de la BD (define el tipo de lock)
+        on_elected: Callback al obtener el liderazgo
+        on_demoted: Callback al perder o ceder el liderazgo
+    """
+
+    def __init__(
+        self,
+        engine: Engine,
+        on_elected: Callable[[], None],
+        on_demoted: Callable[[], None],
+        check_interval: float = LEADER_CHECK_INTERVAL_SECONDS,
+    ):
+        if engine.dialect.name == 'postgresql':
+            self._lock = _AdvisoryLock(engine, SCHEDULER_LOCK_KEY)
+        else:
+            self._lock = _FileLock(SCHEDULER_LOCK_FILE)
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.check_interval = check_interval
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Intenta tomar el liderazgo ya y luego vigila en segundo plano."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._check()
+        self._thread = threading.Thread(
+            target=self._run,
+            name='scheduler-leader-election',
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Cede el liderazgo (si lo tiene) y detiene la vigilancia."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.check_interval + 5)
+            self._thread = None
+        if self.is_leader:
+            self._demote()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            self._check()
+
+    def _check(self) -> None:
+        try:
+            if self.is_leader:
+                if not self._lock.is_held():
+                    logger.warning(f"Scheduler leadership lost (pid {os.getpid()})")
+                    self._demote()
+            elif self._lock.try_acquire():
+                logger.info(f"Scheduler leadership acquired (pid {os.getpid()})")
+                self.is_leader = True
+                self.on_elected()
+        except Exception as e:
+            logger.error(f"Error in scheduler leader election: {e}", exc_info=True)
+
+    def _demote(self) -> None:
+        self.is_leader = False
+        try:
+            self.on_demoted()
+        finally:
+            self._lock.release()
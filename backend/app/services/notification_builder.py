@@ -1,16 +1,177 @@
 """Builder service for creating notification payloads."""
 
+import base64
+import json
 import logging
+import os
+import zlib
+from collections import defaultdict
 from datetime import date, datetime
-from typing import Optional, Dict, List
+from typing import Optional, Dict, Iterable, List
+from uuid import UUID
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
 
 from app.models.payment import Payment
+from app.models.recurring_template import RecurringTemplate
+from app.services.notification_renderer import payload_hash, render_email_html, render_telegram
 
 logger = logging.getLogger(__name__)
 
 
+# Empresas por consulta en el builder batch (acota el tamaño del IN)
+SUMMARY_BATCH_SIZE = 1000
+
+# Payload compacto de notification_queue: totales + IDs, renderizado al enviar
+COMPACT_PAYLOAD_FORMAT = 'summary.compact.v1'
+# Items por sección que se guardan (IDs) y se muestran al renderizar
+SUMMARY_MAX_ITEMS = int(os.getenv('SUMMARY_MAX_ITEMS', '50'))
+# Guardar además los items comprimidos (render sin consultar la BD)
+SUMMARY_PAYLOAD_BLOB = os.getenv('SUMMARY_PAYLOAD_BLOB', 'false').lower() in ('1', 'true', 'yes')
+
+
+def _payment_description(title: Optional[str], number: Optional[int], total: Optional[int], reference: Optional[str]) -> str:
+    """Descripción legible de un pago: título de la plantilla y cuota, o referencia."""
+    if title:
+        if number and total:
+            return f"{title} ({number}/{total})"
+        return title
+    return reference or "Sin descripción"
+
+
+def _payment_rows(db: Session, *filters):
+    """Pagos con las columnas necesarias para describirlos en un resumen."""
+    return db.query(
+        Payment.id,
+        Payment.company_id,
+        Payment.amount,
+        Payment.due_date,
+        Payment.paid_at,
+        Payment.payment_method,
+        Payment.payment_reference,
+        Payment.installment_number,
+        Payment.installment_total,
+        RecurringTemplate.title,
+    ).outerjoin(
+        RecurringTemplate, RecurringTemplate.id == Payment.template_id
+    ).filter(*filters)
+
+
+def _summary_rows(db: Session, company_ids: List[UUID], *filters):
+    """Pagos de varias empresas con la descripción resuelta, ordenados por empresa."""
+    return _payment_rows(
+        db, Payment.company_id.in_(company_ids), *filters
+    ).order_by(Payment.company_id, Payment.due_date, Payment.id).all()
+
+
+def _pending_item(payment) -> Dict:
+    return {
+        "id": str(payment.id),
+        "description": _payment_description(
+            payment.title, payment.installment_number,
+            payment.installment_total, payment.payment_reference
+        ),
+        "amount": float(payment.amount),
+        "due_date": payment.due_date.isoformat(),
+        "payment_method": payment.payment_method or "No especificado"
+    }
+
+
+def _paid_item(payment) -> Dict:
+    return {
+        "id": str(payment.id),
+        "description": _payment_description(
+            payment.title, payment.installment_number,
+            payment.installment_total, payment.payment_reference
+        ),
+        "amount": float(payment.amount),
+        "paid_at": payment.paid_at.isoformat() if payment.paid_at else None,
+        "payment_method": payment.payment_method or "No especificado"
+    }
+
+
+def _build_payload(company_id: str, target_date: date, pending_payments: List, paid_today: List) -> Dict:
+    """Arma el payload del resumen a partir de las filas de una empresa."""
+    pending_list = [_pending_item(payment) for payment in pending_payments]
+    paid_list = [_paid_item(payment) for payment in paid_today]
+    
+    # Calcular totales
+    total_pending = sum(p.amount for p in pending_payments)
+    total_paid = sum(p.amount for p in paid_today)
+    
+    payload = {
+        "summary_date": target_date.isoformat(),
+        "company_id": company_id,
+        "pending_payments": {
+            "count": len(pending_list),
+            "total_amount": float(total_pending),
+            "items": pending_list
+        },
+        "paid_today": {
+            "count": len(paid_list),
+            "total_amount": float(total_paid),
+            "items": paid_list
+        },
+        "generated_at": datetime.utcnow().isoformat()
+    }
+    # Hash del contenido para el cache de renderizado (una vez por resumen)
+    payload["content_hash"] = payload_hash(payload)
+    return payload
+
+
+def build_daily_summaries(db: Session, company_ids: Iterable, target_date: date) -> Dict[str, Dict]:
+    """Construye los resúmenes diarios de varias empresas con dos consultas por lote.
+    
+    Args:
+        db: Sesión de base de datos
+        company_ids: UUIDs de las empresas
+        target_date: Fecha del resumen
+    
+    Returns:
+        Dict company_id (str) -> payload; las empresas sin datos no aparecen
+    """
+    ids = [UUID(str(company_id)) for company_id in company_ids]
+    day_start = datetime.combine(target_date, datetime.min.time())
+    day_end = datetime.combine(target_date, datetime.max.time())
+    summaries: Dict[str, Dict] = {}
+    
+    for i in range(0, len(ids), SUMMARY_BATCH_SIZE):
+        batch = ids[i:i + SUMMARY_BATCH_SIZE]
+        
+        # Pagos pendientes con vencimiento hoy
+        pending_by_company: Dict[str, List] = defaultdict(list)
+        for row in _summary_rows(
+            db, batch,
+            Payment.status == 'pending',
+            Payment.due_date == target_date
+        ):
+            pending_by_company[str(row.company_id)].append(row)
+        
+        # Pagos realizados hoy con autopago
+        paid_by_company: Dict[str, List] = defaultdict(list)
+        for row in _summary_rows(
+            db, batch,
+            Payment.status == 'paid',
+            Payment.autopay == True,
+            Payment.paid_at >= day_start,
+            Payment.paid_at < day_end
+        ):
+            paid_by_company[str(row.company_id)].append(row)
+        
+        for company_id in pending_by_company.keys() | paid_by_company.keys():
+            summaries[company_id] = _build_payload(
+                company_id,
+                target_date,
+                pending_by_company.get(company_id, []),
+                paid_by_company.get(company_id, [])
+            )
+    
+    logger.info(
+        f"Built {len(summaries)} summaries for {len(ids)} companies on {target_date}"
+    )
+    
+    return summaries
+
+
 def build_daily_summary(db: Session, company_id: str, target_date: date) -> Optional[Dict]:
     """Construye el payload del resumen diario de pagos.
     
@@ -23,78 +184,16 @@ def build_daily_summary(db: Session, company_id: str, target_date: date) -> Opti
         Dict con el payload o None si no hay datos
     """
     try:
-        # Obtener pagos pendientes con vencimiento hoy
-        pending_payments = db.query(Payment).filter(
-            and_(
-                Payment.company_id == company_id,
-                Payment.status == 'pending',
-                Payment.due_date == target_date
-            )
-        ).all()
-        
-        # Obtener pagos realizados hoy con autopago
-        paid_today = db.query(Payment).filter(
-            and_(
-                Payment.company_id == company_id,
-                Payment.status == 'paid',
-                Payment.autopay == True,
-                Payment.paid_at >= datetime.combine(target_date, datetime.min.time()),
-                Payment.paid_at < datetime.combine(target_date, datetime.max.time())
-            )
-        ).all()
+        payload = build_daily_summaries(db, [company_id], target_date).get(str(company_id))
         
         # Si no hay datos, retornar None
-        if not pending_payments and not paid_today:
+        if payload is None:
             logger.info(f"No data for summary on {target_date} for company {company_id}")
             return None
         
-        # Construir listas de pagos
-        pending_list = [
-            {
-                "id": str(payment.id),
-                "description": payment.description or "Sin descripción",
-                "amount": float(payment.amount),
-                "due_date": payment.due_date.isoformat(),
-                "payment_method": payment.payment_method or "No especificado"
-            }
-            for payment in pending_payments
-        ]
-        
-        paid_list = [
-            {
-                "id": str(payment.id),
-                "description": payment.description or "Sin descripción",
-                "amount": float(payment.amount),
-                "paid_at": payment.paid_at.isoformat() if payment.paid_at else None,
-                "payment_method": payment.payment_method or "No especificado"
-            }
-            for payment in paid_today
-        ]
-        
-        # Calcular totales
-        total_pending = sum(p.amount for p in pending_payments)
-        total_paid = sum(p.amount for p in paid_today)
-        
-        # Construir payload
-        payload = {
-            "summary_date": target_date.isoformat(),
-            "company_id": str(company_id),
-            "pending_payments": {
-                "count": len(pending_list),
-                "total_amount": float(total_pending),
-                "items": pending_list
-            },
-            "paid_today": {
-                "count": len(paid_list),
-                "total_amount": float(total_paid),
-                "items": paid_list
-            },
-            "generated_at": datetime.utcnow().isoformat()
-        }
-        
         logger.info(
             f"Built summary for {company_id}: "
-            f"{len(pending_list)} pending, {len(paid_list)} paid"
+            f"{payload['pending_payments']['count']} pending, {payload['paid_today']['count']} paid"
         )
         
         return payload
@@ -104,128 +203,113 @@ def build_daily_summary(db: Session, company_id: str, target_date: date) -> Opti
         return None
 
 
-def format_telegram_message(payload: Dict) -> str:
-    """Formatea el payload para Telegram.
+def is_compact_payload(payload: Dict) -> bool:
+    return payload.get("format") == COMPACT_PAYLOAD_FORMAT
+
+
+def compact_summary_payload(payload: Dict, include_blob: bool = SUMMARY_PAYLOAD_BLOB) -> Dict:
+    """Versión compacta del resumen para guardar en notification_queue.
+    
+    Guarda solo totales y los IDs de los primeros SUMMARY_MAX_ITEMS pagos de
+    cada sección; el detalle se arma al enviar (expand_summary_payload).
+    Con include_blob, agrega una copia comprimida de esos items para
+    renderizar sin consultar la BD (foto del momento en que se generó).
     
     Args:
-        payload: Payload del resumen
+        payload: Payload completo de build_daily_summary
+        include_blob: Incluir items comprimidos (zlib + base64)
     
     Returns:
-        Mensaje formateado para Telegram
+        Payload compacto
     """
-    date_str = payload['summary_date']
-    pending = payload['pending_payments']
-    paid = payload['paid_today']
+    sections = {}
+    blob_items = {}
+    for key in ("pending_payments", "paid_today"):
+        section = payload[key]
+        items = section["items"][:SUMMARY_MAX_ITEMS]
+        sections[key] = {
+            "count": section["count"],
+            "total_amount": section["total_amount"],
+            "ids": [item["id"] for item in items],
+        }
+        blob_items[key] = items
     
-    message = f"📅 *Resumen Diario - {date_str}*\n\n"
+    compact = {
+        "format": COMPACT_PAYLOAD_FORMAT,
+        "summary_date": payload["summary_date"],
+        "company_id": payload["company_id"],
+        **sections,
+        "generated_at": payload["generated_at"],
+    }
+    if include_blob:
+        raw = json.dumps(blob_items, separators=(',', ':')).encode('utf-8')
+        compact["items_blob"] = base64.b64encode(zlib.compress(raw)).decode('ascii')
     
-    # Pagos pendientes
-    if pending['count'] > 0:
-        message += f"⌛ *Pendientes Hoy ({pending['count']})*\n"
-        message += f"Total: ${pending['total_amount']:,.0f}\n\n"
-        
-        for item in pending['items'][:5]:  # Máximo 5
-            message += f"  • {item['description']}\n"
-            message += f"    ${item['amount']:,.0f} - {item['payment_method']}\n"
-        
-        if pending['count'] > 5:
-            message += f"  ... y {pending['count'] - 5} más\n"
-        
-        message += "\n"
+    compact["content_hash"] = payload_hash(compact)
+    return compact
+
+
+def expand_summary_payload(db: Session, payload: Dict, max_items: int = SUMMARY_MAX_ITEMS) -> Dict:
+    """Vista completa de un payload para renderizar, con a lo más max_items por sección.
     
-    # Pagos realizados
-    if paid['count'] > 0:
-        message += f"✅ *Pagados Hoy ({paid['count']})*\n"
-        message += f"Total: ${paid['total_amount']:,.0f}\n\n"
-        
-        for item in paid['items'][:5]:  # Máximo 5
-            message += f"  • {item['description']}\n"
-            message += f"    ${item['amount']:,.0f}\n"
-        
-        if paid['count'] > 5:
-            message += f"  ... y {paid['count'] - 5} más\n"
+    Los payloads completos (formato anterior) se devuelven tal cual. Los
+    compactos se arman desde items_blob si existe, o consultando los pagos
+    por ID (los pagos borrados desde el encolado se omiten).
+    """
+    if not is_compact_payload(payload):
+        return payload
     
-    if pending['count'] == 0 and paid['count'] == 0:
-        message += "🎉 No hay actividad para hoy"
+    if payload.get("items_blob"):
+        items = json.loads(zlib.decompress(base64.b64decode(payload["items_blob"])))
+        pending_items = items["pending_payments"][:max_items]
+        paid_items = items["paid_today"][:max_items]
+    else:
+        pending_ids = payload["pending_payments"]["ids"][:max_items]
+        paid_ids = payload["paid_today"]["ids"][:max_items]
+        rows = {}
+        wanted = [UUID(payment_id) for payment_id in pending_ids + paid_ids]
+        if wanted:
+            rows = {str(row.id): row for row in _payment_rows(db, Payment.id.in_(wanted)).all()}
+        pending_items = [_pending_item(rows[i]) for i in pending_ids if i in rows]
+        paid_items = [_paid_item(rows[i]) for i in paid_ids if i in rows]
     
-    return message
+    return {
+        "summary_date": payload["summary_date"],
+        "company_id": payload["company_id"],
+        "pending_payments": {
+            "count": payload["pending_payments"]["count"],
+            "total_amount": payload["pending_payments"]["total_amount"],
+            "items": pending_items
+        },
+        "paid_today": {
+            "count": payload["paid_today"]["count"],
+            "total_amount": payload["paid_today"]["total_amount"],
+            "items": paid_items
+        },
+        "generated_at": payload["generated_at"],
+        "content_hash": payload["content_hash"],
+    }
 
 
-def format_email_html(payload: Dict) -> str:
-    """Formatea el payload para Email HTML.
+def format_telegram_message(payload: Dict) -> str:
+    """Formatea el payload para Telegram.
     
     Args:
         payload: Payload del resumen
     
     Returns:
-        HTML formateado para email
-    """
-    date_str = payload['summary_date']
-    pending = payload['pending_payments']
-    paid = payload['paid_today']
-    
-    html = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            .header {{ background-color: #4CAF50; color: white; padding: 20px; }}
-            .section {{ margin: 20px 0; }}
-            .pending {{ background-color: #fff3cd; padding: 15px; border-radius: 5px; }}
-            .paid {{ background-color: #d4edda; padding: 15px; border-radius: 5px; }}
-            .item {{ margin: 10px 0; padding: 10px; background-color: white; border-radius: 3px; }}
-            .amount {{ font-weight: bold; }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>📅 Resumen Diario - {date_str}</h1>
-        </div>
+        Mensaje formateado para Telegram
     """
+    return render_telegram(payload)
+
+
+def format_email_html(payload: Dict) -> str:
+    """Formatea el payload para Email HTML.
     
-    # Pagos pendientes
-    if pending['count'] > 0:
-        html += f"""
-        <div class="section pending">
-            <h2>⌛ Pendientes Hoy ({pending['count']})</h2>
-            <p class="amount">Total: ${pending['total_amount']:,.0f}</p>
-        """
-        
-        for item in pending['items']:
-            html += f"""
-            <div class="item">
-                <strong>{item['description']}</strong><br>
-                Monto: ${item['amount']:,.0f}<br>
-                Método: {item['payment_method']}
-            </div>
-            """
-        
-        html += "</div>"
-    
-    # Pagos realizados
-    if paid['count'] > 0:
-        html += f"""
-        <div class="section paid">
-            <h2>✅ Pagados Hoy ({paid['count']})</h2>
-            <p class="amount">Total: ${paid['total_amount']:,.0f}</p>
-        """
-        
-        for item in paid['items']:
-            html += f"""
-            <div class="item">
-                <strong>{item['description']}</strong><br>
-                Monto: ${item['amount']:,.0f}
-            </div>
-            """
-        
-        html += "</div>"
-    
-    if pending['count'] == 0 and paid['count'] == 0:
-        html += "<p>🎉 No hay actividad para hoy</p>"
+    Args:
+        payload: Payload del resumen
     
-    html += """
-    </body>
-    </html>
+    Returns:
+        HTML formateado para email
     """
-    
-    return html
+    return render_email_html(payload)
@@ -0,0 +1,239 @@
+"""Renderizado de resúmenes para Telegram y email con plantillas precompiladas.
+
+- Encabezados como str.format ya ligados y items como f-strings (ambos
+  compilados al importar el módulo); cada sección se arma con una lista
+  + ''.join en vez de concatenar con +=.
+- render_message cachea el cuerpo por (canal, hash del contenido), así
+  los reintentos no vuelven a renderizar. El hash se calcula una vez al
+  construir el payload y se comparte entre los canales.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+# Máximo de items listados por sección en Telegram
+TELEGRAM_MAX_ITEMS = 5
+
+# Entradas del cache de cuerpos renderizados (LRU)
+RENDER_CACHE_SIZE = 2048
+
+
+# Plantillas Telegram
+_TG_HEADER = "📅 *Resumen Diario - {date}*\n\n".format
+_TG_PENDING_HEADER = "⌛ *Pendientes Hoy ({count})*\nTotal: ${total:,.0f}\n\n".format
+_TG_PAID_HEADER = "✅ *Pagados Hoy ({count})*\nTotal: ${total:,.0f}\n\n".format
+_TG_MORE = "  ... y {count} más\n".format
+_TG_EMPTY = "🎉 No hay actividad para hoy"
+
+# Plantillas email
+_EMAIL_HEAD = """
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; }}
+            .header {{ background-color: #4CAF50; color: white; padding: 20px; }}
+            .section {{ margin: 20px 0; }}
+            .pending {{ background-color: #fff3cd; padding: 15px; border-radius: 5px; }}
+            .paid {{ background-color: #d4edda; padding: 15px; border-radius: 5px; }}
+            .item {{ margin: 10px 0; padding: 10px; background-color: white; border-radius: 3px; }}
+            .amount {{ font-weight: bold; }}
+        </style>
+    </head>
+    <body>
+        <div class="header">
+            <h1>📅 Resumen Diario - {date}</h1>
+        </div>
+    """.format
+_EMAIL_PENDING_HEADER = """
+        <div class="section pending">
+            <h2>⌛ Pendientes Hoy ({count})</h2>
+            <p class="amount">Total: ${total:,.0f}</p>
+        """.format
+_EMAIL_PAID_HEADER = """
+        <div class="section paid">
+            <h2>✅ Pagados Hoy ({count})</h2>
+            <p class="amount">Total: ${total:,.0f}</p>
+        """.format
+_EMAIL_MORE = "<p>... y {count} más</p>".format
+_EMAIL_SECTION_END = "</div>"
+_EMAIL_EMPTY = "<p>🎉 No hay actividad para hoy</p>"
+_EMAIL_TAIL = """
+    </body>
+    </html>
+    """
+
+
+# Los items usan f-strings (compiladas con el módulo): más rápidas que
+# str.format(**item) en el loop por item
+def _tg_pending_items(items) -> str:
+    return "".join([
+        f"  • {item['description']}\n    ${item['amount']:,.0f} - {item['payment_method']}\n"
+        for item in items
+    ])
+
+
+def _tg_paid_items(items) -> str:
+    return "".join([
+        f"  • {item['description']}\n    ${item['amount']:,.0f}\n"
+        for item in items
+    ])
+
+
+def _email_pending_items(items) -> str:
+    return "".join([
+        f"""
+            <div class="item">
+                <strong>{item['description']}</strong><br>
+                Monto: ${item['amount']:,.0f}<br>
+                Método: {item['payment_method']}
+            </div>
+            """
+        for item in items
+    ])
+
+
+def _email_paid_items(items) -> str:
+    return "".join([
+        f"""
+            <div class="item">
+                <strong>{item['description']}</strong><br>
+                Monto: ${item['amount']:,.0f}
+            </div>
+            """
+        for item in items
+    ])
+
+
+def render_telegram(payload: Dict) -> str:
+    """Mensaje Markdown de Telegram (máximo TELEGRAM_MAX_ITEMS por sección)."""
+    pending = payload['pending_payments']
+    paid = payload['paid_today']
+
+    parts = [_TG_HEADER(date=payload['summary_date'])]
+
+    if pending['count'] > 0:
+        parts.append(_TG_PENDING_HEADER(count=pending['count'], total=pending['total_amount']))
+        parts.append(_tg_pending_items(pending['items'][:TELEGRAM_MAX_ITEMS]))
+        if pending['count'] > TELEGRAM_MAX_ITEMS:
+            parts.append(_TG_MORE(count=pending['count'] - TELEGRAM_MAX_ITEMS))
+        parts.append("\n")
+
+    if paid['count'] > 0:
+        parts.append(_TG_PAID_HEADER(count=paid['count'], total=paid['total_amount']))
+        parts.append(_tg_paid_items(paid['items'][:TELEGRAM_MAX_ITEMS]))
+        if paid['count'] > TELEGRAM_MAX_ITEMS:
+            parts.append(_TG_MORE(count=paid['count'] - TELEGRAM_MAX_ITEMS))
+
+    if pending['count'] == 0 and paid['count'] == 0:
+        parts.append(_TG_EMPTY)
+
+    return "".join(parts)
+
+
+def render_email_html(payload: Dict) -> str:
+    """Cuerpo HTML del email con los items del payload (y cuántos se omitieron)."""
+    pending = payload['pending_payments']
+    paid = payload['paid_today']
+
+    parts = [_EMAIL_HEAD(date=payload['summary_date'])]
+
+    if pending['count'] > 0:
+        parts.append(_EMAIL_PENDING_HEADER(count=pending['count'], total=pending['total_amount']))
+        parts.append(_email_pending_items(pending['items']))
+        if pending['count'] > len(pending['items']):
+            parts.append(_EMAIL_MORE(count=pending['count'] - len(pending['items'])))
+        parts.append(_EMAIL_SECTION_END)
+
+    if paid['count'] > 0:
+        parts.append(_EMAIL_PAID_HEADER(count=paid['count'], total=paid['total_amount']))
+        parts.append(_email_paid_items(paid['items']))
+        if paid['count'] > len(paid['items']):
+            parts.append(_EMAIL_MORE(count=paid['count'] - len(paid['items'])))
+        parts.append(_EMAIL_SECTION_END)
+
+    if pending['count'] == 0 and paid['count'] == 0:
+        parts.append(_EMAIL_EMPTY)
+
+    parts.append(_EMAIL_TAIL)
+
+    return "".join(parts)
+
+
+RENDERERS = {
+    'telegram': render_telegram,
+    'email': render_email_html,
+}
+
+
+def payload_hash(payload: Dict) -> str:
+    """Hash estable del contenido del payload (ignora generated_at y content_hash).
+
+    Serializar el payload cuesta más que renderizar Telegram, así que el
+    builder lo calcula una sola vez y lo guarda en payload['content_hash'];
+    render_message solo lo recalcula para payloads sin ese campo.
+    """
+    content = {k: v for k, v in payload.items() if k not in ('generated_at', 'content_hash')}
+    encoded = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class RenderCache:
+    """Cache LRU de cuerpos renderizados por (canal, hash del payload)."""
+
+    def __init__(self, max_entries: int = RENDER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str]) -> Optional[str]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def set(self, key: Tuple[str, str], body: str) -> None:
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+render_cache = RenderCache()
+
+
+def render_message(channel: str, payload: Dict, expand: Optional[Callable[[Dict], Dict]] = None) -> str:
+    """Cuerpo del mensaje para el canal, cacheado por contenido del payload.
+
+    Args:
+        channel: telegram / email
+        payload: Payload guardado en la cola
+        expand: Convierte el payload en la vista a renderizar (p.ej. un
+            payload compacto); solo se llama si no hay cache
+
+    Raises:
+        ValueError: Si el canal no tiene renderer
+    """
+    renderer = RENDERERS.get(channel)
+    if renderer is None:
+        raise ValueError(f"Unknown channel: {channel}")
+
+    key = (channel, payload.get('content_hash') or payload_hash(payload))
+    body = render_cache.get(key)
+    if body is None:
+        body = renderer(expand(payload) if expand else payload)
+        render_cache.set(key, body)
+    return body
@@ -1,16 +1,22 @@
-notification_sender.py  """Sender service for delivering notifications via Telegram and Email."""
+"""Sender service for delivering notifications via Telegram and Email."""
 
 import logging
 import os
 import smtplib
+import threading
+import time
+from datetime import datetime
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from typing import Optional
-import requests
+from functools import partial
+from typing import Any, Dict, Optional
+import httpx
+from sqlalchemy.orm import Session
 
 from app.models.notification_queue import NotificationQueue
 from app.models.notification_settings import NotificationSettings
-from app.services.notification_builder import format_telegram_message, format_email_html
+from app.services.notification_builder import expand_summary_payload
+from app.services.notification_renderer import render_message
 
 logger = logging.getLogger(__name__)
 
@@ -21,42 +27,348 @@ SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
 SMTP_USER = os.getenv('SMTP_USER')
 SMTP_PASS = os.getenv('SMTP_PASS')
 SMTP_FROM = os.getenv('SMTP_FROM', SMTP_USER)
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'true').lower() in ('1', 'true', 'yes')
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '30'))
+# Mensajes por conexión antes de reconectar (límite típico de los proveedores)
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('SMTP_MAX_MESSAGES_PER_CONNECTION', '100'))
 
+# Cliente HTTP de Telegram (conexiones persistentes compartidas entre envíos)
+TELEGRAM_API_BASE = os.getenv('TELEGRAM_API_BASE', 'https://api.telegram.org')
+TELEGRAM_CONNECT_TIMEOUT = float(os.getenv('TELEGRAM_CONNECT_TIMEOUT', '5'))
+TELEGRAM_READ_TIMEOUT = float(os.getenv('TELEGRAM_READ_TIMEOUT', '10'))
+TELEGRAM_MAX_CONNECTIONS = int(os.getenv('TELEGRAM_MAX_CONNECTIONS', '10'))
 
-def send_telegram(notification: NotificationQueue, settings: NotificationSettings) -> bool:
-    """Envía notificación por Telegram.
+
+# Circuit breaker por canal: fallas seguidas antes de abrir y espera antes de probar
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '60'))
+# Reintento sugerido mientras otra llamada prueba el canal (half-open)
+CIRCUIT_PROBE_WAIT_SECONDS = 5.0
+
+
+class CircuitBreaker:
+    """Circuit breaker de un canal de envío (closed / open / half_open).
     
-    Args:
-        notification: Registro de NotificationQueue
-        settings: Configuración de notificaciones de la empresa
+    - closed: se envía normalmente; CIRCUIT_FAILURE_THRESHOLD fallas
+      transitorias seguidas lo abren
+    - open: no se intenta la llamada de red durante CIRCUIT_RESET_SECONDS;
+      las notificaciones se posponen
+    - half_open: pasado ese tiempo se deja pasar un solo envío de prueba; si
+      resulta se cierra, si falla vuelve a abrirse
+    
+    Thread-safe: lo usan el motor asíncrono y los envíos síncronos.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: Optional[int] = None,
+        reset_seconds: Optional[float] = None,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold if failure_threshold is not None else CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = reset_seconds if reset_seconds is not None else CIRCUIT_RESET_SECONDS
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.opened_count = 0
+        self.rejected = 0
+        self.last_opened_at: Optional[datetime] = None
+    
+    @property
+    def state(self) -> str:
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """Indica si se puede intentar un envío ahora (reserva la prueba en half_open)."""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"Circuit breaker '{self.name}' half-open, probing")
+            
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            
+            self.rejected += 1
+            return False
+    
+    def retry_in(self) -> float:
+        """Segundos sugeridos antes de volver a intentar un envío rechazado."""
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self.reset_seconds - (time.monotonic() - self._opened_at)
+                return max(remaining, 1.0)
+            return CIRCUIT_PROBE_WAIT_SECONDS
+    
+    def record_success(self) -> None:
+        """El canal respondió (incluye rechazos del mensaje, p.ej. un 4xx)."""
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit breaker '{self.name}' closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+    
+    def record_failure(self) -> None:
+        """El canal no respondió o respondió con una falla transitoria."""
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self.opened_count += 1
+                self.last_opened_at = datetime.utcnow()
+                logger.warning(
+                    f"Circuit breaker '{self.name}' opened after {self._failures} consecutive failures"
+                )
+    
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._failures,
+                "opened_count": self.opened_count,
+                "rejected": self.rejected,
+                "last_opened_at": self.last_opened_at.isoformat() if self.last_opened_at else None,
+            }
+
+
+circuit_breakers: Dict[str, CircuitBreaker] = {
+    'telegram': CircuitBreaker('telegram'),
+    'email': CircuitBreaker('email'),
+}
+
+
+def get_circuit_breaker_metrics() -> Dict[str, Any]:
+    """Estado de los circuit breakers por canal para health checks."""
+    return {channel: breaker.metrics() for channel, breaker in circuit_breakers.items()}
+
+
+def _http2_available() -> bool:
+    """HTTP/2 requiere el extra httpx[http2] (paquete h2)."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def telegram_client_options() -> dict:
+    """Parámetros comunes de los clientes httpx (sync y async) de la Bot API.
+    
+    La URL base ya incluye el token, así cada envío solo indica el método.
+    """
+    return dict(
+        base_url=f"{TELEGRAM_API_BASE}/bot{TELEGRAM_BOT_TOKEN}",
+        http2=_http2_available(),
+        timeout=httpx.Timeout(TELEGRAM_READ_TIMEOUT, connect=TELEGRAM_CONNECT_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=TELEGRAM_MAX_CONNECTIONS,
+            max_keepalive_connections=TELEGRAM_MAX_CONNECTIONS,
+        ),
+    )
+
+
+_telegram_client: Optional[httpx.Client] = None
+_telegram_client_lock = threading.Lock()
+
+
+def get_telegram_client() -> httpx.Client:
+    """Cliente httpx compartido para la Bot API (pool keep-alive, HTTP/2 si está disponible)."""
+    global _telegram_client
+    
+    if _telegram_client is None:
+        with _telegram_client_lock:
+            if _telegram_client is None:
+                _telegram_client = httpx.Client(**telegram_client_options())
+    return _telegram_client
+
+
+def close_telegram_client() -> None:
+    """Cierra las conexiones del cliente de Telegram (al apagar el proceso)."""
+    global _telegram_client
+    
+    with _telegram_client_lock:
+        if _telegram_client is not None:
+            _telegram_client.close()
+            _telegram_client = None
+
+
+class SMTPSession:
+    """Conexión SMTP autenticada reutilizada para varios mensajes.
+    
+    Conecta al primer envío, reconecta tras SMTP_MAX_MESSAGES_PER_CONNECTION
+    mensajes y reintenta una vez con una conexión nueva si el servidor
+    cortó la anterior. No es thread-safe: una sesión por hilo / lote.
+    
+    Uso:
+        with SMTPSession() as smtp:
+            for msg in messages:
+                smtp.send_message(msg)
+    """
+    
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        port: Optional[int] = None,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        starttls: Optional[bool] = None,
+        max_messages_per_connection: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        # Sin argumentos se usa la configuración SMTP_* del módulo
+        self.host = host if host is not None else SMTP_HOST
+        self.port = port if port is not None else SMTP_PORT
+        self.user = user if user is not None else SMTP_USER
+        self.password = password if password is not None else SMTP_PASS
+        self.starttls = starttls if starttls is not None else SMTP_STARTTLS
+        self.max_messages_per_connection = (
+            max_messages_per_connection if max_messages_per_connection is not None
+            else SMTP_MAX_MESSAGES_PER_CONNECTION
+        )
+        self.timeout = timeout if timeout is not None else SMTP_TIMEOUT
+        self._server: Optional[smtplib.SMTP] = None
+        self._sent_on_connection = 0
+        self.connections = 0
+        self.sent = 0
+    
+    def __enter__(self) -> "SMTPSession":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.starttls:
+                server.starttls()
+                server.ehlo()
+            if self.user and self.password:
+                server.login(self.user, self.password)
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+        self._sent_on_connection = 0
+        self.connections += 1
+        return server
+    
+    def _connection(self) -> smtplib.SMTP:
+        if self._server is not None and self._sent_on_connection >= self.max_messages_per_connection:
+            self.close()
+        return self._server or self._connect()
+    
+    def send_message(self, msg) -> None:
+        """Envía un mensaje; reconecta una vez si la conexión se cayó.
+        
+        Raises:
+            smtplib.SMTPException: Errores del mensaje (p.ej. destinatario
+                rechazado) o si la reconexión también falla
+        """
+        try:
+            self._connection().send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError) as e:
+            logger.warning(f"SMTP connection lost ({e}), reconnecting")
+            self._discard()
+            self._connection().send_message(msg)
+        self._sent_on_connection += 1
+        self.sent += 1
+    
+    def _discard(self) -> None:
+        if self._server is not None:
+            try:
+                self._server.close()
+            finally:
+                self._server = None
+    
+    def close(self) -> None:
+        """Cierra la conexión con QUIT (o la descarta si ya se cayó)."""
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except Exception:
+            pass
+        finally:
+            self._discard()
+
+
+def build_telegram_request(
+    notification: NotificationQueue,
+    settings: NotificationSettings,
+    db: Optional[Session] = None,
+) -> Optional[dict]:
+    """Arma el cuerpo de sendMessage para una notificación.
     
     Returns:
-        True si se envió exitosamente, False en caso contrario
+        Dict para POST /sendMessage, o None si falta configuración
     """
     if not TELEGRAM_BOT_TOKEN:
         logger.error("TELEGRAM_BOT_TOKEN not configured")
-        return False
+        return None
     
     if not settings.telegram_chat_id:
         logger.error(f"No telegram_chat_id for company {notification.company_id}")
-        return False
+        return None
     
+    # Formatear mensaje
+    message = render_message('telegram', notification.payload, partial(expand_summary_payload, db))
+    
+    return {
+        "chat_id": settings.telegram_chat_id,
+        "text": message,
+        "parse_mode": "Markdown"
+    }
+
+
+def send_telegram(notification: NotificationQueue, settings: NotificationSettings, db: Optional[Session] = None) -> bool:
+    """Envía notificación por Telegram.
+    
+    Args:
+        notification: Registro de NotificationQueue
+        settings: Configuración de notificaciones de la empresa
+        db: Sesión para armar payloads compactos al enviar
+    
+    Returns:
+        True si se envió exitosamente, False en caso contrario (también si
+        el circuit breaker de Telegram está abierto)
+    """
+    breaker = circuit_breakers['telegram']
     try:
-        # Formatear mensaje
-        message = format_telegram_message(notification.payload)
-        
-        # Endpoint de Telegram Bot API
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
+        data = build_telegram_request(notification, settings, db)
+        if data is None:
+            return False
         
-        # Payload
-        data = {
-            "chat_id": settings.telegram_chat_id,
-            "text": message,
-            "parse_mode": "Markdown"
-        }
+        if not breaker.allow_request():
+            logger.warning("Telegram circuit breaker open, skipping send")
+            return False
         
-        # Enviar request
-        response = requests.post(url, json=data, timeout=10)
+        # Enviar request (conexión reutilizada del pool)
+        try:
+            response = get_telegram_client().post("/sendMessage", json=data)
+        except httpx.TransportError:
+            breaker.record_failure()
+            raise
+        if response.is_server_error:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
         response.raise_for_status()
         
         result = response.json()
@@ -68,7 +380,7 @@ def send_telegram(notification: NotificationQueue, settings: NotificationSetting
             logger.error(f"Telegram API error: {result.get('description')}")
             return False
             
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         logger.error(f"Error sending Telegram: {e}")
         return False
     except Exception as e:
@@ -76,43 +388,102 @@ def send_telegram(notification: NotificationQueue, settings: NotificationSetting
         return False
 
 
-def send_email(notification: NotificationQueue, settings: NotificationSettings) -> bool:
-    """Envía notificación por Email.
-    
-    Args:
-        notification: Registro de NotificationQueue
-        settings: Configuración de notificaciones de la empresa
+def build_email_message(
+    notification: NotificationQueue,
+    settings: NotificationSettings,
+    db: Optional[Session] = None,
+) -> Optional[MIMEMultipart]:
+    """Arma el email HTML de una notificación.
     
     Returns:
-        True si se envió exitosamente, False en caso contrario
+        Mensaje listo para SMTPSession.send_message, o None si falta configuración
     """
     if not all([SMTP_HOST, SMTP_USER, SMTP_PASS]):
         logger.error("SMTP settings not fully configured")
-        return False
+        return None
     
     if not settings.email_to:
         logger.error(f"No email_to for company {notification.company_id}")
-        return False
+        return None
+    
+    # Formatear contenido HTML
+    html_content = render_message('email', notification.payload, partial(expand_summary_payload, db))
+    
+    # Crear mensaje
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"Resumen Diario - {notification.payload['summary_date']}"
+    msg['From'] = SMTP_FROM
+    msg['To'] = settings.email_to
+    
+    # Adjuntar HTML
+    html_part = MIMEText(html_content, 'html', 'utf-8')
+    msg.attach(html_part)
+    
+    return msg
+
+
+def send_email(
+    notification: NotificationQueue,
+    settings: NotificationSettings,
+    db: Optional[Session] = None,
+    smtp: Optional[SMTPSession] = None,
+) -> bool:
+    """Envía notificación por Email.
+    
+    Args:
+        notification: Registro de NotificationQueue
+        settings: Configuración de notificaciones de la empresa
+        db: Sesión para armar payloads compactos al enviar
+        smtp: Sesión SMTP compartida del lote; sin ella se abre una
+            conexión solo para este mensaje
     
+    Returns:
+        True si se envió exitosamente, False en caso contrario (también si
+        el circuit breaker de email está abierto)
+    """
+    breaker = circuit_breakers['email']
     try:
-        # Formatear contenido HTML
-        html_content = format_email_html(notification.payload)
-        
-        # Crear mensaje
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"Resumen Diario - {notification.payload['summary_date']}"
-        msg['From'] = SMTP_FROM
-        msg['To'] = settings.email_to
+        msg = build_email_message(notification, settings, db)
+        if msg is None:
+            return False
         
-        # Adjuntar HTML
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
+        if not breaker.allow_request():
+            logger.warning("Email circuit breaker open, skipping send")
+            return False
         
-        # Conectar y enviar
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASS)
-            server.send_message(msg)
+        # Enviar por la conexión del lote (o una propia)
+        try:
+            if smtp is not None:
+                smtp.send_message(msg)
+            else:
+                with SMTPSession() as session:
+                    session.send_message(msg)
+        # smtplib.SMTPException hereda de OSError: las respuestas del servidor
+        # se clasifican antes que las fallas de red
+        except smtplib.SMTPConnectError:
+            breaker.record_failure()
+            raise
+        except smtplib.SMTPRecipientsRefused:
+            # El servidor respondió: el problema es el destinatario
+            breaker.record_success()
+            raise
+        except smtplib.SMTPResponseException as e:
+            # 4xx: falla temporal del servidor; 5xx: rechazo del mensaje
+            if 400 <= e.smtp_code < 500:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        except smtplib.SMTPServerDisconnected:
+            breaker.record_failure()
+            raise
+        except smtplib.SMTPException:
+            breaker.record_success()
+            raise
+        except OSError:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
         
         logger.info(f"Email sent successfully to {settings.email_to}")
         return True
@@ -125,20 +496,27 @@ def send_email(notification: NotificationQueue, settings: NotificationSettings)
         return False
 
 
-def send_notification(notification: NotificationQueue, settings: NotificationSettings) -> bool:
+def send_notification(
+    notification: NotificationQueue,
+    settings: NotificationSettings,
+    db: Optional[Session] = None,
+    smtp: Optional[SMTPSession] = None,
+) -> bool:
     """Envía notificación según el canal configurado.
     
     Args:
         notification: Registro de NotificationQueue
         settings: Configuración de notificaciones de la empresa
+        db: Sesión para armar payloads compactos al enviar
+        smtp: Sesión SMTP compartida del lote
     
     Returns:
         True si se envió exitosamente, False en caso contrario
     """
     if notification.channel == 'telegram':
-        return send_telegram(notification, settings)
+        return send_telegram(notification, settings, db)
     elif notification.channel == 'email':
-        return send_email(notification, settings)
+        return send_email(notification, settings, db, smtp)
     else:
         logger.error(f"Unknown channel: {notification.channel}")
         return False
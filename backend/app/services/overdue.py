@@ -0,0 +1,112 @@
+"""Transición nocturna de pagos pending vencidos a overdue."""
+
+import logging
+from datetime import date, datetime
+from typing import Dict, Optional, Set
+
+import pytz
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models.payment import Payment
+from app.services.audit_writer import enqueue_audit_entries, make_audit_entry
+from app.services.forecast import invalidate_company_forecast
+
+logger = logging.getLogger(__name__)
+
+# Timezone para Chile
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+# Filas por UPDATE; bloques chicos = locks cortos aunque haya millones de filas
+OVERDUE_CHUNK_SIZE = 5000
+
+
+def _mark_chunk(db: Session, today: date, now: datetime, chunk_size: int):
+    """Marca como overdue un bloque de pagos pending con vencimiento < hoy.
+
+    Los pagos con autopago quedan fuera: los salda run_autopay, que toma
+    cualquier pago no pagado con vencimiento <= hoy.
+
+    El subselect recorre idx_payments_pending_due_date (parcial sobre
+    status = 'pending') y SKIP LOCKED salta filas que otra transacción
+    está editando en vez de esperarlas.
+    """
+    overdue_ids = (
+        select(Payment.id)
+        .where(
+            Payment.status == 'pending',
+            Payment.autopay == False,
+            Payment.due_date < today
+        )
+        .order_by(Payment.due_date)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+
+    stmt = (
+        update(Payment)
+        .where(Payment.id.in_(overdue_ids))
+        .values(status='overdue', updated_at=now)
+        .returning(Payment.id, Payment.company_id)
+        .execution_options(synchronize_session=False)
+    )
+    return db.execute(stmt).all()
+
+
+def run_overdue_transition(today: Optional[date] = None, chunk_size: int = OVERDUE_CHUNK_SIZE) -> Dict:
+    """Pasa a overdue los pagos pending vencidos sin autopago, en todas las empresas.
+
+    Cada bloque se confirma por separado, así ninguna transacción mantiene
+    locks sobre más de chunk_size filas. Re-ejecutarlo es seguro.
+
+    Args:
+        today: Fecha de referencia (default: hoy en Santiago)
+        chunk_size: Filas por UPDATE
+
+    Returns:
+        Dict con cantidad de pagos actualizados y empresas afectadas, para
+        que quien llama invalide caches y resúmenes
+    """
+    now = datetime.now(SANTIAGO_TZ)
+    today = today or now.date()
+    db: Session = SessionLocal()
+
+    updated = 0
+    companies: Set[str] = set()
+
+    try:
+        while True:
+            rows = _mark_chunk(db, today, now, chunk_size)
+            db.commit()
+
+            updated += len(rows)
+            companies.update(str(row.company_id) for row in rows)
+            enqueue_audit_entries([
+                make_audit_entry(
+                    company_id=row.company_id,
+                    entity_type='payment',
+                    entity_id=row.id,
+                    action='overdue',
+                    before_data={"status": "pending"},
+                    after_data={"status": "overdue"},
+                )
+                for row in rows
+            ])
+
+            if len(rows) < chunk_size:
+                break
+
+        for company_id in companies:
+            invalidate_company_forecast(company_id)
+
+        logger.info(f"Overdue transition for {today}: {updated} payments across {len(companies)} companies")
+
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error running overdue transition for {today}: {e}", exc_info=True)
+    finally:
+        db.close()
+
+    return {"updated": updated, "companies": sorted(companies)}
@@ -0,0 +1,180 @@
+"""Lectura, reconstrucción y verificación de payment_daily_rollup.
+
+La tabla la mantienen triggers sobre payments; este módulo:
+- agrega los totales por día / semana / mes leyendo solo el rollup
+- reconstruye el rollup desde payments (backfill)
+- compara el rollup con un GROUP BY sobre payments (consistencia)
+"""
+
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import Session
+
+from app.models.payment import Payment
+from app.models.payment_daily_rollup import PaymentDailyRollup
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_PERIODS = ('day', 'week', 'month')
+
+
+def _period_start(day: date, period: str) -> date:
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def rollup_totals(
+    db: Session,
+    company_id,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    period: str = 'month',
+) -> List[Dict]:
+    """Cantidad y monto de pagos por período y estado, leídos del rollup.
+
+    Args:
+        db: Sesión de base de datos
+        company_id: UUID de la empresa
+        start: Primer día de vencimiento incluido (opcional)
+        end: Último día de vencimiento incluido (opcional)
+        period: 'day', 'week' (lunes) o 'month'
+
+    Returns:
+        Lista ordenada de {period_start, status, payment_count, total_amount}
+
+    Raises:
+        ValueError: Si el período no es válido
+    """
+    if period not in ROLLUP_PERIODS:
+        raise ValueError(f"Invalid period: {period}")
+
+    query = select(
+        PaymentDailyRollup.day,
+        PaymentDailyRollup.status,
+        PaymentDailyRollup.payment_count,
+        PaymentDailyRollup.total_amount,
+    ).where(
+        PaymentDailyRollup.company_id == company_id,
+        PaymentDailyRollup.payment_count != 0,
+    )
+    if start is not None:
+        query = query.where(PaymentDailyRollup.day >= start)
+    if end is not None:
+        query = query.where(PaymentDailyRollup.day <= end)
+
+    buckets: Dict[Tuple[date, str], List] = defaultdict(lambda: [0, Decimal(0)])
+    for day, status, payment_count, total_amount in db.execute(query):
+        bucket = buckets[(_period_start(day, period), status)]
+        bucket[0] += payment_count
+        bucket[1] += Decimal(total_amount)
+
+    return [
+        {
+            "period_start": period_start,
+            "status": status,
+            "payment_count": payment_count,
+            "total_amount": float(total_amount),
+        }
+        for (period_start, status), (payment_count, total_amount) in sorted(buckets.items())
+    ]
+
+
+def _aggregate_payments(company_id=None):
+    query = select(
+        Payment.company_id,
+        Payment.due_date,
+        Payment.status,
+        func.count(Payment.id),
+        func.sum(Payment.amount),
+    ).group_by(Payment.company_id, Payment.due_date, Payment.status)
+    if company_id is not None:
+        query = query.where(Payment.company_id == company_id)
+    return query
+
+
+def backfill_rollup(db: Session, company_id=None) -> int:
+    """Reconstruye el rollup desde payments (todas las empresas o una).
+
+    En PostgreSQL bloquea escrituras sobre payments mientras reconstruye,
+    para que ningún trigger aplique deltas sobre filas a medio recalcular.
+    No hace commit.
+
+    Returns:
+        Cantidad de filas de rollup escritas
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        db.execute(text("LOCK TABLE payments IN SHARE MODE"))
+
+    clear = delete(PaymentDailyRollup)
+    if company_id is not None:
+        clear = clear.where(PaymentDailyRollup.company_id == company_id)
+    db.execute(clear)
+
+    aggregate = _aggregate_payments(company_id).add_columns(func.now())
+    result = db.execute(
+        insert(PaymentDailyRollup).from_select(
+            ['company_id', 'day', 'status', 'payment_count', 'total_amount', 'updated_at'],
+            aggregate,
+        )
+    )
+
+    logger.info(f"Payment rollup backfilled: {result.rowcount} rows (company={company_id or 'all'})")
+
+    return result.rowcount
+
+
+def check_rollup_consistency(db: Session, company_id=None) -> List[Dict]:
+    """Compara el rollup con un GROUP BY sobre payments.
+
+    Returns:
+        Diferencias encontradas (vacío si son consistentes), cada una con
+        company_id, day, status y los valores esperados / actuales
+    """
+    expected = {
+        (str(row[0]), row[1], row[2]): (row[3], Decimal(row[4] or 0))
+        for row in db.execute(_aggregate_payments(company_id))
+    }
+
+    actual_query = select(
+        PaymentDailyRollup.company_id,
+        PaymentDailyRollup.day,
+        PaymentDailyRollup.status,
+        PaymentDailyRollup.payment_count,
+        PaymentDailyRollup.total_amount,
+    )
+    if company_id is not None:
+        actual_query = actual_query.where(PaymentDailyRollup.company_id == company_id)
+    actual = {
+        (str(row[0]), row[1], row[2]): (row[3], Decimal(row[4] or 0))
+        for row in db.execute(actual_query)
+    }
+
+    zero = (0, Decimal(0))
+    mismatches = []
+    for key in sorted(expected.keys() | actual.keys()):
+        expected_value = expected.get(key, zero)
+        actual_value = actual.get(key, zero)
+        # Tolerancia de redondeo: SQLite guarda NUMERIC como punto flotante
+        if expected_value[0] != actual_value[0] or abs(expected_value[1] - actual_value[1]) >= Decimal('0.01'):
+            mismatches.append({
+                "company_id": key[0],
+                "day": key[1].isoformat(),
+                "status": key[2],
+                "expected_count": expected_value[0],
+                "actual_count": actual_value[0],
+                "expected_amount": float(expected_value[1]),
+                "actual_amount": float(actual_value[1]),
+            })
+
+    if mismatches:
+        logger.warning(f"Payment rollup has {len(mismatches)} inconsistent rows")
+
+    return mismatches
@@ -0,0 +1,61 @@
+"""Proceso dedicado a jobs en segundo plano, separado de la API.
+
+Uso:
+    python -m app.worker
+
+Ejecuta el scheduler (resúmenes diarios, alertas, autopago, vencidos) y el
+consumidor de notification_queue. Con varias réplicas, solo el líder
+elegido ejecuta los jobs y el resto queda de respaldo. La API puede
+desactivar sus propios jobs con ENABLE_BACKGROUND_JOBS=false para escalar
+cada lado por separado.
+
+SIGTERM / SIGINT detienen el worker ordenadamente: cede el liderazgo,
+termina el lote en curso y vacía el buffer de auditoría.
+"""
+
+import logging
+import signal
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def run() -> None:
+    """Arranca los servicios de fondo y bloquea hasta recibir una señal."""
+    from app.services.audit_writer import start_audit_writer, shutdown_audit_writer
+    from app.services.forecast import install_forecast_invalidation
+    from app.workers.notification_consumer import install_notification_wakeup
+    from app.scheduler import start_scheduler, shutdown_scheduler
+    from app.services.notification_sender import close_telegram_client
+
+    stop = threading.Event()
+
+    def _handle_signal(signum, frame):
+        logger.info(f"Received signal {signum}, shutting down worker")
+        stop.set()
+
+    signal.signal(signal.SIGTERM, _handle_signal)
+    signal.signal(signal.SIGINT, _handle_signal)
+
+    start_audit_writer()
+    install_forecast_invalidation()
+    install_notification_wakeup()
+    start_scheduler()
+    logger.info("Background worker started")
+
+    try:
+        while not stop.wait(1.0):
+            pass
+    finally:
+        shutdown_scheduler()
+        close_telegram_client()
+        shutdown_audit_writer()
+        logger.info("Background worker stopped")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
+    run()
@@ -0,0 +1,243 @@
+"""Consumidor continuo de notification_queue.
+
+En vez de esperar a POST /notifications/process, un hilo procesa la cola y
+luego duerme hasta lo que ocurra primero:
+- el próximo scheduled_for pendiente (o next_attempt_at de un reintento)
+- un NOTIFY de PostgreSQL emitido al encolar (LISTEN notification_queue)
+- un aviso en el mismo proceso (commit que encoló una notificación)
+
+En SQLite no hay LISTEN/NOTIFY, así que se consulta el próximo
+scheduled_for cada NOTIFICATION_POLL_SECONDS (consulta sobre índice).
+"""
+
+import logging
+import os
+import select
+import threading
+from datetime import datetime
+from typing import Optional
+
+import pytz
+from sqlalchemy import event, func, text
+from sqlalchemy.orm import Session
+
+from app.models.database import SessionLocal, engine
+from app.models.notification_queue import NotificationQueue
+from app.workers.notification_worker import process_notification_queue
+
+logger = logging.getLogger(__name__)
+
+# Timezone para Chile
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+NOTIFY_CHANNEL = 'notification_queue'
+
+# Espera máxima sin novedades (red de seguridad si se pierde un NOTIFY)
+NOTIFICATION_MAX_IDLE_SECONDS = float(os.getenv('NOTIFICATION_MAX_IDLE_SECONDS', '60'))
+# Intervalo de sondeo cuando no hay LISTEN/NOTIFY (SQLite)
+NOTIFICATION_POLL_SECONDS = float(os.getenv('NOTIFICATION_POLL_SECONDS', '1'))
+# Pausa si hay notificaciones vencidas pero el procesamiento no avanzó
+NOTIFICATION_ERROR_BACKOFF_SECONDS = 5.0
+
+
+class NotificationConsumer:
+    """Hilo que procesa la cola apenas hay notificaciones vencidas."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Self-pipe: permite despertar el select() desde otro hilo
+        self._wake_r: Optional[int] = None
+        self._wake_w: Optional[int] = None
+        self._listen_conn = None
+        self._listen_raw = None
+        self.wakeups = 0
+        self.processed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self._thread = threading.Thread(
+            target=self._run,
+            name='notification-consumer',
+            daemon=True,
+        )
+        self._thread.start()
+        logger.info("Notification consumer started")
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """Detiene el consumidor tras terminar el lote en curso."""
+        if not self.running:
+            return
+        self._stop.set()
+        self.wake()
+        self._thread.join(timeout=timeout)
+        self._thread = None
+        self._close_listen_conn()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+        self._wake_r = self._wake_w = None
+        logger.info("Notification consumer stopped")
+
+    def wake(self) -> None:
+        """Despierta el consumidor (p.ej. tras encolar en este proceso)."""
+        if self._wake_w is None:
+            return
+        try:
+            os.write(self._wake_w, b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = process_notification_queue()
+                self.processed += processed
+                timeout = self._seconds_until_next_due()
+                if timeout <= 0 and not processed:
+                    timeout = NOTIFICATION_ERROR_BACKOFF_SECONDS
+            except Exception as e:
+                logger.error(f"Error in notification consumer: {e}", exc_info=True)
+                timeout = NOTIFICATION_ERROR_BACKOFF_SECONDS
+
+            if timeout > 0:
+                self._wait(timeout)
+
+    def _seconds_until_next_due(self) -> float:
+        """Segundos hasta el próximo envío pendiente (acotado).
+        
+        Un reintento en espera vence en next_attempt_at, no en scheduled_for.
+        """
+        db: Session = SessionLocal()
+        try:
+            next_due = db.query(func.min(
+                func.coalesce(NotificationQueue.next_attempt_at, NotificationQueue.scheduled_for)
+            )).filter(
+                NotificationQueue.status == 'pending'
+            ).scalar()
+        finally:
+            db.close()
+
+        idle = NOTIFICATION_MAX_IDLE_SECONDS
+        if engine.dialect.name != 'postgresql':
+            idle = min(idle, NOTIFICATION_POLL_SECONDS)
+        if next_due is None:
+            return idle
+
+        if next_due.tzinfo is None:
+            # SQLite guarda la hora local de Santiago sin zona horaria
+            next_due = SANTIAGO_TZ.localize(next_due)
+        delay = (next_due - datetime.now(SANTIAGO_TZ)).total_seconds()
+        return min(max(delay, 0.0), idle)
+
+    def _wait(self, timeout: float) -> None:
+        """Bloquea hasta el timeout, un NOTIFY o un wake()."""
+        readers = [self._wake_r]
+        listen_conn = self._ensure_listen_conn()
+        if listen_conn is not None:
+            readers.append(listen_conn)
+
+        try:
+            ready, _, _ = select.select(readers, [], [], timeout)
+        except (OSError, ValueError):
+            self._close_listen_conn()
+            return
+
+        if self._wake_r in ready:
+            self.wakeups += 1
+            try:
+                while os.read(self._wake_r, 1024):
+                    pass
+            except BlockingIOError:
+                pass
+
+        if listen_conn is not None and listen_conn in ready:
+            self.wakeups += 1
+            try:
+                listen_conn.poll()
+                listen_conn.notifies.clear()
+            except Exception as e:
+                logger.warning(f"LISTEN connection lost: {e}")
+                self._close_listen_conn()
+
+    def _ensure_listen_conn(self):
+        """Conexión psycopg2 dedicada en LISTEN (solo PostgreSQL)."""
+        if engine.dialect.name != 'postgresql':
+            return None
+        if self._listen_conn is not None:
+            return self._listen_conn
+        try:
+            raw = engine.raw_connection()
+            conn = raw.driver_connection
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {NOTIFY_CHANNEL}")
+            self._listen_conn = conn
+            self._listen_raw = raw
+        except Exception as e:
+            logger.warning(f"Could not LISTEN on {NOTIFY_CHANNEL}, polling instead: {e}")
+            return None
+        return self._listen_conn
+
+    def _close_listen_conn(self) -> None:
+        if self._listen_conn is None:
+            return
+        try:
+            # No devolver al pool una conexión en LISTEN/autocommit
+            self._listen_raw.invalidate()
+        except Exception:
+            pass
+        self._listen_conn = None
+        self._listen_raw = None
+
+    def metrics(self) -> dict:
+        return {
+            "running": self.running,
+            "listening": self._listen_conn is not None,
+            "processed": self.processed,
+            "wakeups": self.wakeups,
+        }
+
+
+notification_consumer = NotificationConsumer()
+
+
+_ENQUEUED_KEY = 'notification_enqueued'
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    if session.info.get(_ENQUEUED_KEY):
+        return
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, NotificationQueue) and obj.status == 'pending':
+            session.info[_ENQUEUED_KEY] = True
+            connection = session.connection()
+            if connection.dialect.name == 'postgresql':
+                # NOTIFY es transaccional: se entrega al hacer commit
+                connection.execute(text("SELECT pg_notify(:channel, '')"), {"channel": NOTIFY_CHANNEL})
+            return
+
+
+def _after_commit(session: Session) -> None:
+    if session.info.pop(_ENQUEUED_KEY, False):
+        notification_consumer.wake()
+
+
+def _after_soft_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_ENQUEUED_KEY, None)
+
+
+def install_notification_wakeup() -> None:
+    """Emite NOTIFY / despierta el consumidor al encolar notificaciones (idempotente)."""
+    if event.contains(Session, 'after_flush', _after_flush):
+        return
+    event.listen(Session, 'after_flush', _after_flush)
+    event.listen(Session, 'after_commit', _after_commit)
+    event.listen(Session, 'after_soft_rollback', _after_soft_rollback)
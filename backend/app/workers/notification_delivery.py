@@ -0,0 +1,302 @@
+"""Motor asíncrono de envío para notification_queue.
+
+process_notification_queue prepara los mensajes (validación y render con la
+sesión de base de datos) y este módulo los envía concurrentemente:
+- Telegram: httpx.AsyncClient con hasta TELEGRAM_CONCURRENCY requests en
+  vuelo, token bucket global (TELEGRAM_GLOBAL_RATE msg/s) y uno por chat
+  (TELEGRAM_CHAT_RATE msg/s), según los límites de la Bot API. Un 429
+  pausa el bucket global durante el retry_after indicado y se reintenta.
+- Email: EMAIL_CONCURRENCY sesiones SMTP autenticadas (SMTPSession) usadas
+  desde hilos; cada una conserva su conexión durante todo el lote.
+
+Un canal lento ya no frena al otro: ambos avanzan en el mismo event loop.
+Los resultados se entregan a un callback a medida que terminan, para que
+el worker los registre en commits por lotes. Las fallas se informan como
+DeliveryError, que indica si vale la pena reintentar (caídas de red,
+timeouts, 5xx, 429 y respuestas SMTP 4xx) o no (chat inválido, destinatario
+rechazado, configuración faltante).
+
+Cada envío pasa por el circuit breaker de su canal: las fallas transitorias
+lo abren y, mientras está abierto, los envíos se posponen sin llamar a la
+red (DeliveryError con defer_seconds, que no cuenta como intento).
+"""
+
+import asyncio
+import logging
+import os
+import smtplib
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from app.services.notification_sender import SMTPSession, circuit_breakers, telegram_client_options
+
+logger = logging.getLogger(__name__)
+
+# Requests simultáneos a la Bot API
+TELEGRAM_CONCURRENCY = int(os.getenv('TELEGRAM_CONCURRENCY', '20'))
+# Límites de la Bot API: ~30 msg/s en total y ~1 msg/s por chat
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))
+TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+# Reintentos tras 429 Too Many Requests
+TELEGRAM_MAX_RATE_LIMIT_RETRIES = 3
+# Conexiones SMTP simultáneas (una sesión autenticada por hilo)
+EMAIL_CONCURRENCY = int(os.getenv('EMAIL_CONCURRENCY', '4'))
+
+
+class DeliveryError(Exception):
+    """Falla de envío; `transient` indica si conviene reintentar más tarde.
+
+    Con defer_seconds el envío no se intentó (circuit breaker abierto) y
+    debe posponerse ese tiempo sin contarlo como intento fallido.
+    rate_limited indica que el canal respondió pero limitó el envío (429):
+    se reintenta, pero no cuenta como caída para el circuit breaker.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        transient: bool = True,
+        defer_seconds: Optional[float] = None,
+        rate_limited: bool = False,
+    ):
+        super().__init__(message)
+        self.transient = transient
+        self.defer_seconds = defer_seconds
+        self.rate_limited = rate_limited
+
+
+def _check_circuit(channel: str) -> None:
+    """Pospone el envío si el circuit breaker del canal no deja pasar.
+
+    Reserva el envío de prueba si el breaker está half_open; se llama una
+    vez por job, antes de esperar cupos o tokens de rate limit.
+    """
+    breaker = circuit_breakers[channel]
+    if not breaker.allow_request():
+        raise DeliveryError(f"{channel} circuit breaker {breaker.state}", defer_seconds=breaker.retry_in())
+
+
+def _defer_if_open(channel: str) -> None:
+    """Pospone un job ya admitido si el breaker se abrió mientras esperaba.
+
+    No reserva nada: solo evita gastar un token de rate limit en un envío
+    que no se va a intentar.
+    """
+    breaker = circuit_breakers[channel]
+    if breaker.state == breaker.OPEN:
+        raise DeliveryError(f"{channel} circuit breaker open", defer_seconds=breaker.retry_in())
+
+
+class DeliveryJob:
+    """Mensaje ya armado para una notificación de la cola.
+
+    Guarda channel / company_id aparte para no recargar la fila (expirada
+    tras cada commit) al registrar el resultado.
+    """
+
+    __slots__ = ('notification', 'channel', 'company_id', 'attempts', 'request')
+
+    def __init__(self, notification, channel: str, company_id, attempts: int, request):
+        self.notification = notification
+        self.channel = channel
+        self.company_id = company_id
+        # Intentos fallidos previos a este envío
+        self.attempts = attempts
+        # dict de sendMessage (telegram) o MIMEMultipart (email)
+        self.request = request
+
+
+class TokenBucket:
+    """Token bucket para asyncio: `rate` tokens por segundo, ráfaga `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        """Espera hasta obtener un token (los que esperan avanzan en orden)."""
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Deja el bucket en deuda para que nadie envíe durante `seconds`."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.json().get('parameters', {}).get('retry_after', 1))
+    except (ValueError, AttributeError):
+        return 1.0
+
+
+class DeliveryEngine:
+    """Envía un lote de DeliveryJob con límites de concurrencia por canal."""
+
+    def __init__(
+        self,
+        telegram_concurrency: int = TELEGRAM_CONCURRENCY,
+        telegram_global_rate: float = TELEGRAM_GLOBAL_RATE,
+        telegram_chat_rate: float = TELEGRAM_CHAT_RATE,
+        email_concurrency: int = EMAIL_CONCURRENCY,
+        smtp_factory: Callable[[], SMTPSession] = SMTPSession,
+    ):
+        self.telegram_concurrency = telegram_concurrency
+        self.telegram_global_rate = telegram_global_rate
+        self.telegram_chat_rate = telegram_chat_rate
+        self.email_concurrency = email_concurrency
+        self.smtp_factory = smtp_factory
+
+    def run(self, jobs: List[DeliveryJob], on_result: Callable[[DeliveryJob, Optional[DeliveryError]], None]) -> None:
+        """Envía todos los jobs; llama on_result(job, error) al terminar cada uno.
+
+        error es None si el envío fue exitoso.
+
+        on_result corre en el hilo que llama a run, así puede usar la sesión
+        de base de datos del worker.
+        """
+        if jobs:
+            asyncio.run(self._run(jobs, on_result))
+
+    async def _run(self, jobs: List[DeliveryJob], on_result) -> None:
+        telegram_jobs = [job for job in jobs if job.channel == 'telegram']
+        email_jobs = [job for job in jobs if job.channel == 'email']
+
+        async def track(job: DeliveryJob, send) -> None:
+            breaker = circuit_breakers[job.channel]
+            error = None
+            try:
+                await send(job)
+                breaker.record_success()
+            except DeliveryError as e:
+                if e.defer_seconds is None:
+                    logger.error(f"Error sending {job.channel}: {e}")
+                    # Un rechazo del mensaje (4xx) o un 429 no indican que el canal esté caído
+                    if e.transient and not e.rate_limited:
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                error = e
+            except Exception as e:
+                logger.error(f"Unexpected error sending {job.channel}: {e}", exc_info=True)
+                breaker.record_failure()
+                error = DeliveryError(f"Unexpected error: {e}")
+            on_result(job, error)
+
+        tasks = []
+        telegram_client = None
+        smtp_pool: Optional[asyncio.Queue] = None
+
+        if telegram_jobs:
+            options = telegram_client_options()
+            options['limits'] = httpx.Limits(
+                max_connections=self.telegram_concurrency,
+                max_keepalive_connections=self.telegram_concurrency,
+            )
+            telegram_client = httpx.AsyncClient(**options)
+            send_telegram = self._telegram_sender(telegram_client)
+            tasks += [track(job, send_telegram) for job in telegram_jobs]
+
+        if email_jobs:
+            smtp_pool = asyncio.Queue()
+            for _ in range(min(self.email_concurrency, len(email_jobs))):
+                smtp_pool.put_nowait(self.smtp_factory())
+            send_email = self._email_sender(smtp_pool)
+            tasks += [track(job, send_email) for job in email_jobs]
+
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            if telegram_client is not None:
+                await telegram_client.aclose()
+            if smtp_pool is not None:
+                while not smtp_pool.empty():
+                    await asyncio.to_thread(smtp_pool.get_nowait().close)
+
+    def _telegram_sender(self, client: httpx.AsyncClient):
+        semaphore = asyncio.Semaphore(self.telegram_concurrency)
+        global_bucket = TokenBucket(self.telegram_global_rate)
+        chat_buckets: Dict[str, TokenBucket] = {}
+
+        async def send(job: DeliveryJob) -> None:
+            chat_id = job.request['chat_id']
+            chat_bucket = chat_buckets.get(chat_id)
+            if chat_bucket is None:
+                chat_bucket = chat_buckets[chat_id] = TokenBucket(self.telegram_chat_rate, capacity=1)
+
+            # Antes de esperar tokens: un envío pospuesto no gasta rate limit
+            _check_circuit('telegram')
+
+            for _ in range(TELEGRAM_MAX_RATE_LIMIT_RETRIES + 1):
+                # El límite por chat se espera sin ocupar un cupo de concurrencia
+                await chat_bucket.acquire()
+                async with semaphore:
+                    _defer_if_open('telegram')
+                    await global_bucket.acquire()
+                    try:
+                        response = await client.post("/sendMessage", json=job.request)
+                    except httpx.HTTPError as e:
+                        raise DeliveryError(f"Telegram request failed: {e!r}")
+
+                if response.status_code == 429:
+                    retry_after = _retry_after(response)
+                    logger.warning(f"Telegram rate limited, retrying after {retry_after}s")
+                    global_bucket.pause(retry_after)
+                    continue
+
+                try:
+                    result = response.json()
+                except ValueError:
+                    result = {}
+
+                if response.is_success and result.get('ok'):
+                    logger.info(f"Telegram sent successfully to {chat_id}")
+                    return
+                # 4xx (chat inexistente, bot bloqueado, mensaje inválido) no se resuelve reintentando
+                raise DeliveryError(
+                    f"Telegram API error {response.status_code}: "
+                    f"{result.get('description') or response.reason_phrase}",
+                    transient=response.is_server_error,
+                )
+
+            raise DeliveryError(f"Telegram rate limit retries exhausted for {chat_id}", rate_limited=True)
+
+        return send
+
+    def _email_sender(self, pool: asyncio.Queue):
+        async def send(job: DeliveryJob) -> None:
+            session = await pool.get()
+            try:
+                _check_circuit('email')
+                await asyncio.to_thread(session.send_message, job.request)
+            except smtplib.SMTPRecipientsRefused as e:
+                codes = [code for code, _ in e.recipients.values()]
+                raise DeliveryError(f"SMTP recipients refused: {e.recipients}",
+                                    transient=all(400 <= code < 500 for code in codes))
+            except smtplib.SMTPResponseException as e:
+                # 4xx: falla temporal del servidor; 5xx: rechazo permanente
+                raise DeliveryError(f"SMTP error {e.smtp_code}: {e.smtp_error!r}",
+                                    transient=400 <= e.smtp_code < 500)
+            except (smtplib.SMTPException, OSError) as e:
+                raise DeliveryError(f"SMTP error: {e!r}")
+            finally:
+                pool.put_nowait(session)
+            logger.info(f"Email sent successfully to {job.request['To']}")
+
+        return send
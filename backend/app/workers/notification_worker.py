@@ -1,130 +1,288 @@
 """Worker for processing notification queue and sending notifications."""
 
 import logging
-from datetime import datetime
+import os
+import random
+from datetime import datetime, timedelta
+from typing import List, Optional
 import pytz
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import or_, select, update
 
 from app.models.database import SessionLocal
 from app.models.notification_queue import NotificationQueue
 from app.models.notification_settings import NotificationSettings
-from app.services.notification_sender import send_telegram, send_email
+from app.services.notification_sender import build_email_message, build_telegram_request
+from app.workers.notification_delivery import DeliveryEngine, DeliveryError, DeliveryJob
 
 logger = logging.getLogger(__name__)
 
 # Timezone para Chile
 SANTIAGO_TZ = pytz.timezone('America/Santiago')
 
+# Resultados de envío registrados por commit
+DELIVERY_COMMIT_BATCH = int(os.getenv('DELIVERY_COMMIT_BATCH', '200'))
 
-def process_notification_queue():
-    """Procesa la cola de notificaciones pendientes.
+# Notificaciones reservadas, armadas y enviadas por página
+NOTIFICATION_PAGE_SIZE = int(os.getenv('NOTIFICATION_PAGE_SIZE', '500'))
+# Plazo de reserva de una página; debe superar lo que tarda en enviarse
+NOTIFICATION_CLAIM_SECONDS = float(os.getenv('NOTIFICATION_CLAIM_SECONDS', '600'))
+
+# Reintentos ante fallas transitorias: 30s, 1m, 2m, 4m... (con jitter) hasta
+# NOTIFICATION_MAX_ATTEMPTS intentos; luego la notificación queda 'failed'
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '5'))
+NOTIFICATION_RETRY_BASE_SECONDS = float(os.getenv('NOTIFICATION_RETRY_BASE_SECONDS', '30'))
+NOTIFICATION_RETRY_MAX_SECONDS = float(os.getenv('NOTIFICATION_RETRY_MAX_SECONDS', '900'))
+
+# Largo máximo guardado en last_error
+MAX_ERROR_LENGTH = 1000
+
+
+def retry_delay(attempts: int) -> float:
+    """Espera antes del próximo intento tras `attempts` fallas.
+    
+    Backoff exponencial con jitter (entre la mitad y el total del tope), para
+    que las notificaciones que fallaron juntas no reintenten todas a la vez.
+    """
+    delay = min(NOTIFICATION_RETRY_MAX_SECONDS, NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def _record_failure(notification: NotificationQueue, attempts: int, error: DeliveryError) -> Optional[float]:
+    """Registra un intento fallido: reprograma si es transitorio, si no 'failed'.
+    
+    Un envío pospuesto por el circuit breaker se reprograma sin contar intento.
+    
+    Args:
+        notification: Registro de NotificationQueue
+        attempts: Intentos fallidos previos a este
+        error: Falla del intento
+    
+    Returns:
+        Segundos hasta el reintento, o None si quedó 'failed'
+    """
+    if error.defer_seconds is not None:
+        # No se intentó el envío (circuit breaker abierto): solo posponer
+        notification.next_attempt_at = datetime.now(SANTIAGO_TZ) + timedelta(seconds=error.defer_seconds)
+        return error.defer_seconds
+    
+    attempts += 1
+    notification.attempts = attempts
+    notification.last_error = str(error)[:MAX_ERROR_LENGTH]
+    
+    if error.transient and attempts < NOTIFICATION_MAX_ATTEMPTS:
+        # scheduled_for no cambia: la deduplicación del scheduler lo usa
+        delay = retry_delay(attempts)
+        notification.next_attempt_at = datetime.now(SANTIAGO_TZ) + timedelta(seconds=delay)
+        return delay
+    
+    notification.status = 'failed'
+    notification.next_attempt_at = None
+    return None
+
+
+def _prepare_job(notification: NotificationQueue, settings: Optional[NotificationSettings], db: Session) -> DeliveryJob:
+    """Valida la notificación y arma su mensaje.
+    
+    Returns:
+        DeliveryJob listo para enviar
+    
+    Raises:
+        DeliveryError: Si no se puede enviar (no transitorio: reintentar no
+            lo resuelve)
+    """
+    if not settings:
+        raise DeliveryError(f"No settings found for company {notification.company_id}", transient=False)
+    
+    # Validar que hay payload
+    if not notification.payload:
+        raise DeliveryError(f"Notification {notification.id} has no payload", transient=False)
+    
+    # Procesar según canal
+    if notification.channel == 'telegram':
+        if not settings.telegram_enabled:
+            raise DeliveryError(f"Telegram disabled for company {notification.company_id}", transient=False)
+        request = build_telegram_request(notification, settings, db)
+        
+    elif notification.channel == 'email':
+        if not settings.email_enabled:
+            raise DeliveryError(f"Email disabled for company {notification.company_id}", transient=False)
+        request = build_email_message(notification, settings, db)
+        
+    else:
+        raise DeliveryError(f"Unknown channel: {notification.channel}", transient=False)
+    
+    if request is None:
+        raise DeliveryError(f"{notification.channel} delivery not configured", transient=False)
+    
+    return DeliveryJob(
+        notification, notification.channel, notification.company_id, notification.attempts or 0, request
+    )
+
+
+def _claim_page(db: Session, now: datetime, page_size: int) -> List[NotificationQueue]:
+    """Reserva una página de notificaciones vencidas para este proceso.
+    
+    El UPDATE corre next_attempt_at al fin del plazo de reserva, así ningún
+    otro consumidor (el del líder o POST /notifications/process) ve esas
+    filas mientras se envían. SKIP LOCKED salta las que otro está
+    reservando en ese momento. Si el proceso muere a mitad de página, las
+    filas vuelven a estar disponibles al vencer la reserva.
     
-    Lee notification_queue donde:
+    Returns:
+        Notificaciones reservadas (ya confirmadas), en orden de scheduled_for
+    """
+    due_ids = (
+        select(NotificationQueue.id)
+        .where(
+            NotificationQueue.status == 'pending',
+            NotificationQueue.scheduled_for <= now,
+            or_(
+                NotificationQueue.next_attempt_at.is_(None),
+                NotificationQueue.next_attempt_at <= now
+            )
+        )
+        .order_by(NotificationQueue.scheduled_for)
+        .limit(page_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    claimed_ids = db.execute(
+        update(NotificationQueue)
+        .where(NotificationQueue.id.in_(due_ids))
+        .values(next_attempt_at=now + timedelta(seconds=NOTIFICATION_CLAIM_SECONDS))
+        .returning(NotificationQueue.id)
+        .execution_options(synchronize_session=False)
+    ).scalars().all()
+    db.commit()
+    
+    if not claimed_ids:
+        return []
+    return db.query(NotificationQueue).filter(
+        NotificationQueue.id.in_(claimed_ids)
+    ).order_by(NotificationQueue.scheduled_for).all()
+
+
+def _process_page(db: Session, notifications: List[NotificationQueue], engine: DeliveryEngine) -> None:
+    """Arma y envía una página de notificaciones reservadas, registrando cada resultado."""
+    # Configuración de todas las empresas de la página en una consulta
+    company_ids = {notification.company_id for notification in notifications}
+    settings_by_company = {
+        settings.company_id: settings
+        for settings in db.query(NotificationSettings).filter(
+            NotificationSettings.company_id.in_(company_ids)
+        )
+    }
+    
+    jobs = []
+    for notification in notifications:
+        try:
+            jobs.append(_prepare_job(notification, settings_by_company.get(notification.company_id), db))
+        except DeliveryError as e:
+            logger.error(f"Cannot send notification {notification.id}: {e}")
+            _record_failure(notification, notification.attempts or 0, e)
+        except Exception as e:
+            logger.error(
+                f"Error processing notification {notification.id}: {e}",
+                exc_info=True
+            )
+            _record_failure(notification, notification.attempts or 0, DeliveryError(str(e), transient=False))
+    
+    # Registrar las que no se pueden enviar antes de empezar
+    db.commit()
+    
+    uncommitted = 0
+    
+    def record(job: DeliveryJob, error: Optional[DeliveryError]) -> None:
+        nonlocal uncommitted
+        
+        # Actualizar status
+        if error is None:
+            job.notification.status = 'sent'
+            job.notification.sent_at = datetime.now(SANTIAGO_TZ)
+            job.notification.next_attempt_at = None
+            logger.info(f"Sent {job.channel} notification for company {job.company_id}")
+        else:
+            delay = _record_failure(job.notification, job.attempts, error)
+            if error.defer_seconds is not None:
+                logger.info(
+                    f"Deferred {job.channel} notification for company {job.company_id} "
+                    f"by {delay:.0f}s ({error})"
+                )
+            elif delay is None:
+                logger.error(f"Failed to send {job.channel} notification for company {job.company_id}")
+            else:
+                logger.warning(
+                    f"Failed to send {job.channel} notification for company {job.company_id} "
+                    f"(attempt {job.attempts + 1}/{NOTIFICATION_MAX_ATTEMPTS}), retrying in {delay:.0f}s"
+                )
+        
+        uncommitted += 1
+        if uncommitted >= DELIVERY_COMMIT_BATCH:
+            db.commit()
+            uncommitted = 0
+    
+    try:
+        engine.run(jobs, record)
+    finally:
+        # Registrar lo enviado aunque la página se interrumpa
+        db.commit()
+
+
+def process_notification_queue(engine: Optional[DeliveryEngine] = None, page_size: Optional[int] = None):
+    """Procesa la cola de notificaciones pendientes, por páginas.
+    
+    Reserva páginas de hasta NOTIFICATION_PAGE_SIZE notificaciones donde:
     - status = 'pending'
     - scheduled_for <= now()
+    - next_attempt_at vacío o <= now() (reintentos en espera)
     
-    Para cada notificación:
-    - Envía según el canal (telegram/email)
-    - Actualiza status a 'sent' o 'failed'
+    La reserva (ver _claim_page) evita que dos consumidores envíen la misma
+    notificación. Para cada página:
+    - Valida configuración y arma los mensajes (telegram/email)
+    - Envía concurrentemente con DeliveryEngine (límites por canal)
+    - Actualiza status a 'sent' o 'failed', con commits cada
+      DELIVERY_COMMIT_BATCH resultados
+    - Ante fallas transitorias queda 'pending' con next_attempt_at
+      (backoff exponencial) hasta NOTIFICATION_MAX_ATTEMPTS intentos
     - Registra sent_at en caso de éxito
+    
+    La memoria y el render quedan acotados a una página aunque la cola
+    tenga un backlog grande.
+    
+    Args:
+        engine: Motor de envío (por defecto uno con la configuración de entorno)
+        page_size: Notificaciones por página (default: NOTIFICATION_PAGE_SIZE)
+    
+    Returns:
+        Cantidad de notificaciones procesadas
     """
+    engine = engine or DeliveryEngine()
+    page_size = page_size or NOTIFICATION_PAGE_SIZE
     db: Session = SessionLocal()
+    processed = 0
     
     try:
-        now = datetime.now(SANTIAGO_TZ)
-        
-        # Obtener notificaciones pendientes
-        pending_notifications = db.query(NotificationQueue).filter(
-            and_(
-                NotificationQueue.status == 'pending',
-                NotificationQueue.scheduled_for <= now
-            )
-        ).all()
+        while True:
+            notifications = _claim_page(db, datetime.now(SANTIAGO_TZ), page_size)
+            if not notifications:
+                break
+            
+            logger.info(f"Processing {len(notifications)} pending notifications")
+            _process_page(db, notifications, engine)
+            processed += len(notifications)
+            
+            if len(notifications) < page_size:
+                break
         
-        if not pending_notifications:
+        if processed:
+            logger.info(f"Finished processing {processed} notifications")
+        else:
             logger.debug("No pending notifications to process")
-            return
-        
-        logger.info(f"Processing {len(pending_notifications)} pending notifications")
-        
-        for notification in pending_notifications:
-            try:
-                # Obtener configuración de la empresa
-                settings = db.query(NotificationSettings).filter(
-                    NotificationSettings.company_id == notification.company_id
-                ).first()
-                
-                if not settings:
-                    logger.error(f"No settings found for company {notification.company_id}")
-                    notification.status = 'failed'
-                    db.commit()
-                    continue
-                
-                # Validar que hay payload
-                if not notification.payload:
-                    logger.error(f"Notification {notification.id} has no payload")
-                    notification.status = 'failed'
-                    db.commit()
-                    continue
-                
-                # Procesar según canal
-                success = False
-                
-                if notification.channel == 'telegram':
-                    if not settings.telegram_enabled:
-                        logger.warning(f"Telegram disabled for company {notification.company_id}")
-                        notification.status = 'failed'
-                        db.commit()
-                        continue
-                    
-                    # Enviar
-                    success = send_telegram(notification, settings)
-                    
-                elif notification.channel == 'email':
-                    if not settings.email_enabled:
-                        logger.warning(f"Email disabled for company {notification.company_id}")
-                        notification.status = 'failed'
-                        db.commit()
-                        continue
-                    
-                    # Enviar
-                    success = send_email(notification, settings)
-                    
-                else:
-                    logger.error(f"Unknown channel: {notification.channel}")
-                    notification.status = 'failed'
-                    db.commit()
-                    continue
-                
-                # Actualizar status
-                if success:
-                    notification.status = 'sent'
-                    notification.sent_at = datetime.now(SANTIAGO_TZ)
-                    logger.info(
-                        f"Sent {notification.channel} notification "
-                        f"for company {notification.company_id}"
-                    )
-                else:
-                    notification.status = 'failed'
-                    logger.error(
-                        f"Failed to send {notification.channel} notification "
-                        f"for company {notification.company_id}"
-                    )
-                
-                db.commit()
-                
-            except Exception as e:
-                logger.error(
-                    f"Error processing notification {notification.id}: {e}",
-                    exc_info=True
-                )
-                notification.status = 'failed'
-                db.commit()
-        
-        logger.info(f"Finished processing {len(pending_notifications)} notifications")
+        return processed
         
     except Exception as e:
         logger.error(f"Error in process_notification_queue: {e}", exc_info=True)
+        return processed
     finally:
         db.close()
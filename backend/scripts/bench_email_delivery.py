@@ -0,0 +1,69 @@
+"""Benchmark: envío de emails con una conexión SMTP por mensaje vs SMTPSession.
+
+Levanta un servidor SMTP local que acepta y descarta todo y envía N mensajes:
+- legacy: conexión + EHLO + AUTH + QUIT por mensaje (como antes send_email)
+- session: una SMTPSession reutilizada, con el tope de mensajes por conexión
+
+El sumidero es el de scripts/delivery_fakes (aiosmtpd si está instalado).
+Sin STARTTLS: contra un servidor real cada conexión nueva además paga el
+handshake TLS.
+
+Con --drop-every N el sumidero corta la conexión cada N mensajes para
+verificar que la sesión reconecta sin perder envíos.
+
+Uso (desde backend/):
+    python -m scripts.bench_email_delivery --messages 2000
+"""
+
+import argparse
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from app.services.notification_sender import SMTPSession
+from scripts.delivery_fakes import start_smtp_sink
+
+
+def _build_message(index: int) -> MIMEMultipart:
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"Resumen Diario - bench {index}"
+    msg['From'] = 'bench@example.com'
+    msg['To'] = 'dest@example.com'
+    msg.attach(MIMEText("<h2>Resumen de prueba</h2>", 'html', 'utf-8'))
+    return msg
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--max-per-connection', type=int, default=100)
+    parser.add_argument('--drop-every', type=int, default=0)
+    args = parser.parse_args()
+
+    port, received = start_smtp_sink(drop_every=args.drop_every)
+    messages = [_build_message(i) for i in range(args.messages)]
+    options = dict(host='127.0.0.1', port=port, user='bench', password='bench', starttls=False)
+
+    started = time.perf_counter()
+    for msg in messages:
+        with SMTPSession(**options) as session:
+            session.send_message(msg)
+    legacy = args.messages / (time.perf_counter() - started)
+
+    before = received()
+    started = time.perf_counter()
+    with SMTPSession(max_messages_per_connection=args.max_per_connection, **options) as session:
+        for msg in messages:
+            session.send_message(msg)
+    pooled = args.messages / (time.perf_counter() - started)
+    delivered = received() - before
+
+    print(f"Messages: {args.messages} (max per connection: {args.max_per_connection})")
+    print(f"  legacy (connection per message)  {legacy:10.0f} msg/s")
+    print(f"  session (reused connection)      {pooled:10.0f} msg/s  "
+          f"[{session.connections} connections, {delivered} delivered]")
+    print(f"  speedup: {pooled / legacy:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
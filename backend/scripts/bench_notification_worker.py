@@ -0,0 +1,179 @@
+"""Benchmark: throughput y latencia de process_notification_queue de punta a punta.
+
+Levanta la Bot API falsa y el sumidero SMTP de scripts/delivery_fakes,
+encola N notificaciones vencidas (una empresa con su configuración por
+notificación) y llama a process_notification_queue hasta vaciar la cola,
+incluyendo los reintentos. Reporta:
+- mensajes enviados por segundo
+- latencia p50 / p99 / máx desde scheduled_for hasta sent_at
+- contadores de la Bot API falsa y del sumidero
+
+Por defecto usa una base SQLite temporal; con --database-url se puede
+apuntar a un PostgreSQL de pruebas (se crean empresas y notificaciones).
+Los límites de la Bot API (30 msg/s) aplican salvo --telegram-rate.
+
+Uso (desde backend/):
+    python -m scripts.bench_notification_worker --notifications 1000 --latency 0.05
+    python -m scripts.bench_notification_worker --notifications 10000 --telegram-rate 1000 --error-rate 0.01
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, time as time_of_day
+
+import numpy as np
+import pytz
+
+from scripts.delivery_fakes import FAKE_TELEGRAM_TOKEN, start_fake_telegram, start_smtp_sink
+
+SANTIAGO_TZ = pytz.timezone('America/Santiago')
+
+
+def _configure_environment(args, telegram_base_url: str, smtp_port: int) -> None:
+    """Apunta el sender a los servicios falsos (antes de importar app.*)."""
+    if args.database_url:
+        os.environ['DATABASE_URL'] = args.database_url
+    else:
+        os.environ['DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp()}/bench_worker.db"
+
+    os.environ.update(
+        TELEGRAM_BOT_TOKEN=FAKE_TELEGRAM_TOKEN,
+        TELEGRAM_API_BASE=telegram_base_url,
+        SMTP_HOST='127.0.0.1',
+        SMTP_PORT=str(smtp_port),
+        SMTP_USER='bench',
+        SMTP_PASS='bench',
+        SMTP_STARTTLS='false',
+    )
+    if args.telegram_rate is not None:
+        os.environ['TELEGRAM_GLOBAL_RATE'] = str(args.telegram_rate)
+    # Reintentos rápidos para que las fallas simuladas no alarguen la corrida
+    os.environ.setdefault('NOTIFICATION_RETRY_BASE_SECONDS', str(args.retry_base))
+
+
+def _seed(db, args, scheduled_for: datetime) -> None:
+    from app.models.company import Company
+    from app.models.notification_queue import NotificationQueue
+    from app.models.notification_settings import NotificationSettings
+    from scripts.bench_rendering import build_payload
+
+    payload = build_payload(args.items)
+    email_count = round(args.notifications * args.email_share)
+
+    for i in range(args.notifications):
+        company = Company(name=f"Bench {i}")
+        db.add(company)
+        db.flush()
+        db.add(NotificationSettings(
+            company_id=company.id,
+            telegram_enabled=True,
+            telegram_chat_id=str(i % args.chats if args.chats else i),
+            email_enabled=True,
+            email_to=f"bench{i}@example.com",
+            daily_summary_time=time_of_day(8, 0),
+        ))
+        db.add(NotificationQueue(
+            company_id=company.id,
+            channel='email' if i < email_count else 'telegram',
+            payload=dict(payload, company_id=str(company.id)),
+            scheduled_for=scheduled_for,
+            status='pending',
+        ))
+    db.commit()
+
+
+def _as_santiago(value: datetime) -> datetime:
+    # SQLite devuelve la hora local de Santiago sin zona horaria
+    return SANTIAGO_TZ.localize(value) if value.tzinfo is None else value
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--notifications', type=int, default=1000)
+    parser.add_argument('--email-share', type=float, default=0.2, help="fracción enviada por email")
+    parser.add_argument('--items', type=int, default=5, help="items por sección del resumen")
+    parser.add_argument('--chats', type=int, default=0, help="chats distintos (0: uno por notificación)")
+    parser.add_argument('--latency', type=float, default=0.05, help="segundos por request a Telegram")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fracción de 502 de Telegram")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="fracción de 429 de Telegram")
+    parser.add_argument('--smtp-latency', type=float, default=0.0, help="segundos por mensaje SMTP")
+    parser.add_argument('--telegram-rate', type=float, default=None, help="msg/s globales de Telegram")
+    parser.add_argument('--retry-base', type=float, default=1.0, help="backoff base de reintentos (s)")
+    parser.add_argument('--timeout', type=float, default=600, help="corte de la corrida (s)")
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    if not args.verbose:
+        # El worker registra cada envío y cada falla simulada
+        logging.disable(logging.ERROR)
+
+    telegram_base_url, telegram_stats = start_fake_telegram(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        seed=1,
+    )
+    smtp_port, smtp_received = start_smtp_sink(latency=args.smtp_latency)
+    _configure_environment(args, telegram_base_url, smtp_port)
+
+    from sqlalchemy import func
+    from app.models.base import Base
+    from app.models.database import SessionLocal, engine
+    from app.models.notification_queue import NotificationQueue
+    from app.workers.notification_worker import process_notification_queue
+
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    scheduled_for = datetime.now(SANTIAGO_TZ)
+    _seed(db, args, scheduled_for)
+    # Todas las notificaciones de la corrida comparten scheduled_for
+    seeded = NotificationQueue.scheduled_for == scheduled_for
+
+    started = time.perf_counter()
+    cycles = 0
+    while time.perf_counter() - started < args.timeout:
+        processed = process_notification_queue()
+        cycles += 1
+        pending = db.query(func.count(NotificationQueue.id)).filter(
+            seeded,
+            NotificationQueue.status == 'pending',
+        ).scalar()
+        if not pending:
+            break
+        if not processed:
+            # Solo quedan reintentos en espera de su backoff
+            time.sleep(0.1)
+    elapsed = time.perf_counter() - started
+
+    rows = db.query(
+        NotificationQueue.status, NotificationQueue.scheduled_for, NotificationQueue.sent_at
+    ).filter(seeded).all()
+    counts = {}
+    latencies = []
+    for status, due, sent_at in rows:
+        counts[status] = counts.get(status, 0) + 1
+        if status == 'sent':
+            latencies.append((_as_santiago(sent_at) - _as_santiago(due)).total_seconds())
+    db.close()
+
+    sent = counts.get('sent', 0)
+    email_count = round(args.notifications * args.email_share)
+    print(
+        f"Notifications: {args.notifications} (telegram {args.notifications - email_count}, email {email_count}) "
+        f"latency={args.latency}s error_rate={args.error_rate} rate_limit_rate={args.rate_limit_rate}"
+    )
+    print(f"  sent {sent}, failed {counts.get('failed', 0)}, pending {counts.get('pending', 0)} "
+          f"in {elapsed:.2f}s ({cycles} worker cycles)")
+    print(f"  throughput: {sent / elapsed:10.1f} msg/s")
+    if latencies:
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"  end-to-end latency: p50 {p50:.2f}s  p99 {p99:.2f}s  max {max(latencies):.2f}s")
+    print(f"  fake telegram: {telegram_stats.as_dict()}  smtp received: {smtp_received()}")
+
+
+if __name__ == '__main__':
+    main()
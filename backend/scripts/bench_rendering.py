@@ -0,0 +1,165 @@
+"""Benchmark: renderizado de resúmenes con += vs plantillas precompiladas + join.
+
+Genera un payload sintético con N items por sección y mide:
+- legacy: concatenación con += (implementación anterior, copiada aquí)
+- compiled: plantillas precompiladas + ''.join (sin cache)
+- cached: render_message con el cache por content_hash (reintentos)
+
+Uso (desde backend/):
+    python -m scripts.bench_rendering --items 1000 --repeat 200
+"""
+
+import argparse
+import time
+from datetime import date, datetime
+
+from app.services.notification_renderer import (
+    payload_hash,
+    render_cache,
+    render_email_html,
+    render_message,
+    render_telegram,
+)
+
+
+def build_payload(items: int) -> dict:
+    pending = [
+        {
+            "id": f"p-{i}",
+            "description": f"Cuota crédito {i}",
+            "amount": 10000.0 + i,
+            "due_date": date.today().isoformat(),
+            "payment_method": "Transferencia",
+        }
+        for i in range(items)
+    ]
+    paid = [
+        {
+            "id": f"a-{i}",
+            "description": f"Autopago {i}",
+            "amount": 5000.0 + i,
+            "paid_at": datetime.utcnow().isoformat(),
+            "payment_method": "autopay",
+        }
+        for i in range(items)
+    ]
+    return {
+        "summary_date": date.today().isoformat(),
+        "company_id": "bench",
+        "pending_payments": {
+            "count": len(pending),
+            "total_amount": sum(p["amount"] for p in pending),
+            "items": pending,
+        },
+        "paid_today": {
+            "count": len(paid),
+            "total_amount": sum(p["amount"] for p in paid),
+            "items": paid,
+        },
+        "generated_at": datetime.utcnow().isoformat(),
+    }
+
+
+def legacy_email_html(payload: dict) -> str:
+    date_str = payload['summary_date']
+    pending = payload['pending_payments']
+    paid = payload['paid_today']
+
+    html = f"""
+    <html>
+    <head>
+        <style>
+            body {{ font-family: Arial, sans-serif; }}
+            .header {{ background-color: #4CAF50; color: white; padding: 20px; }}
+            .section {{ margin: 20px 0; }}
+            .pending {{ background-color: #fff3cd; padding: 15px; border-radius: 5px; }}
+            .paid {{ background-color: #d4edda; padding: 15px; border-radius: 5px; }}
+            .item {{ margin: 10px 0; padding: 10px; background-color: white; border-radius: 3px; }}
+            .amount {{ font-weight: bold; }}
+        </style>
+    </head>
+    <body>
+        <div class="header">
+            <h1>📅 Resumen Diario - {date_str}</h1>
+        </div>
+    """
+
+    if pending['count'] > 0:
+        html += f"""
+        <div class="section pending">
+            <h2>⌛ Pendientes Hoy ({pending['count']})</h2>
+            <p class="amount">Total: ${pending['total_amount']:,.0f}</p>
+        """
+        for item in pending['items']:
+            html += f"""
+            <div class="item">
+                <strong>{item['description']}</strong><br>
+                Monto: ${item['amount']:,.0f}<br>
+                Método: {item['payment_method']}
+            </div>
+            """
+        html += "</div>"
+
+    if paid['count'] > 0:
+        html += f"""
+        <div class="section paid">
+            <h2>✅ Pagados Hoy ({paid['count']})</h2>
+            <p class="amount">Total: ${paid['total_amount']:,.0f}</p>
+        """
+        for item in paid['items']:
+            html += f"""
+            <div class="item">
+                <strong>{item['description']}</strong><br>
+                Monto: ${item['amount']:,.0f}
+            </div>
+            """
+        html += "</div>"
+
+    if pending['count'] == 0 and paid['count'] == 0:
+        html += "<p>🎉 No hay actividad para hoy</p>"
+
+    html += """
+    </body>
+    </html>
+    """
+    return html
+
+
+def timed(label: str, func, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    elapsed = time.perf_counter() - started
+    per_call_ms = elapsed / repeat * 1000
+    print(f"{label:<22} {per_call_ms:10.3f} ms/render")
+    return per_call_ms
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=1000, help='Items por sección')
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    payload = build_payload(args.items)
+    payload["content_hash"] = payload_hash(payload)
+    assert legacy_email_html(payload) == render_email_html(payload), "email output differs"
+
+    print(f"Payload: {args.items} pending + {args.items} paid items\n")
+    print("Email")
+    legacy = timed("  legacy (+=)", lambda: legacy_email_html(payload), args.repeat)
+    compiled = timed("  compiled (join)", lambda: render_email_html(payload), args.repeat)
+    render_cache.clear()
+    cached = timed("  cached (hash hit)", lambda: render_message('email', payload), args.repeat)
+    print(f"  speedup compiled: {legacy / compiled:.1f}x, cached: {legacy / cached:.1f}x")
+    timed("  content hash (build)", lambda: payload_hash(payload), args.repeat)
+    print()
+
+    print("Telegram")
+    timed("  compiled (join)", lambda: render_telegram(payload), args.repeat)
+    render_cache.clear()
+    timed("  cached (hash hit)", lambda: render_message('telegram', payload), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""Benchmark: envío a Telegram con requests.post por mensaje vs cliente httpx compartido.
+
+Levanta un servidor local que imita la Bot API (POST /bot<token>/sendMessage
+responde {"ok": true}) y envía N mensajes:
+- legacy: requests.post por mensaje (conexión TCP nueva cada vez)
+- pooled: send_telegram con el cliente keep-alive compartido
+
+Contra la API real la diferencia es mayor: cada conexión nueva además paga
+el handshake TLS.
+
+Uso (desde backend/):
+    python -m scripts.bench_telegram_delivery --messages 2000
+"""
+
+import argparse
+import os
+import time
+from types import SimpleNamespace
+
+import requests
+
+from scripts.delivery_fakes import FAKE_TELEGRAM_TOKEN as TOKEN, start_fake_telegram
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=2000)
+    args = parser.parse_args()
+
+    base_url, _ = start_fake_telegram(token=TOKEN)
+
+    # El sender lee la configuración al importarse
+    os.environ['TELEGRAM_API_BASE'] = base_url
+    os.environ['TELEGRAM_BOT_TOKEN'] = TOKEN
+    from app.services import notification_sender
+    from scripts.bench_rendering import build_payload
+
+    payload = build_payload(3)
+    notification = SimpleNamespace(company_id='bench', payload=payload)
+    settings = SimpleNamespace(telegram_chat_id='1')
+    text = "Resumen de prueba"
+
+    started = time.perf_counter()
+    for _ in range(args.messages):
+        response = requests.post(
+            f"{base_url}/bot{TOKEN}/sendMessage",
+            json={"chat_id": "1", "text": text, "parse_mode": "Markdown"},
+            timeout=10,
+        )
+        response.raise_for_status()
+    legacy = args.messages / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for _ in range(args.messages):
+        assert notification_sender.send_telegram(notification, settings)
+    pooled = args.messages / (time.perf_counter() - started)
+    notification_sender.close_telegram_client()
+
+    print(f"Messages: {args.messages} (HTTP/2: {notification_sender._http2_available()})")
+    print(f"  legacy (requests.post)  {legacy:10.0f} msg/s")
+    print(f"  pooled (httpx client)   {pooled:10.0f} msg/s")
+    print(f"  speedup: {pooled / legacy:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
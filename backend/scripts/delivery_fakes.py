@@ -0,0 +1,253 @@
+"""Servicios locales que imitan Telegram y un servidor SMTP para medir envíos.
+
+- Bot API falsa (app ASGI): POST /bot<token>/sendMessage con latencia,
+  tasa de errores 5xx y tasa de 429 (con retry_after) configurables
+- Sumidero SMTP: acepta y descarta todo (aiosmtpd si está instalado, si no
+  un servidor mínimo con la librería estándar), opcionalmente cortando la
+  conexión cada N mensajes
+
+El sender se apunta a ellos con TELEGRAM_BOT_TOKEN, TELEGRAM_API_BASE y
+SMTP_HOST / SMTP_PORT (SMTP_STARTTLS=false). Los usan los benchmarks de
+scripts/, y también se pueden levantar a mano para probar el worker:
+
+    python -m scripts.delivery_fakes --latency 0.05 --error-rate 0.01
+
+Uso (desde backend/).
+"""
+
+import argparse
+import asyncio
+import random
+import socket
+import socketserver
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+FAKE_TELEGRAM_TOKEN = 'bench-token'
+
+
+class FakeTelegramStats:
+    """Contadores de la Bot API falsa."""
+
+    def __init__(self):
+        self.requests = 0
+        self.sent = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "sent": self.sent,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+        }
+
+
+def create_fake_telegram_app(
+    token: str = FAKE_TELEGRAM_TOKEN,
+    latency: float = 0.0,
+    error_rate: float = 0.0,
+    rate_limit_rate: float = 0.0,
+    retry_after: int = 1,
+    seed: Optional[int] = None,
+    stats: Optional[FakeTelegramStats] = None,
+) -> Starlette:
+    """App ASGI con el endpoint sendMessage de la Bot API.
+
+    Args:
+        token: Token aceptado en la ruta /bot<token>/...
+        latency: Segundos de espera antes de responder
+        error_rate: Fracción de requests que responden 502
+        rate_limit_rate: Fracción de requests que responden 429
+        retry_after: retry_after informado en los 429
+        seed: Semilla para que las fallas sean reproducibles
+        stats: Contadores a actualizar (app.state.stats)
+    """
+    rng = random.Random(seed)
+    stats = stats or FakeTelegramStats()
+
+    async def send_message(request):
+        stats.requests += 1
+        if request.path_params['token'] != token:
+            return JSONResponse({"ok": False, "error_code": 401, "description": "Unauthorized"}, status_code=401)
+
+        body = await request.json()
+        if latency:
+            await asyncio.sleep(latency)
+
+        roll = rng.random()
+        if roll < rate_limit_rate:
+            stats.rate_limited += 1
+            return JSONResponse(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {retry_after}",
+                    "parameters": {"retry_after": retry_after},
+                },
+                status_code=429,
+            )
+        if roll < rate_limit_rate + error_rate:
+            stats.errors += 1
+            return JSONResponse({"ok": False, "error_code": 502, "description": "Bad Gateway"}, status_code=502)
+        if not body.get('chat_id') or not body.get('text'):
+            return JSONResponse(
+                {"ok": False, "error_code": 400, "description": "Bad Request: chat_id and text are required"},
+                status_code=400,
+            )
+
+        stats.sent += 1
+        return JSONResponse({"ok": True, "result": {"message_id": stats.sent, "chat": {"id": body['chat_id']}}})
+
+    app = Starlette(routes=[Route("/bot{token}/sendMessage", send_message, methods=["POST"])])
+    app.state.stats = stats
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_telegram(port: Optional[int] = None, **options) -> Tuple[str, FakeTelegramStats]:
+    """Inicia la Bot API falsa en un hilo; retorna (URL base, contadores).
+
+    options se pasan a create_fake_telegram_app.
+    """
+    port = port or _free_port()
+    app = create_fake_telegram_app(**options)
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning'))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}", app.state.stats
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Diálogo SMTP mínimo: responde OK a todo y descarta los mensajes."""
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        server = self.server
+        self._reply("220 sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b"250-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif command.startswith('HELO'):
+                self._reply("250 sink")
+            elif command.startswith('AUTH'):
+                self._reply("235 2.7.0 Authentication successful")
+            elif command.startswith('DATA'):
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                if server.latency:
+                    time.sleep(server.latency)
+                with server.lock:
+                    server.received += 1
+                    drop = server.drop_every and server.received % server.drop_every == 0
+                self._reply("250 OK")
+                if drop:
+                    return
+            elif command.startswith('QUIT'):
+                self._reply("221 Bye")
+                return
+            else:
+                # MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class _SinkServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, drop_every: int = 0, latency: float = 0.0):
+        super().__init__(address, _SinkHandler)
+        self.lock = threading.Lock()
+        self.received = 0
+        self.drop_every = drop_every
+        self.latency = latency
+
+
+def start_smtp_sink(port: Optional[int] = None, drop_every: int = 0, latency: float = 0.0) -> Tuple[int, Callable[[], int]]:
+    """Inicia el sumidero SMTP; retorna (puerto, función con mensajes recibidos).
+
+    Args:
+        port: Puerto a usar (por defecto uno libre)
+        drop_every: Cortar la conexión cada N mensajes (prueba reconexiones)
+        latency: Segundos de espera antes de aceptar cada mensaje
+    """
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        Controller = None
+
+    port = port or _free_port()
+
+    if Controller is not None and not drop_every:
+        class _Counter:
+            received = 0
+
+            async def handle_DATA(self, server, session, envelope):
+                if latency:
+                    await asyncio.sleep(latency)
+                self.received += 1
+                return "250 OK"
+
+        handler = _Counter()
+        Controller(handler, hostname='127.0.0.1', port=port, auth_require_tls=False,
+                   authenticator=lambda *args: True).start()
+        return port, lambda: handler.received
+
+    server = _SinkServer(('127.0.0.1', port), drop_every=drop_every, latency=latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return port, lambda: server.received
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--telegram-port', type=int, default=8081)
+    parser.add_argument('--smtp-port', type=int, default=1025)
+    parser.add_argument('--latency', type=float, default=0.0, help="segundos por request de Telegram")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--smtp-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    base_url, stats = start_fake_telegram(
+        port=args.telegram_port,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+    )
+    smtp_port, received = start_smtp_sink(port=args.smtp_port, latency=args.smtp_latency)
+
+    print("Fake delivery services running. Point the worker at them with:")
+    print(f"  export TELEGRAM_BOT_TOKEN={FAKE_TELEGRAM_TOKEN} TELEGRAM_API_BASE={base_url}")
+    print(f"  export SMTP_HOST=127.0.0.1 SMTP_PORT={smtp_port} SMTP_USER=bench SMTP_PASS=bench SMTP_STARTTLS=false")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"telegram={stats.as_dict()} smtp_received={received()}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""Backfill y verificación de payment_daily_rollup.
+
+Uso (desde backend/):
+    python -m scripts.payment_rollup backfill [--company UUID]
+    python -m scripts.payment_rollup check [--company UUID]
+
+`check` termina con código 1 si encuentra diferencias.
+"""
+
+import argparse
+import sys
+from uuid import UUID
+
+from app.database import SessionLocal
+from app.services.payment_rollup import backfill_rollup, check_rollup_consistency
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('command', choices=['backfill', 'check'])
+    parser.add_argument('--company', type=UUID, default=None, help='Limitar a una empresa')
+    parser.add_argument('--limit', type=int, default=20, help='Diferencias a mostrar en check')
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == 'backfill':
+            rows = backfill_rollup(db, args.company)
+            db.commit()
+            print(f"Backfilled {rows} rollup rows")
+            return 0
+
+        mismatches = check_rollup_consistency(db, args.company)
+        if not mismatches:
+            print("Rollup is consistent")
+            return 0
+        print(f"{len(mismatches)} inconsistent rollup rows")
+        for mismatch in mismatches[:args.limit]:
+            print(
+                f"  {mismatch['company_id']} {mismatch['day']} {mismatch['status']}: "
+                f"count {mismatch['actual_count']} (expected {mismatch['expected_count']}), "
+                f"amount {mismatch['actual_amount']} (expected {mismatch['expected_amount']})"
+            )
+        return 1
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""Configuración común de los tests.
+
+Las bases SQLite de la app usan rutas relativas (app/database.py) o
+DATABASE_URL (app/models/database.py); ambas se apuntan a un directorio
+temporal antes de importar cualquier módulo de app.
+"""
+
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+_tmp_dir = tempfile.mkdtemp(prefix='controlgastos-tests-')
+os.chdir(_tmp_dir)
+os.environ.setdefault('DATABASE_URL', f"sqlite:///{_tmp_dir}/worker.db")
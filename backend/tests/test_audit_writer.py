@@ -0,0 +1,66 @@
+"""La cola de auditoría no pierde entradas en silencio."""
+
+import pytest
+
+from app.services import audit_writer as audit_module
+from app.services.audit_writer import AuditQueue, AuditWriter, make_audit_entry
+
+
+def _entries(count):
+    return [make_audit_entry('company', 'payment', index, 'update') for index in range(count)]
+
+
+class _Inserts:
+    """Reemplazo de AuditWriter._insert que falla las primeras `failures` veces."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.rows = []
+
+    def __call__(self, batch):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database unavailable")
+        self.rows.extend(batch)
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    audit_queue = AuditQueue(maxsize=2)
+    writer = AuditWriter(audit_queue, batch_size=10, write_retries=2, retry_base_seconds=0)
+    monkeypatch.setattr(audit_module, 'audit_queue', audit_queue)
+    monkeypatch.setattr(audit_module, 'audit_writer', writer)
+    return writer
+
+
+def test_full_queue_falls_back_to_synchronous_write(writer, monkeypatch):
+    inserts = _Inserts()
+    monkeypatch.setattr(writer, '_insert', inserts)
+    entries = _entries(5)
+
+    overflow = writer.audit_queue.put_many(entries, timeout=0)
+    writer.write_overflow(overflow)
+
+    assert writer.audit_queue.depth() == 2
+    assert inserts.rows == entries[2:]
+    assert writer.audit_queue.dropped == 0
+
+
+def test_failed_batch_is_retried_with_backoff(writer, monkeypatch):
+    inserts = _Inserts(failures=2)
+    monkeypatch.setattr(writer, '_insert', inserts)
+
+    assert writer._write(_entries(3)) == 3
+    assert writer.retries == 2
+    assert len(inserts.rows) == 3
+
+
+def test_batch_is_requeued_after_retries_and_dropped_only_without_room(writer, monkeypatch):
+    monkeypatch.setattr(writer, '_insert', _Inserts(failures=10))
+
+    assert writer._write(_entries(3)) == 0
+
+    assert writer.audit_queue.requeued == 2
+    assert writer.audit_queue.depth() == 2
+    assert writer.audit_queue.dropped == 1
+    assert writer.metrics()["dropped"] == 1
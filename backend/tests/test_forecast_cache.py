@@ -0,0 +1,42 @@
+"""El forecast cacheado ve los cambios hechos fuera de este proceso."""
+
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from app.database import SessionLocal, engine
+from app.models.base import Base
+from app.models.company import Company
+from app.models.company_data_version import CompanyDataVersion
+from app.models.payment import Payment
+from app.services.forecast import forecast_cache, get_company_forecast
+
+
+def test_cache_misses_after_a_change_that_skipped_invalidation():
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        company = Company(name="Empresa")
+        db.add(company)
+        db.flush()
+        payment = Payment(company_id=company.id, due_date=date.today(), amount=Decimal('100'), status='pending')
+        db.add(payment)
+        db.commit()
+
+        assert get_company_forecast(db, company.id, 1)["items"][0]["outflow"] == 100
+        hits = forecast_cache.hits
+        assert get_company_forecast(db, company.id, 1)["items"][0]["outflow"] == 100
+        assert forecast_cache.hits == hits + 1
+
+        # UPDATE masivo sin hooks de sesión, como el de otro proceso
+        db.execute(update(Payment).where(Payment.id == payment.id).values(amount=Decimal('250')))
+        db.commit()
+
+        assert get_company_forecast(db, company.id, 1)["items"][0]["outflow"] == 250
+    finally:
+        db.query(Payment).delete()
+        db.query(CompanyDataVersion).delete()
+        db.query(Company).delete()
+        db.commit()
+        db.close()
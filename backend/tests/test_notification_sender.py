@@ -0,0 +1,69 @@
+"""Clasificación de fallas de envío para los circuit breakers."""
+
+import smtplib
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.services import notification_sender
+from app.services.notification_sender import CircuitBreaker
+from app.workers import notification_delivery
+from app.workers.notification_delivery import DeliveryEngine, DeliveryJob
+
+
+class _FailingSession:
+    def __init__(self, error):
+        self.error = error
+
+    def send_message(self, msg):
+        raise self.error
+
+
+@pytest.fixture
+def breakers(monkeypatch):
+    breakers = {'telegram': CircuitBreaker('telegram'), 'email': CircuitBreaker('email')}
+    failures = {channel: [] for channel in breakers}
+    for channel, breaker in breakers.items():
+        monkeypatch.setattr(breaker, 'record_failure', lambda channel=channel: failures[channel].append(True))
+    monkeypatch.setattr(notification_sender, 'circuit_breakers', breakers)
+    monkeypatch.setattr(notification_delivery, 'circuit_breakers', breakers)
+    return failures
+
+
+def _send_email(monkeypatch, error) -> bool:
+    monkeypatch.setattr(notification_sender, 'build_email_message', lambda *args: object())
+    notification = SimpleNamespace(company_id='company')
+    settings = SimpleNamespace(email_to='dest@example.com')
+    return notification_sender.send_email(notification, settings, smtp=_FailingSession(error))
+
+
+def test_smtp_550_does_not_count_as_channel_failure(monkeypatch, breakers):
+    assert _send_email(monkeypatch, smtplib.SMTPResponseException(550, b'mailbox unavailable')) is False
+    assert breakers['email'] == []
+
+
+@pytest.mark.parametrize('error', [
+    smtplib.SMTPResponseException(421, b'service not available'),
+    smtplib.SMTPServerDisconnected('connection lost'),
+    ConnectionRefusedError(),
+])
+def test_smtp_outage_counts_as_channel_failure(monkeypatch, breakers, error):
+    assert _send_email(monkeypatch, error) is False
+    assert breakers['email'] == [True]
+
+
+def test_telegram_rate_limit_exhausted_does_not_count_as_channel_failure(monkeypatch, breakers):
+    def handler(request):
+        return httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 0}})
+
+    options = dict(base_url="http://telegram.test/botTOKEN", transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(notification_delivery, 'telegram_client_options', lambda: dict(options))
+
+    results = []
+    job = DeliveryJob(None, 'telegram', 'company', 0, {"chat_id": "1", "text": "hola"})
+    engine = DeliveryEngine(telegram_global_rate=1000, telegram_chat_rate=1000)
+    engine.run([job], lambda job, error: results.append(error))
+
+    assert results[0].rate_limited and results[0].transient
+    assert breakers['telegram'] == []
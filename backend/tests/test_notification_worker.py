@@ -0,0 +1,86 @@
+"""El worker reserva y procesa la cola por páginas."""
+
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from app.models.base import Base
+from app.models.company import Company
+from app.models.database import SessionLocal, engine
+from app.models.notification_queue import NotificationQueue
+from app.models.notification_settings import NotificationSettings
+from app.workers import notification_worker
+from app.workers.notification_worker import SANTIAGO_TZ, _claim_page, process_notification_queue
+
+
+class _RecordingEngine:
+    """DeliveryEngine falso: da por enviado todo y anota el tamaño de cada lote."""
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, jobs, on_result):
+        self.batches.append(len(jobs))
+        for job in jobs:
+            on_result(job, None)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(
+        notification_worker, 'build_telegram_request',
+        lambda notification, settings, db: {"chat_id": settings.telegram_chat_id, "text": "hola"},
+    )
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    yield session
+    session.query(NotificationQueue).delete()
+    session.query(NotificationSettings).delete()
+    session.query(Company).delete()
+    session.commit()
+    session.close()
+
+
+def _seed(db, count):
+    company = Company(name="Empresa")
+    db.add(company)
+    db.flush()
+    db.add(NotificationSettings(
+        company_id=company.id,
+        telegram_enabled=True,
+        telegram_chat_id="1",
+        daily_summary_time=time(8, 0),
+    ))
+    due = datetime.now(SANTIAGO_TZ) - timedelta(minutes=1)
+    for _ in range(count):
+        db.add(NotificationQueue(
+            company_id=company.id,
+            channel='telegram',
+            payload={"summary_date": "2026-10-19"},
+            scheduled_for=due,
+            status='pending',
+        ))
+    db.commit()
+
+
+def test_processes_the_queue_one_page_at_a_time(db):
+    _seed(db, 5)
+    delivery = _RecordingEngine()
+
+    assert process_notification_queue(delivery, page_size=2) == 5
+
+    assert delivery.batches == [2, 2, 1]
+    statuses = [status for (status,) in db.query(NotificationQueue.status)]
+    assert statuses == ['sent'] * 5
+
+
+def test_claimed_notifications_are_not_visible_to_other_consumers(db):
+    _seed(db, 3)
+    now = datetime.now(SANTIAGO_TZ)
+
+    first = _claim_page(db, now, 2)
+    second = _claim_page(db, now, 2)
+
+    assert len(first) == 2 and len(second) == 1
+    assert not {n.id for n in first} & {n.id for n in second}
+    assert _claim_page(db, now, 2) == []
@@ -0,0 +1,69 @@
+"""Jobs nocturnos de autopago y vencimiento sobre la base de la app."""
+
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app.database import SessionLocal, engine
+from app.models.base import Base
+from app.models.company import Company
+from app.models.payment import Payment
+from app.services import autopay, overdue
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    yield session
+    session.query(Payment).delete()
+    session.query(Company).delete()
+    session.commit()
+    session.close()
+
+
+def _add_payment(db, status: str, autopay_enabled: bool, due_date: date) -> Payment:
+    company = Company(name="Empresa")
+    db.add(company)
+    db.flush()
+    payment = Payment(
+        company_id=company.id,
+        due_date=due_date,
+        amount=Decimal('1000'),
+        status=status,
+        autopay=autopay_enabled,
+    )
+    db.add(payment)
+    db.commit()
+    return payment
+
+
+def test_autopay_settles_overdue_installments(db, monkeypatch):
+    audited = []
+    monkeypatch.setattr(autopay, 'enqueue_audit_entries', audited.extend)
+    payment = _add_payment(db, 'overdue', True, TODAY - timedelta(days=3))
+
+    result = autopay.run_autopay(today=TODAY)
+
+    db.refresh(payment)
+    assert payment.status == 'paid'
+    assert result['paid'] == 1
+    assert [entry['action'] for entry in audited] == ['autopay']
+
+
+def test_overdue_transition_skips_autopay_and_audits(db, monkeypatch):
+    audited = []
+    monkeypatch.setattr(overdue, 'enqueue_audit_entries', audited.extend)
+    manual = _add_payment(db, 'pending', False, TODAY - timedelta(days=1))
+    automatic = _add_payment(db, 'pending', True, TODAY - timedelta(days=1))
+
+    result = overdue.run_overdue_transition(today=TODAY)
+
+    db.refresh(manual)
+    db.refresh(automatic)
+    assert (manual.status, automatic.status) == ('overdue', 'pending')
+    assert result['updated'] == 1
+    assert [(entry['entity_id'], entry['action']) for entry in audited] == [(manual.id, 'overdue')]
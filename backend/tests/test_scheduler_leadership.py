@@ -0,0 +1,41 @@
+"""El scheduler vuelve a ejecutar jobs tras perder y recuperar el liderazgo."""
+
+import threading
+from datetime import datetime
+
+from app import scheduler as scheduler_module
+from app.database import engine
+from app.models.base import Base
+
+fired = threading.Event()
+
+
+def _noop():
+    pass
+
+
+def _fire():
+    fired.set()
+
+
+def test_jobs_run_after_elect_demote_elect(monkeypatch):
+    Base.metadata.create_all(engine)
+    monkeypatch.setattr(scheduler_module, '_register_system_jobs', _noop)
+    monkeypatch.setattr(scheduler_module, 'catch_up_missed_summaries', _noop)
+    monkeypatch.setattr(scheduler_module.notification_consumer, 'start', _noop)
+    monkeypatch.setattr(scheduler_module.notification_consumer, 'stop', _noop)
+    scheduler = scheduler_module.scheduler
+
+    try:
+        scheduler_module._on_elected()
+        scheduler_module._on_demoted()
+        scheduler_module._on_elected()
+
+        scheduler.add_job(_fire, 'date', run_date=datetime.now(scheduler_module.SANTIAGO_TZ), id='leadership_test')
+        assert fired.wait(5), "job did not run after re-election"
+
+        # El engine compartido sigue usable (el job store no lo cerró)
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+    finally:
+        scheduler_module.shutdown_scheduler()
@@ -0,0 +1,50 @@
+"""Selección de empresas del dispatcher de resúmenes diarios."""
+
+from datetime import time
+
+from app import scheduler as scheduler_module
+from app.database import SessionLocal, engine
+from app.models.base import Base
+from app.models.company import Company
+from app.models.notification_settings import NotificationSettings
+
+
+def test_settings_changes_are_seen_by_the_next_tick():
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    try:
+        company = Company(name="Empresa")
+        db.add(company)
+        db.flush()
+        settings = NotificationSettings(
+            company_id=company.id,
+            telegram_enabled=True,
+            telegram_chat_id="1",
+            daily_summary_time=time(8, 0),
+        )
+        db.add(settings)
+        db.commit()
+
+        def due_at(minute):
+            return scheduler_module._scheduled_company_ids(
+                db,
+                NotificationSettings.daily_summary_time >= minute,
+                NotificationSettings.daily_summary_time <= time(minute.hour, minute.minute, 59, 999999),
+            )
+
+        assert due_at(time(8, 0)) == [str(company.id)]
+
+        # Un cambio hecho por otro proceso (p.ej. la API) se lee directo de la BD
+        settings.daily_summary_time = time(9, 30)
+        db.commit()
+        assert due_at(time(8, 0)) == []
+        assert due_at(time(9, 30)) == [str(company.id)]
+
+        settings.telegram_enabled = False
+        db.commit()
+        assert due_at(time(9, 30)) == []
+    finally:
+        db.query(NotificationSettings).delete()
+        db.query(Company).delete()
+        db.commit()
+        db.close()
@@ -0,0 +1,141 @@
+"""Propagación de la edición de una plantilla a sus cuotas materializadas."""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import SessionLocal, engine
+from app.models.base import Base
+from app.models.company import Company
+from app.models.payment import Payment
+from app.models.recurring_template import RecurringTemplate
+from app.routers import recurring
+from app.services.installment_generator import materialize_template, propagate_template_changes
+
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def db():
+    Base.metadata.create_all(engine)
+    session = SessionLocal()
+    yield session
+    session.query(Payment).delete()
+    session.query(RecurringTemplate).delete()
+    session.query(Company).delete()
+    session.commit()
+    session.close()
+
+
+@pytest.fixture
+def template(db):
+    company = Company(name="Empresa")
+    db.add(company)
+    db.flush()
+    template = RecurringTemplate(
+        company_id=company.id,
+        title="Crédito",
+        total_installments=6,
+        installments_paid_before=2,
+        installment_amount=Decimal('100'),
+        start_control_date=date(2026, 9, 10),
+    )
+    db.add(template)
+    db.flush()
+    materialize_template(db, template)
+    db.commit()
+    return template
+
+
+def _installments(db, template):
+    return {
+        payment.installment_number: payment
+        for payment in db.query(Payment).filter(Payment.template_id == template.id)
+    }
+
+
+def test_propagates_paid_before_and_autopay(db, template):
+    template.installments_paid_before = 1
+    template.autopay_enabled = True
+
+    result, audit_entries = propagate_template_changes(db, template, template.start_control_date, 2, today=TODAY)
+    db.commit()
+
+    installments = _installments(db, template)
+    assert sorted(installments) == [2, 3, 4, 5, 6]
+    assert all(payment.autopay for payment in installments.values())
+    # La primera cuota controlada vence en start_control_date
+    assert installments[2].due_date == date(2026, 9, 10)
+    assert installments[6].due_date == date(2027, 1, 10)
+    assert result == {"created": 1, "updated": 4, "deleted": 0}
+    assert sorted(entry['action'] for entry in audit_entries) == ['create'] + ['update'] * 4
+    created = next(entry for entry in audit_entries if entry['action'] == 'create')
+    assert created['entity_id'] == installments[2].id
+
+
+def test_recomputes_future_due_dates_only(db, template):
+    installments = _installments(db, template)
+    installments[3].due_date = date(2026, 9, 20)
+    installments[5].due_date = date(2026, 12, 1)
+    db.commit()
+
+    result, _ = propagate_template_changes(db, template, template.start_control_date, 2, today=TODAY)
+    db.commit()
+
+    installments = _installments(db, template)
+    # Vencida: se conserva; futura: vuelve al plan
+    assert installments[3].due_date == date(2026, 9, 20)
+    assert installments[5].due_date == date(2026, 11, 10)
+    assert result["updated"] == 1
+
+
+def test_raising_paid_before_drops_unpaid_installments(db, template):
+    template.installments_paid_before = 4
+
+    result, audit_entries = propagate_template_changes(db, template, template.start_control_date, 2, today=TODAY)
+    db.commit()
+
+    assert sorted(_installments(db, template)) == [5, 6]
+    assert result["deleted"] == 2
+    assert sorted(entry['action'] for entry in audit_entries) == ['delete', 'delete', 'update', 'update']
+
+
+def test_materialization_audits_created_installments(db, template):
+    template.total_installments = 8
+
+    result, audit_entries = materialize_template(db, template)
+    db.commit()
+
+    installments = _installments(db, template)
+    assert result["created"] == 2
+    assert sorted(entry['entity_id'] for entry in audit_entries) == sorted([installments[7].id, installments[8].id])
+    assert {entry['action'] for entry in audit_entries} == {'create'}
+    assert {entry['after_data']['installment_number'] for entry in audit_entries} == {7, 8}
+
+
+def test_put_without_paid_before_keeps_the_plan(db, template):
+    app = FastAPI()
+    app.include_router(recurring.router)
+    before = {
+        number: (payment.id, payment.due_date)
+        for number, payment in _installments(db, template).items()
+    }
+
+    response = TestClient(app).put(f"/recurring/{template.id}", json={
+        "title": template.title,
+        "total_installments": template.total_installments,
+        "installment_amount": str(template.installment_amount),
+        "start_control_date": template.start_control_date.isoformat(),
+    })
+
+    assert response.status_code == 200
+    assert response.json()["installments_paid_before"] == 2
+    db.expire_all()
+    after = {
+        number: (payment.id, payment.due_date)
+        for number, payment in _installments(db, template).items()
+    }
+    assert after == before